@@ -1,8 +1,18 @@
+import functools
 import streamlit as st
-import pandas as pd
 from datetime import date, datetime, timedelta, timezone
+import auth
 import db_manager
-from streamlit_option_menu import option_menu
+import export
+import importer
+import lazy
+import metrics
+import resilience
+import snapshot
+import transforms
+
+# 登录后的页面才需要 pandas，登录页不导入 (见 lazy.py)
+pd = lazy.module("pandas")
 
 # --- 时区处理 ---
 def get_beijing_today():
@@ -14,6 +24,9 @@ def get_beijing_today():
     beijing_now = utc_now + timedelta(hours=8)
     return beijing_now.date()
 
+# 看板“提交统计”的时间窗口 (天)
+STATS_WINDOW_DAYS = 30
+
 # 设置页面配置
 st.set_page_config(
     page_title="公司内部日报记录系统",
@@ -286,8 +299,7 @@ def load_css():
          </style>
      """, unsafe_allow_html=True)
 
-# 初始化数据库
-db_manager.init_db()
+# 存储后端 (Supabase 客户端 / SQLite 连接和建表) 在第一次查询时才创建，登录页不需要等待
 load_css()
 
 # Session State 初始化
@@ -296,6 +308,55 @@ if 'authenticated' not in st.session_state:
 if 'user_info' not in st.session_state:
     st.session_state['user_info'] = None
 
+# 旧版本把会话令牌放在 URL 参数中，链接可能已被分享或记录，不再接受
+LEGACY_SESSION_PARAM = "session"
+
+def restore_session():
+    """
+    刷新页面后会话状态丢失：凭 Cookie 中的会话令牌恢复登录 (见 auth.session_cookie)
+    只校验签名、有效期和内存中的吊销列表 (由后台线程加载，见 auth.SessionDenylist)，不查询数据库；进程缓存仍然有效，页面数据不需要重新加载
+    Cookie 在整个会话期间不变，每个会话只检查一次 (退出登录后不会凭旧 Cookie 再次登录)
+    """
+    if LEGACY_SESSION_PARAM in st.query_params:
+        st.query_params.pop(LEGACY_SESSION_PARAM, None)
+    if st.session_state.get('session_checked'):
+        return
+    st.session_state['session_checked'] = True
+
+    token = auth.session_cookie()
+    if not token:
+        return
+    user = auth.read_token(token)
+    if user:
+        st.session_state['authenticated'] = True
+        st.session_state['user_info'] = user
+        st.session_state['session_token'] = token
+    else:
+        # 过期、已吊销或无效的令牌
+        set_session_cookie(None)
+
+def set_session_cookie(token):
+    """
+    登录 / 退出后更新浏览器中的会话 Cookie
+    登录和退出后紧接着 st.rerun()，在那之前输出的脚本可能来不及执行，这里只做标记，由 sync_session_cookie 在下一次运行时写入
+    """
+    st.session_state['session_token'] = token
+    st.session_state['session_cookie_pending'] = True
+
+def sync_session_cookie():
+    if st.session_state.pop('session_cookie_pending', False):
+        auth.write_session_cookie(st.session_state.get('session_token'))
+
+def end_session():
+    """
+    退出登录：吊销当前令牌 (Cookie 可能已被复制)，删除浏览器中的 Cookie
+    """
+    db_manager.revoke_session(st.session_state.get('session_token'))
+    st.session_state['authenticated'] = False
+    st.session_state['user_info'] = None
+    set_session_cookie(None)
+    snapshot.clear()
+
 def render_logo(centered=False):
     """
     渲染带渐变效果的 Logo
@@ -373,16 +434,128 @@ def login_page():
                 if not username or not password:
                     st.error("请输入用户名和密码")
                 else:
-                    user = db_manager.login_user(username, password)
+                    client_ip = st.context.ip_address
+                    user = db_manager.login_user(username, password, client_ip)
                     if user:
                         st.session_state['authenticated'] = True
                         st.session_state['user_info'] = user
+                        # 刷新页面时凭令牌恢复登录状态
+                        set_session_cookie(auth.issue_token(user))
+                        # 一次加载本会话常用的数据 (用户列表、姓名列表、本月目标、昨日计划)
+                        snapshot.bootstrap(user)
                         st.toast(f"欢迎回来，{user['full_name']}！", icon="🎉")
                         st.rerun()
                     else:
-                        st.error("登录失败，用户名或密码错误。")
+                        wait = auth.throttle.retry_after(*auth.throttle_keys(username, client_ip))
+                        if wait:
+                            st.error(f"登录尝试过于频繁，请 {_format_age(max(wait, 1))}后再试。")
+                        elif resilience.run_notices():
+                            # 数据服务故障，而不是密码错误
+                            st.error(f"登录失败：{resilience.run_notices()[-1]['message']}，请稍后重试。")
+                        else:
+                            st.error("登录失败，用户名或密码错误。")
         st.markdown('</div>', unsafe_allow_html=True)
 
+def _format_age(seconds):
+    if seconds < 60:
+        return f"{int(seconds)} 秒"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+def render_backend_notices(container):
+    """
+    展示本次运行中数据库调用的失败 / 降级提示 (resilience 记录的结构化错误)
+    """
+    notices = resilience.run_notices()
+    if not notices:
+        return
+
+    messages = "、".join(sorted({n['message'] for n in notices if n['kind'] != "stale"})) or "数据服务异常"
+    stale_ages = [n['stale_age'] for n in notices if n['kind'] == "stale"]
+    with container:
+        if stale_ages:
+            st.warning(f"⚠️ {messages}，部分内容为约 {_format_age(max(stale_ages))}前的缓存数据。")
+        else:
+            st.error(f"❌ {messages}，部分数据可能未加载或不是最新的，请稍后刷新重试。")
+        st.caption("涉及: " + ", ".join(sorted({n['operation'] for n in notices})))
+
+def render_timing_panel():
+    """
+    管理员的性能面板：本次页面运行中 页面 > db_manager 函数 > 数据库请求 的耗时、行数、传输量和缓存命中
+    """
+    spans = metrics.run_spans()
+    if not spans:
+        st.caption("本次运行没有记录到调用")
+        return
+
+    backend_ms = sum(s['ms'] for s in spans if s['kind'] == "backend")
+    total_bytes = sum(s['bytes'] for s in spans if s['kind'] == "backend")
+    # 最外层调用的缓存次数已包含内层
+    hits = sum(s['cache_hits'] for s in spans if s['depth'] == 0)
+    misses = sum(s['cache_misses'] for s in spans if s['depth'] == 0)
+
+    with st.container(border=True):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("本次运行", f"{metrics.run_elapsed_ms():.0f} ms")
+        c2.metric("数据库请求", f"{backend_ms:.0f} ms")
+        c3.metric("缓存命中率", f"{hits / (hits + misses):.0%}" if hits + misses else "-")
+        c4.metric("接收数据", f"{total_bytes / 1024:.1f} KB")
+
+        df = pd.DataFrame(spans)
+        df['name'] = df['depth'].map(lambda d: "\u3000" * d) + df['name']
+        df['cache'] = df['cache_hits'].astype(str) + " / " + df['cache_misses'].astype(str)
+        st.dataframe(
+            df[['name', 'kind', 'ms', 'offset_ms', 'rows', 'bytes', 'cache', 'error']].rename(columns={
+                'name': "调用", 'kind': "层级", 'ms': "耗时(ms)", 'offset_ms': "开始(ms)",
+                'rows': "行数", 'bytes': "字节", 'cache': "缓存 命中/未命中", 'error': "错误",
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+def render_bulk_import(snap):
+    """
+    管理员批量导入用户或历史日报 (CSV / Excel)
+    """
+    with st.container(border=True):
+        import_kind = st.radio("导入内容", ["用户", "日报"], horizontal=True, key="import_kind")
+        if import_kind == "用户":
+            st.caption("表头: 用户名、密码、姓名 (必填)，部门、电话 (可选)。已存在的用户名会跳过。")
+        else:
+            st.caption("表头与导出文件一致: 汇报日期、员工姓名、今日工作内容 (必填)，明日工作计划、遇到的困难/协助、提交时间 (可选)。已存在的相同日报会跳过。")
+
+        uploaded = st.file_uploader("选择文件", type=["csv", "xlsx"], key="import_file")
+        if not st.button("开始导入", type="primary", disabled=uploaded is None, key="start_import"):
+            return
+
+        progress_text = st.empty()
+
+        def on_progress(processed):
+            progress_text.caption(f"已处理 {processed} 行...")
+
+        run_import = importer.import_users if import_kind == "用户" else importer.import_reports
+        try:
+            with st.spinner("正在导入..."):
+                result = run_import(uploaded, uploaded.name, progress=on_progress)
+        except Exception as e:
+            st.error(f"导入失败: {e}")
+            return
+        progress_text.empty()
+
+        st.success(f"导入完成：成功 {result['inserted']} 行，跳过 {len(result['skipped'])} 行，失败 {len(result['failed'])} 行")
+        issues = [(row_no, "失败", reason) for row_no, reason in result['failed']]
+        issues += [(row_no, "跳过", reason) for row_no, reason in result['skipped']]
+        if issues:
+            st.dataframe(
+                pd.DataFrame(sorted(issues, key=lambda item: item[0] or 0), columns=["行号", "结果", "原因"]),
+                use_container_width=True,
+                hide_index=True,
+            )
+        if import_kind == "用户" and result['inserted'] and snap is not None:
+            snap.refresh()
+
+@metrics.timed("page")
 def render_admin_page():
     """
     管理员：用户管理页面
@@ -392,7 +565,8 @@ def render_admin_page():
     
     # 1. 用户列表展示
     st.markdown("### 📋 用户列表")
-    users_df = db_manager.get_all_users()
+    snap = snapshot.current()
+    users_df = snap.users if snap is not None and snap.users is not None else db_manager.get_all_users()
     
     if not users_df.empty:
         display_cols = ['full_name', 'username', 'department', 'phone', 'is_admin', 'created_at']
@@ -442,13 +616,21 @@ def render_admin_page():
                     )
                     if success:
                         st.success(f"用户 {new_fullname} ({new_username}) 创建成功！")
+                        if snap is not None:
+                            snap.refresh()
                         st.rerun()
                     else:
                         st.error(f"创建失败: {msg}")
 
     st.markdown("---")
 
-    # 3. 重置用户密码区域
+    # 3. 批量导入
+    st.markdown("### 📤 批量导入")
+    render_bulk_import(snap)
+
+    st.markdown("---")
+
+    # 4. 重置用户密码区域
     st.markdown("### 🔐 重置用户密码")
     if not users_df.empty:
         # 获取所有用户名列表
@@ -463,12 +645,14 @@ def render_admin_page():
             # 增加一些垂直间距，让按钮对齐
             st.write("")
             st.write("")
-            if st.button("重置为 123456"):
-                if db_manager.admin_reset_password(user_to_reset):
-                    st.success(f"✅ 已将用户 {user_to_reset} 的密码重置为: 123456")
+            if st.button("重置密码"):
+                new_password = db_manager.admin_reset_password(user_to_reset)
+                if new_password:
+                    st.success(f"✅ 已将用户 {user_to_reset} 的密码重置为临时密码: {new_password}，请通知用户登录后修改。")
                 else:
                     st.error("❌ 重置失败，请稍后重试。")
 
+@metrics.timed("page")
 def render_password_page(user):
     """
     修改密码页面
@@ -485,8 +669,16 @@ def render_password_page(user):
             submitted = st.form_submit_button("确认修改", type="primary")
             
             if submitted:
-                if current_password != user['password']:
-                    st.error("❌ 当前密码错误！")
+                client_ip = st.context.ip_address
+                if not db_manager.check_current_password(user['username'], current_password, client_ip):
+                    wait = auth.throttle.locked_for(*auth.throttle_keys(user['username'], client_ip))
+                    if wait > 0:
+                        st.error(f"❌ 尝试次数过多，请 {_format_age(max(wait, 1))}后再试。")
+                    elif resilience.run_notices():
+                        # 数据服务故障，而不是密码错误
+                        st.error(f"❌ 无法验证当前密码：{resilience.run_notices()[-1]['message']}，请稍后重试。")
+                    else:
+                        st.error("❌ 当前密码错误！")
                 elif len(new_password) < 6:
                     st.error("❌ 新密码长度不能少于 6 位！")
                 elif new_password != confirm_password:
@@ -494,12 +686,12 @@ def render_password_page(user):
                 else:
                     if db_manager.update_password(user['username'], new_password):
                         st.success("✅ 密码修改成功！请重新登录。")
-                        st.session_state['authenticated'] = False
-                        st.session_state['user_info'] = None
+                        end_session()
                         st.rerun()
                     else:
                         st.error("❌ 修改失败，请稍后重试。")
 
+@metrics.timed("page")
 def render_monthly_goal_page(user):
     """
     渲染本月业绩目标页面
@@ -528,42 +720,52 @@ def render_monthly_goal_page(user):
     
     st.markdown("### 🏆 全员目标概览")
     
-    all_goals_df = db_manager.get_all_monthly_goals(current_month)
+    # 本页需要的数据一次性声明，并发加载
+    # 本月目标直接取会话快照，查看其他月份时才查询
+    snap = snapshot.current()
+    use_snapshot = snap is not None and snap.month == current_month
+    calls = dict(
+        overview=(db_manager.get_monthly_goal_overview, current_month),
+        logs=(db_manager.get_performance_logs, user['username'], current_month),
+        rollup=(db_manager.get_performance_rollup, current_month),
+    )
+    if not use_snapshot:
+        calls['goal'] = (db_manager.get_user_monthly_goal, user['username'], current_month)
+    page_data = db_manager.prefetch(**calls)
+    if use_snapshot:
+        page_data['goal'] = snap.goal
     
-    if all_goals_df.empty:
+    overview_df = page_data['overview']
+    
+    if overview_df.empty:
         st.info("暂无本月目标数据。")
     else:
-        users_df = db_manager.get_all_users()
-        if not users_df.empty:
-            merged_df = pd.merge(all_goals_df, users_df[['username', 'full_name', 'department']], on='username', how='left')
-            merged_df['full_name'] = merged_df['full_name'].fillna(merged_df['username'])
-            merged_df['completion_rate'] = merged_df.apply(
-                lambda row: (row['completed_amount'] / row['target_amount'] * 100) if row['target_amount'] > 0 else 0, axis=1
-            )
-            merged_df = merged_df.sort_values(by='completion_rate', ascending=False)
-            
-            st.dataframe(
-                merged_df[['full_name', 'department', 'target_amount', 'completed_amount', 'revenue_amount', 'completion_rate']],
-                column_config={
-                    "full_name": "姓名",
-                    "department": "部门",
-                    "target_amount": st.column_config.NumberColumn("目标业绩", format="¥%d"),
-                    "completed_amount": st.column_config.NumberColumn("已完成业绩", format="¥%d"),
-                    "revenue_amount": st.column_config.NumberColumn("已完成营收", format="¥%d"),
-                    "completion_rate": st.column_config.ProgressColumn("完成率", format="%.1f%%", min_value=0, max_value=100),
-                },
-                use_container_width=True,
-                hide_index=True
-            )
-        else:
-            st.warning("无法获取用户信息，仅显示用户名。")
-            st.dataframe(all_goals_df)
+        overview_df['completion_rate'] = transforms.completion_rate(
+            overview_df['completed_amount'], overview_df['target_amount']
+        )
+        overview_df = overview_df.sort_values(by='completion_rate', ascending=False)
+        
+        st.dataframe(
+            overview_df[['full_name', 'department', 'target_amount', 'completed_amount', 'revenue_amount', 'completion_rate']],
+            column_config={
+                "full_name": "姓名",
+                "department": "部门",
+                "target_amount": st.column_config.NumberColumn("目标业绩", format="¥%d"),
+                "completed_amount": st.column_config.NumberColumn("已完成业绩", format="¥%d"),
+                "revenue_amount": st.column_config.NumberColumn("已完成营收", format="¥%d"),
+                "completion_rate": st.column_config.ProgressColumn("完成率", format="%.1f%%", min_value=0, max_value=100),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+    render_performance_analytics(user, selected_year, current_month, page_data['rollup'])
 
     st.markdown("---")
 
     st.markdown("### 👤 我的目标")
     
-    goal_data = db_manager.get_user_monthly_goal(user['username'], current_month)
+    goal_data = page_data['goal']
     target = goal_data['target_amount'] if goal_data else 0.0
     completed = goal_data['completed_amount'] if goal_data else 0.0
     revenue = goal_data['revenue_amount'] if goal_data else 0.0
@@ -597,15 +799,17 @@ def render_monthly_goal_page(user):
                 
                 submitted = st.form_submit_button("提交更新", type="primary")
                 if submitted:
-                    final_completed = completed + added_completed
-                    final_revenue = revenue + added_revenue
+                    # 目标只在首次设定时写入；业绩/营收只提交增量，由数据库原子累加
+                    set_target = new_target if target == 0 and new_target > 0 else None
                     
-                    if (target == 0 and new_target > 0) or added_completed > 0 or added_revenue > 0:
-                        success, msg = db_manager.update_user_monthly_goal(
-                            user['username'], current_month, new_target, final_completed, final_revenue,
-                            added_completed=added_completed, added_revenue=added_revenue
+                    if set_target is not None or added_completed > 0 or added_revenue > 0:
+                        success, msg, new_goal = db_manager.increment_user_monthly_goal(
+                            user['username'], current_month,
+                            added_completed=added_completed, added_revenue=added_revenue, target_amount=set_target
                         )
                         if success:
+                            if use_snapshot and new_goal:
+                                snap.set_goal(new_goal)
                             st.toast(f"✅ 更新成功！业绩 +{added_completed}, 营收 +{added_revenue}", icon="🎉")
                             st.rerun()
                         else:
@@ -614,7 +818,7 @@ def render_monthly_goal_page(user):
                         st.warning("⚠️ 没有检测到数据变化（请输入新增金额或设定目标）")
 
     st.markdown("### 📜 提交记录")
-    logs_df = db_manager.get_performance_logs(user['username'], current_month)
+    logs_df = page_data['logs']
     
     if not logs_df.empty:
         cols = ['created_at', 'added_completed', 'added_revenue']
@@ -633,6 +837,113 @@ def render_monthly_goal_page(user):
     else:
         st.info("暂无提交记录")
 
+def render_performance_analytics(user, selected_year, current_month, rollup):
+    """
+    渲染业绩趋势、排行榜、部门汇总 (读取按日预汇总数据)
+    rollup: 页面预取的本月汇总；按日 / 按周趋势、排行榜和部门汇总都由它计算，全年趋势另行查询
+    管理员额外可以核对目标累计值与提交日志是否一致
+    """
+    st.markdown("### 📈 业绩分析")
+
+    tab_names = ["趋势", "排行榜", "部门汇总"]
+    if user.get('is_admin', False):
+        tab_names.append("数据核对")
+    tabs = st.tabs(tab_names)
+
+    with tabs[0]:
+        granularity_labels = {"day": "按日", "week": "按周", "month": "按月 (全年)"}
+        granularity = st.radio(
+            "统计粒度", list(granularity_labels), format_func=granularity_labels.get,
+            horizontal=True, label_visibility="collapsed"
+        )
+        if granularity == "month":
+            series = db_manager.get_performance_series(
+                "month", start_day=f"{selected_year}-01-01", end_day=f"{selected_year}-12-31"
+            )
+        else:
+            series = db_manager.get_performance_series(granularity, month_str=current_month, rollup=rollup)
+
+        if series.empty:
+            st.info("暂无业绩提交记录。")
+        else:
+            st.line_chart(
+                series.rename(columns={"added_completed": "业绩", "added_revenue": "营收"}),
+                x="period", y=["业绩", "营收"], x_label="", y_label="金额 (¥)"
+            )
+
+    with tabs[1]:
+        board = db_manager.get_performance_leaderboard(current_month, limit=10, rollup=rollup)
+        if board.empty:
+            st.info("暂无业绩提交记录。")
+        else:
+            board.insert(0, 'rank', range(1, len(board) + 1))
+            st.dataframe(
+                board[['rank', 'full_name', 'department', 'added_completed', 'added_revenue', 'submissions']],
+                column_config={
+                    "rank": "名次",
+                    "full_name": "姓名",
+                    "department": "部门",
+                    "added_completed": st.column_config.NumberColumn("本月提交业绩", format="¥%d"),
+                    "added_revenue": st.column_config.NumberColumn("本月提交营收", format="¥%d"),
+                    "submissions": "提交次数",
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+    with tabs[2]:
+        totals = db_manager.get_department_totals(current_month, rollup=rollup)
+        if totals.empty:
+            st.info("暂无业绩提交记录。")
+        else:
+            st.bar_chart(totals, x="department", y=["added_completed", "added_revenue"], x_label="", y_label="金额 (¥)", stack=False)
+            st.dataframe(
+                totals,
+                column_config={
+                    "department": "部门",
+                    "members": "提交人数",
+                    "added_completed": st.column_config.NumberColumn("业绩", format="¥%d"),
+                    "added_revenue": st.column_config.NumberColumn("营收", format="¥%d"),
+                    "submissions": "提交次数",
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+    if len(tabs) > 3:
+        with tabs[3]:
+            st.caption("对比每人本月目标中的累计值与提交日志汇总，列出不一致的记录。")
+            col_check, col_rebuild = st.columns(2)
+            if col_check.button("🧮 开始核对", key="reconcile_goals"):
+                drift = db_manager.reconcile_monthly_goals(current_month)
+                if drift is None:
+                    st.error("核对失败，请稍后重试。")
+                elif drift.empty:
+                    st.success("✅ 本月目标累计值与提交日志一致。")
+                else:
+                    st.warning(f"⚠️ 发现 {len(drift)} 条不一致记录")
+                    st.dataframe(
+                        drift,
+                        column_config={
+                            "username": "用户名",
+                            "goal_completed": st.column_config.NumberColumn("目标表业绩", format="¥%.2f"),
+                            "logged_completed": st.column_config.NumberColumn("日志业绩", format="¥%.2f"),
+                            "completed_diff": st.column_config.NumberColumn("业绩差额", format="¥%.2f"),
+                            "goal_revenue": st.column_config.NumberColumn("目标表营收", format="¥%.2f"),
+                            "logged_revenue": st.column_config.NumberColumn("日志营收", format="¥%.2f"),
+                            "revenue_diff": st.column_config.NumberColumn("营收差额", format="¥%.2f"),
+                        },
+                        use_container_width=True,
+                        hide_index=True
+                    )
+            if col_rebuild.button("🔁 重建汇总数据", key="rebuild_rollup", help="按提交日志重新计算按日汇总"):
+                success, msg = db_manager.rebuild_performance_rollup()
+                if success:
+                    st.success(msg)
+                else:
+                    st.error(f"重建失败: {msg}")
+
+@metrics.timed("page")
 def render_submission_page(user):
     """
     渲染日报填写页面
@@ -648,10 +959,10 @@ def render_submission_page(user):
             report_date = st.date_input("日期", value=get_beijing_today(), format="YYYY/MM/DD")
 
         current_date_str = report_date.strftime("%Y-%m-%d")
-        last_plan, last_date = db_manager.get_previous_plan(user['full_name'], current_date_str)
+        last_report = db_manager.get_latest_report_before(user['full_name'], current_date_str)
         
-        if last_plan:
-            st.info(f"💡  昨日(**{last_date})制定的计划：**\n\n{last_plan}")
+        if last_report and last_report.get('next_plan'):
+            st.info(f"💡  昨日(**{last_report['report_date']})制定的计划：**\n\n{last_report['next_plan']}")
         
         # 检查今天是否已经提交过日报（可选优化，目前先只做提交后的状态切换）
         if 'submission_success' not in st.session_state:
@@ -708,14 +1019,21 @@ def show_report_details(row):
     st.markdown(f"### 📅 {row['report_date']} - {row['employee_name']}")
     st.markdown("---")
     
+    # 表格只包含摘要列，打开弹窗时才加载正文
+    with st.spinner("正在加载日报详情..."):
+        report = db_manager.get_report_by_id(int(row['id']))
+    if not report:
+        st.error("无法加载该日报详情，请稍后重试。")
+        return
+    
     st.markdown("#### ✅ 今日工作内容")
-    st.info(row['work_content'])
+    st.info(report['work_content'])
     
     st.markdown("#### 📅 明日工作计划")
-    st.warning(row['next_plan'] if row['next_plan'] else "（未填写）")
+    st.warning(report['next_plan'] if report['next_plan'] else "（未填写）")
     
     st.markdown("#### 🆘 困难/协助")
-    st.error(row['problems'] if row['problems'] else "（无）")
+    st.error(report['problems'] if report['problems'] else "（无）")
     
     # 格式化提交时间显示
     created_at_display = row['created_at']
@@ -724,6 +1042,41 @@ def show_report_details(row):
         
     st.caption(f"提交时间: {created_at_display}")
 
+def render_search_results(results, total, paging):
+    """
+    渲染全文搜索结果：按相关度排序的摘要列表，点击查看完整日报
+    """
+    if results.empty:
+        st.info("没有找到包含这些关键词的日报。")
+        return
+
+    results['created_at'] = transforms.to_beijing_time(results['created_at'])
+    for _, row in results.iterrows():
+        with st.container(border=True):
+            col_title, col_action = st.columns([5, 1])
+            with col_title:
+                st.markdown(f"**📅 {row['report_date']} · {row['employee_name']}**")
+                # 摘要已在数据库端转义 HTML，只保留 <mark> 高亮
+                st.markdown(row['snippet'] or "", unsafe_allow_html=True)
+            with col_action:
+                if st.button("查看详情", key=f"search_detail_{row['id']}", use_container_width=True):
+                    show_report_details(row)
+
+    # 翻页按钮
+    page_count = max((total + db_manager.SEARCH_PAGE_SIZE - 1) // db_manager.SEARCH_PAGE_SIZE, 1)
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ 上一页", key="search_prev", disabled=paging['page'] == 0, use_container_width=True):
+            paging['page'] -= 1
+            st.rerun()
+    with col_page:
+        st.markdown(f"<div style='text-align: center; padding-top: 6px;'>第 {paging['page'] + 1} / {page_count} 页</div>", unsafe_allow_html=True)
+    with col_next:
+        if st.button("下一页 ➡️", key="search_next", disabled=paging['page'] + 1 >= page_count, use_container_width=True):
+            paging['page'] += 1
+            st.rerun()
+
+@metrics.timed("page")
 def render_dashboard_page():
     """
     渲染汇总查看页面
@@ -737,75 +1090,143 @@ def render_dashboard_page():
         return
 
     is_admin = user.get('is_admin', False)
-    current_user_fullname = user.get('full_name')
 
-    df = db_manager.get_all_reports(username=current_user_fullname, is_admin=is_admin)
-    
-    # 顶部统计指标
-    if df.empty:
-        total_reports = 0
-        today_reports = 0
-    else:
-        total_reports = len(df)
-        # 确保列存在，防止报错
-        if 'report_date' in df.columns:
-            today_reports = len(df[df['report_date'] == get_beijing_today().strftime("%Y-%m-%d")])
-        else:
-            today_reports = 0
+    # 顶部统计指标 (只查数量，不拉取数据行) 和姓名列表并发加载
+    snap = snapshot.current()
+    today = get_beijing_today()
+    today_str = today.strftime("%Y-%m-%d")
+    window_start = (today - timedelta(days=STATS_WINDOW_DAYS - 1)).strftime("%Y-%m-%d")
+    calls = dict(
+        total=(db_manager.count_reports,),
+        today=functools.partial(db_manager.count_reports, report_date=today_str),
+        today_by_employee=(db_manager.get_report_counts_by_employee, today_str, today_str),
+        by_day=(db_manager.get_report_counts_by_day, window_start, today_str),
+        by_employee=(db_manager.get_report_counts_by_employee, window_start, today_str),
+    )
+    if snap is None:
+        calls['names'] = (db_manager.get_unique_names,)
+    header_data = db_manager.prefetch(**calls)
+    if snap is not None:
+        # 姓名列表取会话快照
+        header_data['names'] = snap.names
+    total_reports = header_data['total']
+    today_reports = header_data['today']
     
     with st.container(border=True):
-        m1, m2 = st.columns(2)
+        m1, m2, m3 = st.columns(3)
         m1.metric("累计日报总数", total_reports)
         m2.metric("今日新增日报", today_reports)
+        m3.metric("今日提交人数", len(header_data['today_by_employee']))
 
-    if df.empty:
-        st.info("暂无数据。请先填写日报。")
+    if total_reports == 0:
+        # 查询失败时顶部已有提示，不要误报为没有数据
+        if not resilience.run_notices():
+            st.info("暂无数据。请先填写日报。")
         return
 
+    # 提交统计 (数据库分组计数，与下方日报列表互不依赖)
+    with st.expander(f"📈 提交统计 (近 {STATS_WINDOW_DAYS} 天)"):
+        col_day, col_emp = st.columns([2, 1])
+        with col_day:
+            st.caption("每日提交数")
+            by_day = header_data['by_day']
+            if by_day.empty:
+                st.info("暂无数据")
+            else:
+                st.bar_chart(by_day.set_index('report_date')['reports'])
+        with col_emp:
+            st.caption("员工提交数")
+            by_employee = header_data['by_employee']
+            if by_employee.empty:
+                st.info("暂无数据")
+            else:
+                st.dataframe(
+                    by_employee.rename(columns={'employee_name': '姓名', 'reports': '日报数'}),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
     st.markdown("---")
 
     # 筛选区域 - 使用列布局优化
     st.markdown("### 🔍 筛选查询")
     
     with st.container(border=True):
+        search_query = st.text_input(
+            "全文搜索",
+            placeholder="搜索工作内容、明日计划、困难 (多个关键词用空格分隔)",
+            key="report_search",
+        ).strip()
+
         col_filter_1, col_filter_2, col_filter_3 = st.columns([1, 1, 1])
         
-        filtered_df = df.copy()
+        name_filter = None
+        date_filter = None
         
         with col_filter_1:
-            all_names = db_manager.get_unique_names(username=current_user_fullname, is_admin=is_admin)
+            all_names = header_data['names']
             if len(all_names) > 1:
                 selected_name = st.selectbox("员工姓名", ["全部"] + all_names)
             else:
                 selected_name = st.selectbox("员工姓名", all_names, disabled=True)
                 
             if selected_name != "全部" and selected_name is not None:
-                filtered_df = filtered_df[filtered_df['employee_name'] == selected_name]
+                name_filter = selected_name
 
         with col_filter_2:
             filter_date = st.date_input("选择日期", value=None, help="不选则显示全部日期")
             if filter_date:
-                filtered_df = filtered_df[filtered_df['report_date'] == filter_date.strftime("%Y-%m-%d")]
-                
-        with col_filter_3:
-            st.markdown(f"<div style='padding-top: 32px; text-align: right;'><b>当前展示: {len(filtered_df)} 条记录</b></div>", unsafe_allow_html=True)
-
-    # --- 时区转换逻辑 (提前到 filtered_df) ---
-    # 确保所有后续使用 (表格显示、详情弹窗、导出) 都使用正确的北京时间
-    if 'created_at' in filtered_df.columns and not filtered_df.empty:
-        filtered_df['created_at'] = pd.to_datetime(filtered_df['created_at'])
-        # 如果没有时区信息，假设它是 UTC 并添加时区；如果有，直接转为 Asia/Shanghai
-        filtered_df['created_at'] = filtered_df['created_at'].apply(
-            lambda x: x.tz_localize('UTC').tz_convert('Asia/Shanghai') if x.tzinfo is None else x.tz_convert('Asia/Shanghai')
-        )
+                date_filter = filter_date.strftime("%Y-%m-%d")
+
+        # 有搜索关键词时只展示搜索结果，不加载日报列表
+        if search_query:
+            search_paging = st.session_state.get('search_paging')
+            search_key = (search_query, name_filter, date_filter)
+            if not search_paging or search_paging['key'] != search_key:
+                search_paging = {'key': search_key, 'page': 0}
+                st.session_state['search_paging'] = search_paging
+            results, total = db_manager.search_reports(
+                search_query, employee_name=name_filter, report_date=date_filter, page=search_paging['page']
+            )
+            with col_filter_3:
+                st.markdown(f"<div style='padding-top: 32px; text-align: right;'><b>搜索到: {total} 条记录</b></div>", unsafe_allow_html=True)
+        else:
+            # --- 分页状态 ---
+            # cursors[i] 为第 i 页的起始游标，筛选条件变化时回到第一页
+            filters = (name_filter, date_filter)
+            paging = st.session_state.get('report_paging')
+            if not paging or paging['filters'] != filters:
+                paging = {'filters': filters, 'cursors': [None], 'index': 0}
+                st.session_state['report_paging'] = paging
+            page_index = paging['index']
+
+            # 筛选后的总数和当前页数据并发加载
+            page_data = db_manager.prefetch(
+                count=functools.partial(db_manager.count_reports, employee_name=name_filter, report_date=date_filter),
+                page=functools.partial(
+                    db_manager.get_reports_page,
+                    employee_name=name_filter, report_date=date_filter, cursor=paging['cursors'][page_index]
+                ),
+            )
+            page_df, next_cursor = page_data['page']
+
+            with col_filter_3:
+                st.markdown(f"<div style='padding-top: 32px; text-align: right;'><b>当前展示: {page_data['count']} 条记录</b></div>", unsafe_allow_html=True)
+
+    if search_query:
+        render_search_results(results, total, search_paging)
+        return
+
+    # --- 时区转换逻辑 ---
+    # 确保表格显示、详情弹窗都使用正确的北京时间
+    if 'created_at' in page_df.columns and not page_df.empty:
+        # 如果没有时区信息，假设它是 UTC；如果有，直接转为 Asia/Shanghai
+        page_df['created_at'] = transforms.to_beijing_time(page_df['created_at'])
 
     # 数据表格展示
     # 移动端优化：只展示关键摘要信息，详细内容点击查看
     st.info("👆 **提示：点击表格前面的复选框，即可查看完整日报详情**")
     
-    # 精简显示列，只保留最基础信息
-    display_df = filtered_df.copy()
-    
     # 构建表格配置
     column_config = {
         "report_date": st.column_config.DateColumn("汇报日期", format="YYYY-MM-DD", width="small"),
@@ -813,15 +1234,20 @@ def render_dashboard_page():
         "created_at": st.column_config.DatetimeColumn("提交时间", format="MM-DD HH:mm", width="small"),
     }
     
+    if page_df.empty:
+        st.info("没有符合条件的日报。")
+        return
+
     # 使用 selection_mode="single-row" 实现单选详情
     event = st.dataframe(
-        display_df[['report_date', 'employee_name', 'created_at']], 
+        page_df[['report_date', 'employee_name', 'created_at']], 
         use_container_width=True, 
         hide_index=True,
         column_config=column_config,
         height=500,
         on_select="rerun",
-        selection_mode="single-row"
+        selection_mode="single-row",
+        key=f"report_table_{page_index}"
     )
     
     if not is_admin:
@@ -829,48 +1255,76 @@ def render_dashboard_page():
             "<style>[data-testid='stDataFrame'] [aria-label='Download as CSV']{display:none !important}</style>",
             unsafe_allow_html=True
         )
+
+    # 翻页按钮
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ 上一页", disabled=page_index == 0, use_container_width=True):
+            paging['index'] -= 1
+            st.rerun()
+    with col_page:
+        st.markdown(f"<div style='text-align: center; padding-top: 6px;'>第 {page_index + 1} 页</div>", unsafe_allow_html=True)
+    with col_next:
+        if st.button("下一页 ➡️", disabled=next_cursor is None, use_container_width=True):
+            del paging['cursors'][page_index + 1:]
+            paging['cursors'].append(next_cursor)
+            paging['index'] += 1
+            st.rerun()
     
-    # 处理选中事件
+    # 处理选中事件：弹窗内按 id 懒加载正文
     if event.selection.rows:
         selected_index = event.selection.rows[0]
-        # 注意：这里需要从原始 filtered_df 中获取数据，因为 display_df 可能是经过排序或筛选的
-        # 但 st.dataframe 返回的 index 是基于当前展示数据的 index
-        # 简单起见，我们直接用 iloc 获取
-        selected_row = filtered_df.iloc[selected_index]
+        selected_row = page_df.iloc[selected_index]
         show_report_details(selected_row)
     
-    if is_admin and not filtered_df.empty:
-        export_cols = ['report_date', 'employee_name', 'work_content', 'next_plan', 'problems', 'created_at']
-        export_cols = [c for c in export_cols if c in filtered_df.columns]
-        export_df = filtered_df[export_cols].rename(columns={
-            "report_date": "汇报日期",
-            "employee_name": "员工姓名",
-            "work_content": "今日工作内容",
-            "next_plan": "明日工作计划",
-            "problems": "遇到的困难/协助",
-            "created_at": "提交时间"
-        })
-        csv_data = export_df.to_csv(index=False).encode('utf-8-sig')
-        col_export_1, col_export_2 = st.columns([4, 1])
+    if is_admin:
+        # 导出文件在点击按钮时才生成：按页读取数据库，逐批写入临时文件
+        # 注意 Streamlit 随后会把整个文件读入内存再提供下载，文件大小即这部分内存占用
+        def iter_export_rows():
+            return db_manager.iter_reports(
+                employee_name=name_filter, report_date=date_filter, columns=", ".join(export.EXPORT_COLUMNS)
+            )
+
+        col_export_1, col_export_2, col_export_3 = st.columns([3, 1, 1])
         with col_export_2:
             st.download_button(
-                label="📥 导出为 Excel (CSV)",
-                data=csv_data,
+                label="📥 导出为 CSV",
+                data=lambda: export.build_csv(iter_export_rows()),
                 file_name=f"daily_reports_{date.today()}.csv",
                 mime="text/csv",
+                use_container_width=True
+            )
+        with col_export_3:
+            st.download_button(
+                label="📥 导出为 Excel",
+                data=lambda: export.build_xlsx(iter_export_rows()),
+                file_name=f"daily_reports_{date.today()}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 type="primary",
                 use_container_width=True
             )
 
+# 配置了 METRICS_PORT 时在本进程提供 /metrics (只启动一次)
+metrics.start_exporter()
+
 def main():
     """
     主程序逻辑
     """
+    # 收集本次运行中数据库调用的失败 / 降级提示和耗时
+    resilience.begin_run()
+    metrics.begin_run()
+
+    if not st.session_state['authenticated']:
+        restore_session()
+    sync_session_cookie()
     if not st.session_state['authenticated']:
         login_page()
         return
 
     user = st.session_state['user_info']
+    # 会话快照：缺失时加载，过期时增量刷新；页面切换直接读内存
+    snap = snapshot.current(user)
     
     # --- 顶部导航栏区域 ---
     # st.markdown('<div class="top-nav-container">', unsafe_allow_html=True)
@@ -914,8 +1368,7 @@ def main():
                 # 使用 key 来区分不同按钮
                 if st.button(option, key=f"nav_btn_{i}", type=btn_type, use_container_width=True):
                     if option == "退出登录":
-                        st.session_state['authenticated'] = False
-                        st.session_state['user_info'] = None
+                        end_session()
                         st.session_state['current_page'] = "本月目标" # 重置页面
                         st.rerun()
                     else:
@@ -960,11 +1413,16 @@ def main():
                 <div style="font-size: 11px; color: #666; background: rgba(0,0,0,0.05); padding: 2px 8px; border-radius: 10px; display: inline-block; white-space: nowrap;">{user.get('department', '员工')}</div>
             </div>
             """, unsafe_allow_html=True)
+            if st.button("🔄 刷新数据", key="refresh_snapshot", help="增量加载其他人新提交的数据"):
+                snap.refresh()
+                st.toast("数据已刷新", icon="🔄")
             
     # st.markdown('</div>', unsafe_allow_html=True)
 
     # --- 页面内容渲染 (基于 current_page) ---
     current_page = st.session_state.get('current_page', "本月目标")
+    # 数据服务异常提示显示在页面内容上方，页面渲染完成后填充
+    notice_area = st.container()
     
     if current_page == "本月目标":
         render_monthly_goal_page(user)
@@ -976,6 +1434,12 @@ def main():
         render_password_page(user)
     elif current_page == "用户管理":
         render_admin_page()
+
+    render_backend_notices(notice_area)
+
+    if user.get('is_admin', False):
+        if st.toggle("⏱️ 性能面板", key="show_timing_panel", help="显示本次页面运行中各数据库调用的耗时"):
+            render_timing_panel()
         
     # --- 底部版权信息 ---
     st.markdown("""
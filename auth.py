@@ -0,0 +1,478 @@
+"""
+登录认证
+- 密码以 scrypt 哈希保存，格式: scrypt$<n>$<r>$<p>$<盐>$<哈希> (base64)；参数随哈希保存，调整参数后旧哈希仍可验证，并在下次登录时按新参数重新计算
+- 旧数据中的明文密码仍可登录，登录成功后自动替换为哈希；也可以一次性迁移: python auth.py migrate-passwords
+- 登录限流 (进程内存)：同一用户名 / IP 连续失败过多时暂时锁定，全局令牌桶限制每秒登录尝试次数，超限的请求不访问数据库
+- 会话令牌：登录成功后签发 HMAC 签名、带过期时间的令牌，保存在浏览器 Cookie 中，刷新页面时凭令牌恢复登录状态，无需再查询数据库
+  令牌是持有即可登录的凭据，不放在 URL 里 (链接会被分享，也会留在浏览器历史和代理 / 访问日志中)；
+  Cookie 由页面脚本写入，不是 HttpOnly，页面存在 XSS 时可被读取，因此有效期较短 (SESSION_TOKEN_TTL)
+- 会话吊销：退出登录吊销当前令牌，修改 / 重置密码吊销该用户的全部令牌；
+  吊销记录保存在 session_revocations 表，各进程在内存中保留一份并定期增量刷新
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+# --- 密码哈希 ---
+# scrypt 参数：n=2^14, r=8 约占 16 MB 内存，单核约 70 ms，兼顾安全性和登录高峰时的响应速度
+SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", "1"))
+SALT_BYTES = 16
+HASH_BYTES = 32
+HASH_PREFIX = "scrypt$"
+# 同时计算哈希的线程数：限制登录高峰时的内存占用 (每个约 128 * n * r 字节)
+HASH_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_CONCURRENCY", str(os.cpu_count() or 2)))
+# 管理员重置密码时生成的临时密码长度
+TEMP_PASSWORD_LENGTH = 10
+
+# --- 登录限流 ---
+LOGIN_MAX_FAILURES = int(os.environ.get("LOGIN_MAX_FAILURES", "5"))
+# 同一 IP 的失败次数上限 (公司内网常共用一个出口 IP，阈值需要更高)
+LOGIN_MAX_IP_FAILURES = int(os.environ.get("LOGIN_MAX_IP_FAILURES", "50"))
+LOGIN_FAILURE_WINDOW = float(os.environ.get("LOGIN_FAILURE_WINDOW", "300"))
+LOGIN_LOCKOUT = float(os.environ.get("LOGIN_LOCKOUT", "300"))
+# 全局令牌桶：平均每秒允许的登录尝试次数及突发上限
+LOGIN_RATE = float(os.environ.get("LOGIN_RATE", "20"))
+LOGIN_BURST = float(os.environ.get("LOGIN_BURST", "40"))
+# 最多跟踪的用户名 / IP 数，超出时丢弃最久未出现的
+LOGIN_TRACKED_KEYS = 10000
+
+# --- 会话令牌 ---
+SESSION_TOKEN_TTL = float(os.environ.get("SESSION_TOKEN_TTL", str(12 * 3600)))
+SESSION_COOKIE = "mtpdr_session"
+# 令牌中保存的用户字段 (不含密码)
+TOKEN_USER_FIELDS = ("username", "full_name", "department", "is_admin")
+TOKEN_CACHE_SIZE = 1024
+# 从数据库加载吊销记录的间隔 (秒)
+DENYLIST_REFRESH_INTERVAL = float(os.environ.get("SESSION_DENYLIST_REFRESH", "30"))
+# 启动后首次加载吊销记录完成前，检查令牌最多等待的秒数 (超时按已吊销处理)
+DENYLIST_READY_TIMEOUT = float(os.environ.get("SESSION_DENYLIST_READY_TIMEOUT", "3"))
+# 首次加载失败后的重试间隔 (秒)
+DENYLIST_RETRY_INTERVAL = 5
+
+_hash_slots = threading.BoundedSemaphore(max(HASH_CONCURRENCY, 1))
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    with _hash_slots:
+        return hashlib.scrypt(
+            password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r * p + 1024 * 1024, dklen=HASH_BYTES,
+        )
+
+def hash_password(password):
+    """
+    计算密码哈希 (用于写入 users.password)
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{HASH_PREFIX}{SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+def hash_passwords(passwords):
+    """
+    批量计算哈希 (批量导入用户时使用)；hashlib.scrypt 计算时释放 GIL，多核上并行执行
+    """
+    passwords = list(passwords)
+    if len(passwords) <= 1:
+        return [hash_password(password) for password in passwords]
+    with ThreadPoolExecutor(max_workers=max(HASH_CONCURRENCY, 1), thread_name_prefix="password-hash") as pool:
+        return list(pool.map(hash_password, passwords))
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(HASH_PREFIX)
+
+def verify_password(password, stored):
+    """
+    校验密码，返回 (是否正确, 是否需要重新计算哈希)
+    明文 (旧数据) 或参数与当前配置不同的哈希在校验成功时需要重新计算
+    """
+    if not stored or password is None:
+        return False, False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), str(stored).encode("utf-8")), True
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = _b64decode(digest)
+        actual = _scrypt(password, _b64decode(salt), n, r, p)
+    except (ValueError, TypeError) as e:
+        print(f"Invalid password hash: {e}")
+        return False, False
+    ok = hmac.compare_digest(actual, expected)
+    return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def generate_password(length=TEMP_PASSWORD_LENGTH):
+    """
+    生成随机临时密码 (不含容易混淆的字符)
+    """
+    alphabet = "abcdefghjkmnpqrstuvwxyzABCDEFGHJKMNPQRSTUVWXYZ23456789"
+    return "".join(secrets.choice(alphabet) for _ in range(length))
+
+# --- 登录限流 ---
+class LoginThrottle:
+    """
+    进程内的登录尝试限制
+    - 按键 (如 "user:zhangsan"、"ip:1.2.3.4") 统计最近 window 秒内的失败次数，
+      用户名达到 max_failures、IP 达到 max_ip_failures 后锁定 lockout 秒
+    - 全局令牌桶限制所有登录尝试的速率，防止大量不同用户名的撞库请求打到数据库
+    """
+    def __init__(self, max_failures=LOGIN_MAX_FAILURES, max_ip_failures=LOGIN_MAX_IP_FAILURES,
+                 window=LOGIN_FAILURE_WINDOW, lockout=LOGIN_LOCKOUT,
+                 rate=LOGIN_RATE, burst=LOGIN_BURST, max_keys=LOGIN_TRACKED_KEYS):
+        self.max_failures = max_failures
+        self.max_ip_failures = max_ip_failures
+        self.window = window
+        self.lockout = lockout
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()  # 键 -> [失败时间, ...]
+        self._locked_until = {}         # 键 -> 解锁时间
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+
+    def locked_for(self, *keys):
+        """
+        这些键还需锁定的秒数 (0 表示未锁定)；不看全局令牌，只查询
+        """
+        now = time.monotonic()
+        with self._lock:
+            return max([self._locked_until.get(key, 0) - now for key in keys if key] + [0])
+
+    def retry_after(self, *keys):
+        """
+        还需等待的秒数 (键被锁定或全局令牌耗尽，0 表示允许)；只查询，不计入尝试次数
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = max([self._locked_until.get(key, 0) - now for key in keys if key] + [0])
+            tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / self.rate)
+            return wait
+
+    def acquire(self, *keys):
+        """
+        开始一次登录尝试：返回需等待的秒数，0 表示允许 (并消耗一个全局令牌)
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = max([self._locked_until.get(key, 0) - now for key in keys if key] + [0])
+            if wait > 0:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            return 0
+
+    def failure(self, *keys):
+        """
+        记录一次失败的登录
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in filter(None, keys):
+                attempts = [t for t in self._failures.pop(key, []) if now - t < self.window]
+                attempts.append(now)
+                self._failures[key] = attempts
+                limit = self.max_ip_failures if key.startswith("ip:") else self.max_failures
+                if len(attempts) >= limit:
+                    self._locked_until[key] = now + self.lockout
+                    self._failures.pop(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+            for key in [k for k, until in self._locked_until.items() if until <= now]:
+                del self._locked_until[key]
+
+    def success(self, *keys):
+        """
+        登录成功：清除这些键的失败记录
+        """
+        with self._lock:
+            for key in filter(None, keys):
+                self._failures.pop(key, None)
+                self._locked_until.pop(key, None)
+
+throttle = LoginThrottle()
+
+def throttle_keys(username, client_ip=None):
+    return (f"user:{username.strip().lower()}", f"ip:{client_ip}" if client_ip else None)
+
+# --- 会话令牌 ---
+_generated_secret = None
+_token_cache_lock = threading.Lock()
+_token_cache = OrderedDict()  # 令牌 -> 声明
+
+def _secret():
+    """
+    签名密钥：配置项 AUTH_SECRET (Streamlit secrets 或环境变量)
+    未配置时每个进程随机生成一个，进程重启后已签发的令牌失效，多进程部署时必须配置
+    """
+    global _generated_secret
+    try:
+        secret = st.secrets["AUTH_SECRET"]
+    except Exception:
+        secret = os.environ.get("AUTH_SECRET")
+    if secret:
+        return str(secret).encode("utf-8")
+    if _generated_secret is None:
+        print("AUTH_SECRET is not configured; session tokens will not survive a restart")
+        _generated_secret = secrets.token_bytes(32)
+    return _generated_secret
+
+def _sign(payload):
+    return _b64encode(hmac.new(_secret(), payload.encode("ascii"), hashlib.sha256).digest())
+
+def issue_token(user, ttl=SESSION_TOKEN_TTL):
+    """
+    为登录用户签发会话令牌；sid 用于单独吊销该会话，iat (签发时间) 用于吊销该用户之前的全部会话
+    """
+    claims = {field: user.get(field) for field in TOKEN_USER_FIELDS}
+    now = time.time()
+    claims['sid'] = secrets.token_urlsafe(12)
+    claims['iat'] = round(now, 3)
+    claims['exp'] = int(now + ttl)
+    payload = _b64encode(json.dumps(claims, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+def token_claims(token):
+    """
+    校验令牌签名和有效期，返回全部声明 (用户字段、sid、iat、exp)；无效时返回 None
+    校验结果缓存在进程内，同一令牌再次校验时只比较过期时间
+    """
+    # 令牌来自 Cookie，可能是任意字符串；合法令牌只含 base64url 字符和 "."，非 ASCII 的直接拒绝
+    # (否则签名计算时 encode("ascii") / compare_digest 会抛出异常)
+    if not token or not isinstance(token, str) or not token.isascii():
+        return None
+    now = time.time()
+    with _token_cache_lock:
+        claims = _token_cache.get(token)
+        if claims is not None:
+            _token_cache.move_to_end(token)
+    if claims is None:
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        with _token_cache_lock:
+            _token_cache[token] = claims
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+    if claims.get('exp', 0) <= now:
+        return None
+    return dict(claims)
+
+def read_token(token):
+    """
+    校验令牌，返回其中的用户信息；签名错误、已过期或已吊销时返回 None
+    只读内存中的吊销列表，不查询数据库；列表首次加载完成前按已吊销处理 (见 SessionDenylist)
+    """
+    claims = token_claims(token)
+    if claims is None or denylist.is_revoked(claims):
+        return None
+    return {field: claims.get(field) for field in TOKEN_USER_FIELDS}
+
+# --- 会话 Cookie ---
+def session_cookie():
+    """
+    读取浏览器发送的会话令牌；Streamlit 只提供建立连接时的 Cookie，同一会话期间不会变化
+    """
+    try:
+        return st.context.cookies.get(SESSION_COOKIE)
+    except Exception:
+        return None
+
+def write_session_cookie(token):
+    """
+    在页面中写入会话 Cookie，token 为空时删除
+    Streamlit 不能设置 HTTP 响应头，只能由脚本写入：SameSite=Strict，HTTPS 下加 Secure
+    """
+    if token:
+        cookie = f"{SESSION_COOKIE}={token}; Path=/; Max-Age={int(SESSION_TOKEN_TTL)}; SameSite=Strict"
+    else:
+        cookie = f"{SESSION_COOKIE}=; Path=/; Max-Age=0; SameSite=Strict"
+    # 令牌只含 base64url 字符和 "."，json.dumps 后可以直接放进脚本
+    st.html(
+        f"<script>document.cookie = {json.dumps(cookie)} + "
+        "(window.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        unsafe_allow_javascript=True,
+    )
+
+# --- 会话吊销 ---
+def _epoch(value):
+    """
+    时间戳 (datetime / ISO 字符串，无时区时按 UTC) 转为 Unix 时间
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def revocation(username, sid=None, expires_at=None):
+    """
+    构造一条吊销记录：指定 sid 时吊销单个会话 (expires_at 为该令牌的过期时间)，
+    否则吊销该用户此前签发的全部会话
+    """
+    now = datetime.now(timezone.utc)
+    if expires_at is None:
+        expires_at = now + timedelta(seconds=SESSION_TOKEN_TTL)
+    elif not isinstance(expires_at, datetime):
+        expires_at = datetime.fromtimestamp(expires_at, timezone.utc)
+    return {'sid': sid, 'username': username, 'revoked_at': now, 'expires_at': expires_at}
+
+class SessionDenylist:
+    """
+    已吊销会话的内存副本
+    - 注册 loader 时启动后台线程：立即加载一次，之后每隔 refresh_interval 秒按 id 增量加载数据库中新增的吊销记录
+    - 检查令牌只读内存，不查询数据库；首次加载完成前最多等待 ready_timeout 秒，仍未完成时按已吊销处理
+    - 本进程发起的吊销立即生效，其他进程 (多实例部署) 最迟在下次刷新后生效
+    - 加载失败时继续使用已有的列表，下个周期再试 (数据服务故障时不影响已登录用户)
+    """
+    def __init__(self, refresh_interval=DENYLIST_REFRESH_INTERVAL, ready_timeout=DENYLIST_READY_TIMEOUT):
+        self.refresh_interval = refresh_interval
+        self.ready_timeout = ready_timeout
+        self._loader = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._sids = {}          # sid -> 过期时间
+        self._cutoffs = {}       # 用户名 -> (吊销时间, 过期时间)
+        self._last_id = 0
+        self._generation = 0     # clear() 时加一，作废清空前开始的加载
+        self._ready = threading.Event()
+        self._ready.set()        # 没有 loader 时无需加载
+        self._wake = threading.Event()
+        self._thread = None
+
+    def set_loader(self, loader):
+        """
+        loader(after_id) 返回 id 大于 after_id 且未过期的吊销记录: [{'id', 'sid', 'username', 'revoked_at', 'expires_at'}, ...]
+        查询失败时返回 None
+        """
+        with self._lock:
+            self._loader = loader
+            self._ready.clear()
+        self._wake.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-denylist", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            self.refresh()
+            # 首次加载失败时尽快重试，在此之前恢复会话都会被拒绝
+            interval = self.refresh_interval if self._ready.is_set() else min(self.refresh_interval, DENYLIST_RETRY_INTERVAL)
+            self._wake.wait(interval)
+
+    def add(self, row):
+        with self._lock:
+            self._add(row)
+
+    def _add(self, row):
+        expires_at = _epoch(row['expires_at'])
+        if row.get('sid'):
+            self._sids[row['sid']] = expires_at
+        else:
+            revoked_at = _epoch(row['revoked_at'])
+            current = self._cutoffs.get(row['username'])
+            if current is None or current[0] < revoked_at:
+                self._cutoffs[row['username']] = (revoked_at, expires_at)
+        if row.get('id'):
+            self._last_id = max(self._last_id, row['id'])
+
+    def clear(self):
+        """
+        清空内存中的列表，由后台线程从头重新加载 (切换数据库或测试时使用)
+        """
+        with self._lock:
+            self._sids, self._cutoffs = {}, {}
+            self._last_id = 0
+            self._generation += 1
+            if self._loader is not None:
+                self._ready.clear()
+        self._wake.set()
+
+    def refresh(self):
+        """
+        立即增量加载一次，成功时返回 True (由后台线程定期调用；本进程吊销后也调用，顺带加载其他进程的记录)
+        """
+        if self._loader is None:
+            return False
+        with self._refresh_lock:
+            with self._lock:
+                generation, after_id = self._generation, self._last_id
+            try:
+                rows = self._loader(after_id)
+            except Exception as e:
+                print(f"Session denylist refresh error: {e}")
+                return False
+            if rows is None:
+                return False
+            with self._lock:
+                if generation != self._generation:
+                    # 加载期间列表被清空 (可能已切换数据库)，结果作废
+                    return False
+                for row in rows:
+                    self._add(row)
+                self._purge()
+                self._ready.set()
+            return True
+
+    def _purge(self):
+        now = time.time()
+        self._sids = {sid: exp for sid, exp in self._sids.items() if exp > now}
+        self._cutoffs = {name: cutoff for name, cutoff in self._cutoffs.items() if cutoff[1] > now}
+
+    def is_revoked(self, claims):
+        if not self._ready.wait(self.ready_timeout):
+            # 还没加载过吊销记录，无法确认令牌未被吊销
+            print("Session denylist not loaded, rejecting token")
+            return True
+        with self._lock:
+            if claims.get('sid') in self._sids:
+                return True
+            cutoff = self._cutoffs.get(claims.get('username'))
+        # 没有 iat 的令牌 (旧版本签发) 视为最早签发
+        return cutoff is not None and claims.get('iat', 0) <= cutoff[0]
+
+denylist = SessionDenylist()
+
+def migrate_passwords():
+    """
+    将数据库中剩余的明文密码全部替换为哈希，返回处理的用户数
+    """
+    import db_manager
+    return db_manager.hash_plaintext_passwords()
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate-passwords"]:
+        print(f"Hashed {migrate_passwords()} plaintext password(s)")
+    else:
+        print("Usage: python auth.py migrate-passwords")
+        sys.exit(2)
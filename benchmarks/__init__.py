@@ -0,0 +1,14 @@
+"""
+性能基准测试
+- seed.py: 生成 SQLite 测试库 (users / reports / monthly_goals / performance_logs)，规模 1k / 100k / 1m 行
+- run.py: 逐个调用 db_manager 的函数，并用 Streamlit AppTest 无界面渲染各页面，
+  统计耗时分位数、内存峰值和数据库请求次数，结果保存为 JSON
+- coldstart.py: 每轮启动新进程，统计 import streamlit 到登录页 / 恢复会话后首次渲染完成的时间、内存和已加载的重量级依赖
+- compare.py: 比较两次运行的结果
+
+用法 (在仓库根目录执行):
+    python -m benchmarks.run --size 1k
+    python -m benchmarks.run --size 100k --only "reports|search" --no-pages
+    python -m benchmarks.coldstart --runs 5
+    python -m benchmarks.compare benchmarks/results/旧.json benchmarks/results/新.json
+"""
@@ -0,0 +1,207 @@
+"""
+冷启动基准测试：每轮启动一个新的 Python 进程，统计从 import streamlit 到首次渲染完成的时间
+- login_page: 未登录，渲染登录页 (新访客打开页面)
+- restore_session: 浏览器带着会话 Cookie，恢复登录后渲染默认页面 (已登录用户刷新页面 / 服务重启后的第一个请求)
+子进程分别记录 import streamlit、导入 AppTest 和第一次 at.run() 的耗时、进程内存峰值 (ru_maxrss)
+以及运行结束时已加载的重量级依赖；结果格式与 run.py 相同，可用 benchmarks.compare 比较
+(peak_memory_kb 为子进程的 ru_maxrss)
+    python -m benchmarks.coldstart --runs 5
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+SCENARIOS = ["login_page", "restore_session"]
+# 冷启动时值得关注的依赖：登录页不应加载其中任何一个
+HEAVY_MODULES = ["pandas", "numpy", "supabase", "postgrest", "httpx", "openpyxl", "xlsxwriter", "PIL"]
+TOKEN_ENV = "BENCH_SESSION_TOKEN"
+CHILD_TIMEOUT = 300
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+def _child(scenario):
+    """
+    在子进程中运行；只使用标准库，计时从第一个第三方导入开始
+    """
+    import resource
+
+    started = time.perf_counter()
+    import streamlit
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    imported = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    harness = time.perf_counter()
+
+    at = AppTest.from_file(APP_PATH, default_timeout=CHILD_TIMEOUT)
+    if scenario == "restore_session":
+        # AppTest 不能携带 Cookie，替换读取 Cookie 的函数 (auth 很轻，计入首次运行的耗时)
+        import auth
+        token = os.environ[TOKEN_ENV]
+        auth.session_cookie = lambda: token
+    at.run()
+    finished = time.perf_counter()
+
+    error = at.exception[0].message if at.exception else None
+    if scenario == "restore_session" and not at.session_state['authenticated']:
+        error = error or "session was not restored"
+    metrics = sys.modules.get("metrics")
+    print(json.dumps({
+        'import_streamlit_ms': (imported - started) * 1000,
+        'import_apptest_ms': (harness - imported) * 1000,
+        'first_run_ms': (finished - harness) * 1000,
+        'total_ms': (finished - started) * 1000,
+        # Linux 上单位为 KB
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'backend_calls': metrics.counter_total("calls_total", kind="backend") if metrics else 0,
+        'modules': [name for name in HEAVY_MODULES if name in sys.modules],
+        'error': error,
+    }))
+
+def _spawn(scenario, env):
+    """
+    启动一个子进程运行场景，返回其结果；子进程失败时返回带 error 的结果
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "benchmarks.coldstart", "--child", scenario],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT)
+    elapsed = (time.perf_counter() - started) * 1000
+    # 应用本身可能向标准输出打印日志，结果是最后一行
+    lines = result.stdout.strip().splitlines()
+    try:
+        sample = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        stderr = result.stderr.strip().splitlines()
+        sample = {'error': stderr[-1] if stderr else f"exit status {result.returncode}"}
+    sample['process_ms'] = elapsed
+    return sample
+
+def _summary(scenario, samples):
+    from benchmarks.run import _percentile
+
+    ok = [s for s in samples if not s.get('error')]
+    errors = [s['error'] for s in samples if s.get('error')]
+    case = {
+        'group': "coldstart",
+        'name': scenario,
+        'mode': "cold",
+        'iterations': len(samples),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+    if not ok:
+        return case
+
+    def p50(field):
+        return round(_percentile([s[field] for s in ok], 50), 3)
+
+    totals = [s['total_ms'] for s in ok]
+    case.update({
+        'p50_ms': round(_percentile(totals, 50), 3),
+        'p90_ms': round(_percentile(totals, 90), 3),
+        'p99_ms': round(_percentile(totals, 99), 3),
+        'mean_ms': round(sum(totals) / len(totals), 3),
+        'min_ms': round(min(totals), 3),
+        'max_ms': round(max(totals), 3),
+        'peak_memory_kb': round(_percentile([s['max_rss_kb'] for s in ok], 50), 1),
+        'backend_calls': round(sum(s['backend_calls'] for s in ok) / len(ok), 2),
+        'import_streamlit_p50_ms': p50('import_streamlit_ms'),
+        'import_apptest_p50_ms': p50('import_apptest_ms'),
+        'first_run_p50_ms': p50('first_run_ms'),
+        'process_p50_ms': p50('process_ms'),
+        'modules': ok[-1]['modules'],
+    })
+    return case
+
+def run(size, runs, scenarios=SCENARIOS, reseed=False, seed_value=None):
+    from benchmarks import seed
+    from benchmarks.run import _configure, _git
+
+    seed_value = seed.DEFAULT_SEED if seed_value is None else seed_value
+    path, meta = seed.ensure(size, seed_value, reseed)
+    _configure(path)
+    # 父进程签发的令牌要能被子进程校验
+    os.environ.setdefault("AUTH_SECRET", "coldstart-benchmark")
+
+    import auth
+    import db_manager
+
+    user = db_manager.login_user(seed.ADMIN_USERNAME, seed.PASSWORD)
+    if not user:
+        raise RuntimeError("Benchmark admin user not found")
+    env = dict(os.environ, **{TOKEN_ENV: auth.issue_token(user)})
+
+    # 先运行一次，生成 .pyc 并预热操作系统的文件缓存 (不计入结果)
+    _spawn(scenarios[0], env)
+
+    started = time.perf_counter()
+    results = []
+    for scenario in scenarios:
+        case = _summary(scenario, [_spawn(scenario, env) for _ in range(runs)])
+        results.append(case)
+        if 'p50_ms' in case:
+            print(f"coldstart {case['name']:<16} p50 {case['p50_ms']:>9.1f} ms  "
+                  f"(streamlit {case['import_streamlit_p50_ms']:.1f} + apptest {case['import_apptest_p50_ms']:.1f} "
+                  f"+ first run {case['first_run_p50_ms']:.1f})  rss {case['peak_memory_kb'] / 1024:.1f} MB  "
+                  f"loaded: {', '.join(case['modules']) or '-'}"
+                  + (f"  errors {case['errors']}" if case['errors'] else ""))
+        else:
+            print(f"coldstart {case['name']:<16} failed: {case['first_error']}")
+
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'git_commit': _git("rev-parse", "--short", "HEAD"),
+            'git_dirty': bool(_git("status", "--porcelain", "--untracked-files=no")),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': "sqlite",
+            'size': size,
+            'seed': meta['seed'],
+            'anchor': meta['anchor'],
+            'tables': meta['tables'],
+            'iterations': runs,
+            'filter': None,
+        },
+        'process': {
+            'seconds': round(time.perf_counter() - started, 2),
+        },
+        'cases': results,
+    }
+
+def main():
+    # 不在模块开头导入：子进程也会加载本模块，benchmarks.seed 会导入 streamlit
+    from benchmarks import seed
+
+    parser = argparse.ArgumentParser(description="Streamlit 应用冷启动基准测试")
+    parser.add_argument("--size", choices=seed.SIZES, default="1k")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景启动的进程数")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="只运行指定场景 (可重复)")
+    parser.add_argument("--reseed", action="store_true", help="重新生成测试数据库")
+    parser.add_argument("--seed", type=int, default=seed.DEFAULT_SEED)
+    parser.add_argument("--output", help="结果文件 (默认 benchmarks/results/<时间>_<提交>_coldstart.json)")
+    args = parser.parse_args()
+
+    from benchmarks.run import RESULTS_DIR
+
+    report = run(args.size, max(args.runs, 1), args.scenario or SCENARIOS, args.reseed, args.seed)
+    output = args.output
+    if not output:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['meta']['git_commit'] or 'nogit'}_coldstart.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    # 子进程在导入 benchmarks.seed (会导入 streamlit) 之前分流
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        _child(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,73 @@
+"""
+比较两次基准测试的结果
+    python -m benchmarks.compare 旧.json 新.json [--threshold 10] [--min-delta-ms 1] [--fail-on-regression]
+按 (测试项, 模式) 对齐，输出 p50 / p90 / 内存峰值 / 请求次数的变化；
+p50 变慢超过阈值 (百分比) 且超过最小差值 (毫秒，排除亚毫秒级的计时噪声) 的项标记为 REGRESSION
+"""
+import argparse
+import json
+import sys
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+def _format_change(change):
+    return "      -" if change is None else f"{change:+6.1f}%"
+
+def compare(before, after, threshold, min_delta_ms=1.0):
+    """
+    返回 (输出行, 变慢的项)
+    """
+    old = {(c['group'], c['name'], c['mode']): c for c in before['cases']}
+    lines, regressions = [], []
+    for case in after['cases']:
+        key = (case['group'], case['name'], case['mode'])
+        base = old.get(key)
+        label = f"{case['group']:<5} {case['name']:<32} {case['mode']:<5}"
+        if base is None:
+            lines.append(f"{label} (new)")
+            continue
+        p50 = _change(base['p50_ms'], case['p50_ms'])
+        flag = ""
+        if p50 is not None and p50 > threshold and case['p50_ms'] - base['p50_ms'] > min_delta_ms:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        lines.append(
+            f"{label} p50 {base['p50_ms']:>9.2f} -> {case['p50_ms']:>9.2f} ms {_format_change(p50)}  "
+            f"p90 {_format_change(_change(base['p90_ms'], case['p90_ms']))}  "
+            f"peak {_format_change(_change(base['peak_memory_kb'], case['peak_memory_kb']))}  "
+            f"calls {base['backend_calls']:g} -> {case['backend_calls']:g}{flag}"
+        )
+    return lines, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="比较两次基准测试结果")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p50 变慢超过该百分比视为退化")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="p50 变慢不超过该毫秒数时不视为退化")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在退化时以状态码 1 退出")
+    args = parser.parse_args()
+
+    before, after = _load(args.before), _load(args.after)
+    for side, report in (("before", before), ("after", after)):
+        meta = report['meta']
+        print(f"{side}: {meta['git_commit']}{' (dirty)' if meta.get('git_dirty') else ''} "
+              f"size={meta['size']} started={meta['started_at']}")
+    if before['meta'].get('tables') != after['meta'].get('tables'):
+        print("warning: the two runs used different data sets")
+
+    lines, regressions = compare(before, after, args.threshold, args.min_delta_ms)
+    print("\n".join(lines))
+    print(f"{len(regressions)} regression(s) over {args.threshold:g}%")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+运行基准测试并保存结果
+- db: 逐个调用 db_manager 的函数；读操作分别在清空进程缓存后 (cold) 和缓存已填充时 (warm) 计时
+- page: 用 Streamlit AppTest 无界面运行 app.py 的各个页面 (管理员登录状态，每次都是新会话)
+- 每项统计耗时分位数 (p50 / p90 / p99)、tracemalloc 内存峰值和平均数据库请求次数 (metrics 中 backend 层的调用数)
+- 结果写入 benchmarks/results/<时间>_<提交>_<规模>.json，可用 benchmarks.compare 比较
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+import streamlit.logger
+
+from benchmarks import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+APP_PATH = os.path.join(ROOT, "app.py")
+PAGES = ["本月目标", "填写日报", "查看汇总", "修改密码", "用户管理"]
+PAGE_TIMEOUT = 120
+
+class Case:
+    """
+    一个测试项；write=True 的项会修改数据，只计时一轮 (不区分 cold / warm)
+    """
+    def __init__(self, group, name, func, write=False):
+        self.group = group
+        self.name = name
+        self.func = func
+        self.write = write
+
+def _configure(path):
+    # 必须在导入 db_manager 之前设置
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = path
+    os.environ.setdefault("REPORT_CACHE", "0")
+    # 计时期间不输出每次调用的日志和 Streamlit 的无界面运行警告
+    os.environ.setdefault("METRICS_LOG_LEVEL", "ERROR")
+    streamlit.logger.set_log_level("error")
+
+def _consume(iterable):
+    return sum(1 for _ in iterable)
+
+def db_cases(meta):
+    import db_manager as d
+
+    anchor = date.fromisoformat(meta['anchor'])
+    month = meta['months'][0]
+    today = anchor.isoformat()
+    start = (anchor - timedelta(days=29)).isoformat()
+    username, full_name = "user0000", seed._full_name(0)
+    report_id = max(meta['tables']['reports'] // 2, 1)
+    writes = iter(range(1, 10**9))
+
+    def second_page():
+        _, cursor = d.get_reports_page()
+        return d.get_reports_page(cursor=cursor)
+
+    def add_report():
+        # 每次写入不同日期的日报，不影响读测试使用的员工
+        return d.add_report("基准写入", (anchor - timedelta(days=next(writes))).isoformat(), "基准测试写入", "", "")
+
+    return [
+        Case("db", "login_user", lambda: d.login_user(username, seed.PASSWORD)),
+        Case("db", "get_all_users", d.get_all_users),
+        Case("db", "get_unique_names", lambda: d.get_unique_names(is_admin=True)),
+        Case("db", "get_reports_page", d.get_reports_page),
+        Case("db", "get_reports_page[employee]", lambda: d.get_reports_page(employee_name=full_name)),
+        Case("db", "get_reports_page[date]", lambda: d.get_reports_page(report_date=today)),
+        Case("db", "get_reports_page[cursor]", second_page),
+        Case("db", "count_reports", d.count_reports),
+        Case("db", "count_reports[estimate]", lambda: d.count_reports(estimate=True)),
+        Case("db", "count_reports[employee]", lambda: d.count_reports(employee_name=full_name)),
+        Case("db", "get_report_counts_by_employee", lambda: d.get_report_counts_by_employee(start, today)),
+        Case("db", "get_report_counts_by_day", lambda: d.get_report_counts_by_day(start, today)),
+        Case("db", "search_reports", lambda: d.search_reports("客户反馈")),
+        Case("db", "search_reports[short]", lambda: d.search_reports("报价")),
+        Case("db", "get_report_by_id", lambda: d.get_report_by_id(report_id)),
+        Case("db", "get_latest_previous_report", lambda: d.get_latest_previous_report(full_name, today)),
+        Case("db", "get_previous_plan", lambda: d.get_previous_plan(full_name, today)),
+        Case("db", "iter_reports[employee]", lambda: _consume(d.iter_reports(employee_name=full_name))),
+        Case("db", "get_all_reports", lambda: d.get_all_reports(is_admin=True)),
+        Case("db", "get_user_monthly_goal", lambda: d.get_user_monthly_goal(username, month)),
+        Case("db", "get_all_monthly_goals", lambda: d.get_all_monthly_goals(month)),
+        Case("db", "get_monthly_goal_overview", lambda: d.get_monthly_goal_overview(month)),
+        Case("db", "get_performance_logs", lambda: d.get_performance_logs(username, month)),
+        Case("db", "get_performance_rollup", lambda: d.get_performance_rollup(month)),
+        Case("db", "get_performance_series", lambda: d.get_performance_series("day", month_str=month)),
+        Case("db", "get_performance_leaderboard", lambda: d.get_performance_leaderboard(month)),
+        Case("db", "get_department_totals", lambda: d.get_department_totals(month)),
+        Case("db", "reconcile_monthly_goals", lambda: d.reconcile_monthly_goals(month)),
+        Case("db", "add_report", add_report, write=True),
+        Case("db", "increment_user_monthly_goal",
+             lambda: d.increment_user_monthly_goal(username, month, added_completed=1, added_revenue=1), write=True),
+    ]
+
+def page_cases():
+    import db_manager as d
+    from streamlit.testing.v1 import AppTest
+
+    user = d.login_user(seed.ADMIN_USERNAME, seed.PASSWORD)
+    if not user:
+        raise RuntimeError("Benchmark admin user not found")
+
+    def render(page):
+        at = AppTest.from_file(APP_PATH, default_timeout=PAGE_TIMEOUT)
+        at.session_state['authenticated'] = True
+        at.session_state['user_info'] = user
+        at.session_state['current_page'] = page
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return at
+
+    return [Case("page", page, lambda page=page: render(page)) for page in PAGES]
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+def _backend_calls():
+    import metrics
+    return metrics.counter_total("calls_total", kind="backend")
+
+def measure(case, iterations, mode):
+    """
+    先不计时运行一轮 (排除模块导入等一次性开销)，再运行 iterations 轮并计时，
+    最后在 tracemalloc 下运行一轮记录内存峰值
+    """
+    import cache
+
+    if not case.write:
+        try:
+            case.func()
+        except Exception:
+            pass
+
+    durations, errors = [], []
+    calls_before = _backend_calls()
+    for _ in range(iterations):
+        if mode == "cold":
+            cache.invalidate()
+        started = time.perf_counter()
+        try:
+            case.func()
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        durations.append((time.perf_counter() - started) * 1000)
+    calls = (_backend_calls() - calls_before) / iterations
+
+    if mode == "cold":
+        cache.invalidate()
+    tracemalloc.start()
+    try:
+        case.func()
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'group': case.group,
+        'name': case.name,
+        'mode': mode,
+        'iterations': iterations,
+        'p50_ms': round(_percentile(durations, 50), 3),
+        'p90_ms': round(_percentile(durations, 90), 3),
+        'p99_ms': round(_percentile(durations, 99), 3),
+        'mean_ms': round(sum(durations) / len(durations), 3),
+        'min_ms': round(min(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'backend_calls': round(calls, 2),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def run(size, iterations, page_iterations, pattern=None, pages=True, reseed=False, seed_value=seed.DEFAULT_SEED):
+    path, meta = seed.ensure(size, seed_value, reseed)
+    _configure(path)
+
+    cases = db_cases(meta) + (page_cases() if pages else [])
+    if pattern:
+        cases = [case for case in cases if re.search(pattern, case.name)]
+
+    started = time.perf_counter()
+    results = []
+    for case in cases:
+        count = page_iterations if case.group == "page" else iterations
+        for mode in (["write"] if case.write else ["cold", "warm"]):
+            result = measure(case, count, mode)
+            results.append(result)
+            print(f"{case.group:<5} {case.name:<32} {mode:<5} p50 {result['p50_ms']:>10.2f} ms  "
+                  f"p90 {result['p90_ms']:>10.2f} ms  peak {result['peak_memory_kb']:>10.1f} KB  "
+                  f"calls {result['backend_calls']:>6}" + (f"  errors {result['errors']}" if result['errors'] else ""))
+
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'git_commit': _git("rev-parse", "--short", "HEAD"),
+            'git_dirty': bool(_git("status", "--porcelain", "--untracked-files=no")),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': "sqlite",
+            'size': size,
+            'seed': meta['seed'],
+            'anchor': meta['anchor'],
+            'tables': meta['tables'],
+            'iterations': iterations,
+            'page_iterations': page_iterations,
+            'filter': pattern,
+        },
+        'process': {
+            'seconds': round(time.perf_counter() - started, 2),
+            # Linux 上单位为 KB
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'cases': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="db_manager 与页面渲染的基准测试")
+    parser.add_argument("--size", choices=seed.SIZES, default="1k")
+    parser.add_argument("--iterations", type=int, default=20, help="每个 db 测试项的计时轮数")
+    parser.add_argument("--page-iterations", type=int, default=5, help="每个页面的计时轮数")
+    parser.add_argument("--only", help="只运行名称匹配该正则的测试项")
+    parser.add_argument("--no-pages", action="store_true", help="不运行页面渲染测试")
+    parser.add_argument("--reseed", action="store_true", help="重新生成测试数据库")
+    parser.add_argument("--seed", type=int, default=seed.DEFAULT_SEED)
+    parser.add_argument("--output", help="结果文件 (默认 benchmarks/results/<时间>_<提交>_<规模>.json)")
+    args = parser.parse_args()
+
+    report = run(args.size, max(args.iterations, 1), max(args.page_iterations, 1),
+                 args.only, not args.no_pages, args.reseed, args.seed)
+
+    output = args.output
+    if not output:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['meta']['git_commit'] or 'nogit'}_{args.size}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
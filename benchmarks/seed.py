@@ -0,0 +1,218 @@
+"""
+生成基准测试用的 SQLite 数据库
+- 同一规模、同一随机种子、同一基准日期生成的数据完全相同；生成后保存在 benchmarks/data/，再次运行时直接复用
+- reports 和 performance_logs 各为指定行数，users 随规模增加 (20 ~ 2000 人)，monthly_goals 为每人最近 12 个月
+- monthly_goals 的累计值与 performance_logs 汇总一致 (核对结果应为空)
+- 日期以生成当天为基准，覆盖此前 365 天
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import auth
+import migrations
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_SEED = 20240101
+DAYS = 365
+MONTHS = 12
+# 所有测试用户的密码
+PASSWORD = "bench"
+ADMIN_USERNAME = "bench_admin"
+INSERT_BATCH = 10_000
+
+DEPARTMENTS = ["销售一部", "销售二部", "市场部", "技术部", "客服部", "运营部"]
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN_NAMES = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰红燕鹏辉建国志文斌浩宇晨欣"
+WORK_PHRASES = [
+    "拜访客户{n}家，介绍新产品方案", "跟进上周报价，客户反馈价格偏高", "整理合同材料并提交法务审核",
+    "参加部门例会，讨论本月销售目标", "电话回访老客户，确认续约意向", "完成投标文件的技术部分",
+    "与供应商沟通到货时间", "处理客户投诉{n}起，均已回复", "更新客户关系系统中的联系人信息",
+    "陪同经理拜访重点客户", "准备下周产品培训的讲义", "统计本月回款情况",
+]
+PLAN_PHRASES = [
+    "继续跟进报价", "拜访新客户{n}家", "提交合同审批", "准备季度总结", "安排产品演示", "催收尾款",
+]
+PROBLEM_PHRASES = [
+    "客户要求延期付款，需要财务协助", "样品库存不足", "报价系统偶尔无法登录", "需要技术部支持现场演示",
+]
+
+def db_path(size, seed=DEFAULT_SEED):
+    return os.path.join(DATA_DIR, f"bench_{size}_{seed}.db")
+
+def _user_count(rows):
+    return max(20, min(2000, rows // 500))
+
+def _full_name(i):
+    name = SURNAMES[i % len(SURNAMES)] + GIVEN_NAMES[(i // len(SURNAMES)) % len(GIVEN_NAMES)]
+    # 常见姓名组合用完后加序号，保证姓名唯一 (日报按姓名关联员工)
+    cycle = i // (len(SURNAMES) * len(GIVEN_NAMES))
+    return name + str(cycle) if cycle else name
+
+def _text(rng, phrases, count):
+    return "；".join(rng.choice(phrases).format(n=rng.randint(1, 9)) for _ in range(count))
+
+def _timestamp(day, rng):
+    moment = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc) + timedelta(seconds=rng.randint(0, 86399))
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _months(anchor):
+    months = []
+    year, month = anchor.year, anchor.month
+    for _ in range(MONTHS):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(conn, sql, rows):
+    conn.execute("BEGIN")
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+    conn.execute("COMMIT")
+
+def seed_database(path, rows, seed=DEFAULT_SEED, anchor=None):
+    """
+    在 path 生成测试数据 (已存在的文件会被覆盖)，返回 meta 字典
+    """
+    anchor = anchor or date.today()
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrations.migrate(conn, "sqlite")
+    started = time.perf_counter()
+
+    # 所有用户共用同一个哈希 (逐个计算 2000 个 scrypt 哈希太慢)
+    password = auth.hash_password(PASSWORD)
+    users = [(ADMIN_USERNAME, password, "管理员", "管理部", "", 1, _timestamp(anchor - timedelta(days=DAYS), rng))]
+    for i in range(_user_count(rows)):
+        users.append((
+            f"user{i:04d}", password, _full_name(i), DEPARTMENTS[i % len(DEPARTMENTS)],
+            f"138{i:08d}", 0, _timestamp(anchor - timedelta(days=rng.randint(0, DAYS)), rng),
+        ))
+    _insert(conn, "INSERT INTO users (username, password, full_name, department, phone, is_admin, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)", users)
+    employees = users[1:]
+
+    def reports():
+        for _ in range(rows):
+            day = anchor - timedelta(days=rng.randint(0, DAYS - 1))
+            yield (
+                rng.choice(employees)[2], day.isoformat(),
+                _text(rng, WORK_PHRASES, rng.randint(2, 6)),
+                _text(rng, PLAN_PHRASES, rng.randint(1, 3)),
+                rng.choice(PROBLEM_PHRASES) if rng.random() < 0.2 else "",
+                _timestamp(day, rng),
+            )
+    _insert(conn, "INSERT INTO reports (employee_name, report_date, work_content, next_plan, problems, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", reports())
+
+    months = _months(anchor)
+    totals = {}
+
+    def logs():
+        for _ in range(rows):
+            username = rng.choice(employees)[0]
+            day = anchor - timedelta(days=rng.randint(0, DAYS - 1))
+            month = day.strftime("%Y-%m")
+            completed = round(rng.uniform(0, 20), 2)
+            revenue = round(completed * rng.uniform(0.5, 1.0), 2)
+            total = totals.setdefault((username, month), [0.0, 0.0])
+            total[0] += completed
+            total[1] += revenue
+            yield username, month, completed, revenue, _timestamp(day, rng)
+    _insert(conn, "INSERT INTO performance_logs (username, month, added_completed, added_revenue, created_at) "
+                  "VALUES (?, ?, ?, ?, ?)", logs())
+
+    goals = []
+    for user in employees:
+        for month in months:
+            completed, revenue = totals.get((user[0], month), (0.0, 0.0))
+            goals.append((user[0], month, 100.0, completed, revenue, _timestamp(anchor, rng)))
+    _insert(conn, "INSERT INTO monthly_goals (username, month, target_amount, completed_amount, revenue_amount, updated_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", goals)
+
+    conn.execute("ANALYZE")
+    conn.close()
+
+    meta = {
+        "seed": seed,
+        "anchor": anchor.isoformat(),
+        "months": months,
+        "seconds": round(time.perf_counter() - started, 2),
+        "tables": table_counts(path),
+    }
+    # 复用已生成的数据库时从这里读取生成参数
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("CREATE TABLE bench_meta (meta TEXT NOT NULL)")
+    conn.execute("INSERT INTO bench_meta (meta) VALUES (?)", (json.dumps(meta),))
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return meta
+
+def load_meta(path):
+    """
+    读取 seed_database() 保存的生成参数；文件不存在或未生成完成时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT meta FROM bench_meta").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+def ensure(size, seed=DEFAULT_SEED, reseed=False):
+    """
+    返回 (数据库路径, meta)；没有可复用的数据库时生成
+    """
+    path = db_path(size, seed)
+    meta = None if reseed else load_meta(path)
+    if meta is None:
+        print(f"Seeding {size} rows into {path} ...")
+        meta = seed_database(path, SIZES[size], seed)
+    return path, meta
+
+def table_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ("users", "reports", "monthly_goals", "performance_logs")}
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试数据库")
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--path", help="数据库文件 (默认 benchmarks/data/bench_<size>_<seed>.db)")
+    args = parser.parse_args()
+    path = args.path or db_path(args.size, args.seed)
+    meta = seed_database(path, SIZES[args.size], args.seed)
+    print(f"Seeded {path} in {meta['seconds']}s: {meta['tables']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+db_manager 读操作的进程内缓存
+- 按 (函数, 参数) 缓存结果，所有 Streamlit 会话共享；参数按函数签名归一化 (位置 / 关键字 / 默认值写法相同)
+- 每张表单独配置 TTL (可用环境变量 CACHE_TTL_<表名大写> 覆盖)
+- 写操作通过 invalidate() 或 被装饰函数.invalidate(...) 显式失效
+- 记录命中 / 未命中次数，供排查性能问题
+- 降级：被缓存函数调用失败 (调用了 skip_store) 时，返回 STALE_MAX_AGE 内最近一次成功的结果
+"""
+import copy
+import inspect
+import os
+import threading
+import time
+from functools import wraps
+
+# 各表默认缓存时间 (秒)
+DEFAULT_TTL = {
+    "users": 300,
+    "employee_names": 600,
+    "reports": 60,
+    "monthly_goals": 30,
+    "performance_logs": 30,
+    "performance_rollup": 60,
+}
+
+# 调用失败时仍可返回的过期结果的最大存活时间 (秒)，0 表示不返回过期结果
+STALE_MAX_AGE = float(os.environ.get("CACHE_STALE_MAX_AGE", "3600"))
+
+_lock = threading.Lock()
+_entries = {}  # key -> (expires_at, table, value, stored_at)
+_ttl = {
+    table: float(os.environ.get(f"CACHE_TTL_{table.upper()}", seconds))
+    for table, seconds in DEFAULT_TTL.items()
+}
+_stats = {}  # table -> {"hits": n, "misses": n, "stale": n}
+_local = threading.local()
+_stale_handler = None
+_lookup_handler = None
+
+def get_ttl(table):
+    """
+    获取某张表的缓存时间 (秒)
+    """
+    return _ttl.get(table, 0)
+
+def set_ttl(table, seconds):
+    """
+    修改某张表的缓存时间，并清掉该表已有的缓存
+    """
+    _ttl[table] = float(seconds)
+    invalidate(table)
+
+def skip_store():
+    """
+    标记本次调用的结果不写入缓存 (在被缓存函数的 except 分支中调用，避免缓存错误结果)
+    """
+    _local.skip = True
+
+def on_stale(handler):
+    """
+    注册回调 handler(函数名, 数据年龄秒数)，在返回过期结果时调用
+    """
+    global _stale_handler
+    _stale_handler = handler
+
+def on_lookup(handler):
+    """
+    注册回调 handler(表名, 结果)，每次查询缓存时调用；结果为 hit / miss / stale
+    """
+    global _lookup_handler
+    _lookup_handler = handler
+
+def _notify(table, result):
+    if _lookup_handler is not None:
+        _lookup_handler(table, result)
+
+def _make_key(func_name, signature, args, kwargs):
+    """
+    按签名绑定参数并补齐默认值: f("2024-03")、f(month_str="2024-03")、f("2024-03", None) 得到同一个键
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    items = []
+    for name, value in bound.arguments.items():
+        if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+            value = tuple(sorted(value.items()))
+        items.append((name, value))
+    return (func_name, tuple(items))
+
+def _record(table, field):
+    counters = _stats.setdefault(table, {"hits": 0, "misses": 0, "stale": 0})
+    counters[field] += 1
+
+def cached(table):
+    """
+    装饰器：缓存函数结果，TTL 取该表的配置
+    命中时返回副本，调用方修改 DataFrame/dict 不会污染缓存
+    """
+    def decorator(func):
+        func_name = f"{func.__module__}.{func.__qualname__}"
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(func_name, signature, args, kwargs)
+            now = time.monotonic()
+            with _lock:
+                entry = _entries.get(key)
+                hit = entry is not None and entry[0] > now
+                _record(table, "hits" if hit else "misses")
+                if hit:
+                    value = copy.deepcopy(entry[2])
+            _notify(table, "hit" if hit else "miss")
+            if hit:
+                return value
+
+            outer_skip = getattr(_local, "skip", False)
+            _local.skip = False
+            try:
+                value = func(*args, **kwargs)
+                skip = _local.skip
+            finally:
+                _local.skip = outer_skip
+
+            if skip:
+                # 调用失败：有最近一次成功的结果时返回它 (后端故障期间页面仍有数据)
+                with _lock:
+                    entry = _entries.get(key)
+                    age = time.monotonic() - entry[3] if entry is not None else None
+                    if age is None or age > STALE_MAX_AGE:
+                        return value
+                    _record(table, "stale")
+                    stale = copy.deepcopy(entry[2])
+                _notify(table, "stale")
+                if _stale_handler is not None:
+                    _stale_handler(func_name, age)
+                return stale
+
+            ttl = get_ttl(table)
+            if ttl > 0:
+                with _lock:
+                    stored_at = time.monotonic()
+                    _entries[key] = (stored_at + ttl, table, copy.deepcopy(value), stored_at)
+            return value
+
+        def invalidate_call(*args, **kwargs):
+            """
+            使某一组参数对应的缓存失效 (参数写法与调用时不同也能对上)
+            """
+            with _lock:
+                _entries.pop(_make_key(func_name, signature, args, kwargs), None)
+
+        def invalidate_all():
+            """
+            使该函数的全部缓存失效
+            """
+            with _lock:
+                for key in [k for k in _entries if k[0] == func_name]:
+                    del _entries[key]
+
+        wrapper.invalidate = invalidate_call
+        wrapper.clear = invalidate_all
+        wrapper.cache_table = table
+        return wrapper
+    return decorator
+
+def invalidate(*tables):
+    """
+    使指定表的全部缓存失效；不传参数时清空所有缓存
+    """
+    with _lock:
+        if not tables:
+            _entries.clear()
+            return
+        for key in [k for k, entry in _entries.items() if entry[1] in tables]:
+            del _entries[key]
+
+def stats():
+    """
+    返回命中统计: {"hits": n, "misses": n, "stale": n, "entries": n, "tables": {表名: {"hits", "misses", "stale"}}}
+    """
+    with _lock:
+        tables = {table: dict(counters) for table, counters in _stats.items()}
+        return {
+            "hits": sum(c["hits"] for c in tables.values()),
+            "misses": sum(c["misses"] for c in tables.values()),
+            "stale": sum(c.get("stale", 0) for c in tables.values()),
+            "entries": len(_entries),
+            "tables": tables,
+        }
+
+def reset_stats():
+    """
+    清零命中统计
+    """
+    with _lock:
+        _stats.clear()
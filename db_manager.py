@@ -1,78 +1,287 @@
 import os
-import pandas as pd
-from datetime import datetime
-from supabase import create_client, Client
+import functools
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from collections import OrderedDict
+from itertools import islice
+from datetime import datetime, timezone
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-# 尝试从环境变量或 Streamlit secrets 获取配置
-try:
-    SUPABASE_URL = st.secrets["SUPABASE_URL"]
-    SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-except Exception:
-    # 备用：尝试从环境变量获取（如果 secrets 不存在）
-    SUPABASE_URL = os.environ.get("SUPABASE_URL")
-    SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+import auth
+import cache
+import lazy
+import metrics
+import report_cache
+import resilience
+import sqlite_backend
 
-def get_client() -> Client:
+# 按需导入 (见 lazy.py)：pandas 在第一次构造 DataFrame 时导入，
+# supabase_backend (supabase / postgrest / httpx) 只在使用 Supabase 后端时导入
+pd = lazy.module("pandas")
+supabase_backend = lazy.module("supabase_backend")
+
+# 调用失败时返回的过期缓存记录到本次页面运行的提示中
+cache.on_stale(resilience.note_stale)
+# 缓存命中情况计入当前调用的统计
+cache.on_lookup(metrics.record_cache)
+
+# --- 配置 ---
+def _get_setting(name, default=None):
+    """
+    读取配置：优先 Streamlit secrets，其次环境变量
+    每次调用时读取，凭据变更后可自动重建客户端
+    """
+    try:
+        return st.secrets[name]
+    except Exception:
+        # 备用：尝试从环境变量获取（如果 secrets 不存在）
+        return os.environ.get(name, default)
+
+def _load_config():
     """
-    获取 Supabase 客户端实例
+    读取 Supabase 配置
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    return _get_setting("SUPABASE_URL"), _get_setting("SUPABASE_KEY")
+
+def get_client():
+    """
+    获取 Supabase 客户端实例 (进程内共享，带连接池，见 supabase_backend)
+    """
+    url, key = _load_config()
+    if not url or not key:
         st.error("❌ 缺少 Supabase 配置！请在 .streamlit/secrets.toml 中配置 SUPABASE_URL 和 SUPABASE_KEY。")
+        cache.skip_store()
         return None
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase_backend.get_client(url, key)
 
-def init_db():
+def close_client():
+    """
+    关闭共享客户端及其连接池 (进程退出或测试时使用)
     """
-    Supabase 初始化
-    注意：通常建议在 Supabase Dashboard 的 SQL Editor 中运行建表语句。
-    这里仅做简单的连接检查。
+    # 从未创建过客户端时不必为关闭而导入 supabase
+    module = lazy.loaded("supabase_backend")
+    if module is not None:
+        module.close_client()
+
+# --- 存储后端 ---
+# DB_BACKEND = "supabase" (默认) 或 "sqlite"
+# 使用 sqlite 时数据库文件由 SQLITE_PATH 指定，默认为仓库自带的 daily_reports.db
+DEFAULT_SQLITE_PATH = "daily_reports.db"
+
+def get_backend_name():
+    """
+    当前配置的存储后端名称
+    """
+    return str(_get_setting("DB_BACKEND", "supabase")).strip().lower()
+
+def _backend():
+    """
+    获取当前配置的存储后端实例；配置缺失时返回 None
+    返回的后端套有容错策略 (resilience)：截止时间、读操作重试、熔断，失败时抛出 resilience.BackendError
     """
+    if get_backend_name() == "sqlite":
+        return resilience.guard(sqlite_backend.get_backend(_get_setting("SQLITE_PATH", DEFAULT_SQLITE_PATH)))
+
     client = get_client()
-    if client:
+    if not client:
+        return None
+    return resilience.guard(supabase_backend.get_backend(client))
+
+def _reports_backend():
+    """
+    读取日报用的后端
+    使用 Supabase 时先增量同步本地副本 (report_cache)，再在本地查询；
+    尚未完成过同步 (如网络故障) 时直接查询 Supabase；Supabase 故障或熔断期间继续使用本地副本
+    """
+    backend = _backend()
+    if backend is None or backend.name == "sqlite" or not report_cache.ENABLED:
+        return backend
+
+    reports = report_cache.get_cache()
+    if reports.sync(backend):
+        # 拉取到新日报：列表、计数、姓名的进程缓存已过期
+        cache.invalidate("reports", "employee_names")
+    return resilience.guard(reports.local) if reports.ready else backend
+
+# --- 并发预取 ---
+# 页面一次性声明需要的数据，互不依赖的查询在线程池中并发执行，
+# 页面等待时间约等于最慢的那个查询，而不是所有查询之和
+PREFETCH_WORKERS = int(os.environ.get("DB_PREFETCH_WORKERS", "8"))
+
+_prefetch_lock = threading.Lock()
+_prefetch_pool = None
+
+def _spinner(text):
+    """
+    在脚本线程中显示加载提示；在预取线程中 (没有 Streamlit 上下文) 不显示
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return nullcontext()
+    return st.spinner(text)
+
+def _get_prefetch_pool():
+    global _prefetch_pool
+    if _prefetch_pool is None:
+        with _prefetch_lock:
+            if _prefetch_pool is None:
+                _prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="db-prefetch")
+    return _prefetch_pool
+
+def _as_task(spec):
+    if callable(spec):
+        return spec
+    func, *args = spec
+    return functools.partial(func, *args)
+
+def prefetch(**calls):
+    """
+    并发执行多个互不依赖的查询
+    用法:
+        data = db_manager.prefetch(
+            goal=(db_manager.get_user_monthly_goal, username, month),
+            logs=(db_manager.get_performance_logs, username, month),
+            today=functools.partial(db_manager.count_reports, report_date=today),
+        )
+        data['goal'], data['logs'], data['today']
+    每一项可以是 (函数, 位置参数...) 元组，也可以是无参可调用对象
+    返回 {名称: 函数返回值}
+    """
+    tasks = {name: _as_task(spec) for name, spec in calls.items()}
+    if len(tasks) <= 1:
+        return {name: task() for name, task in tasks.items()}
+
+    pool = _get_prefetch_pool()
+    with _spinner("正在加载数据..."):
+        # 任务在当前上下文的副本中运行，失败提示记录到本次页面运行
+        futures = {name: pool.submit(resilience.with_context(task)) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def init_db():
+    """
+    数据库初始化
+    - Supabase：建议在 Supabase Dashboard 的 SQL Editor 中运行建表语句 (见文件末尾附录)，这里仅做简单的连接检查
+    - SQLite：首次连接时自动建表
+    应用启动时不调用 (后端在第一次查询时创建)，需要提前检查配置时可以调用
+    """
+    backend = _backend()
+    if backend:
         # 可以尝试简单的查询来验证连接
         pass
 
-def login_user(username, password):
+_dummy_hash = None
+
+def _verify_unknown_user(password):
     """
-    用户登录 (查 users 表)
+    用户名不存在时也计算一次哈希，使响应时间与密码错误时一致 (不暴露用户名是否存在)
     """
-    with st.spinner("正在登录..."):
-        client = get_client()
-        try:
-            # 查询 users 表
-            response = client.table("users").select("*").eq("username", username).eq("password", password).execute()
-            data = response.data
-            
-            if data and len(data) > 0:
-                return data[0] # 返回用户信息字典
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = auth.hash_password(auth.generate_password())
+    auth.verify_password(password, _dummy_hash)
+
+def login_user(username, password, client_ip=None):
+    """
+    用户登录：按用户名查询后校验密码哈希，成功时返回用户信息 (不含密码)
+    - 同一用户名 / IP 失败次数过多或全局登录过于频繁时直接返回 None，不访问数据库 (见 auth.LoginThrottle)
+    - 旧的明文密码登录成功后替换为哈希
+    """
+    keys = auth.throttle_keys(username, client_ip)
+    if auth.throttle.acquire(*keys):
+        print(f"Login throttled: {username}")
+        return None
+
+    with _spinner("正在登录..."):
+        backend = _backend()
+        if not backend:
             return None
+
+        try:
+            user = backend.find_user(username)
         except Exception as e:
             print(f"Login error: {e}")
             return None
 
+        if user is None:
+            _verify_unknown_user(password)
+            auth.throttle.failure(*keys)
+            return None
+        stored = user.pop('password', None)
+        ok, needs_rehash = auth.verify_password(password, stored)
+        if not ok:
+            auth.throttle.failure(*keys)
+            return None
+        auth.throttle.success(*keys)
+
+        if needs_rehash:
+            try:
+                backend.update_user_password(username, auth.hash_password(password), previous=stored)
+            except Exception as e:
+                # 不影响本次登录，下次登录时再替换
+                print(f"Password rehash error: {e}")
+        return user
+
+def check_current_password(username, password, client_ip=None):
+    """
+    修改密码前校验已登录用户的当前密码
+    - 不消耗登录的全局令牌；失败计入该用户名 / IP 的失败次数，锁定期间直接返回 False，不访问数据库
+    """
+    keys = auth.throttle_keys(username, client_ip)
+    if auth.throttle.locked_for(*keys):
+        print(f"Password check throttled: {username}")
+        return False
+
+    with _spinner("正在验证当前密码..."):
+        backend = _backend()
+        if not backend:
+            return False
+
+        try:
+            user = backend.find_user(username)
+        except Exception as e:
+            print(f"Password check error: {e}")
+            return False
+
+        if user is None:
+            _verify_unknown_user(password)
+            auth.throttle.failure(*keys)
+            return False
+        ok, _ = auth.verify_password(password, user.get('password'))
+        if not ok:
+            auth.throttle.failure(*keys)
+            return False
+        auth.throttle.success(*keys)
+        return True
+
 def create_user(username, password, full_name, department, phone):
     """
     管理员创建新用户
     """
-    with st.spinner("正在创建用户..."):
-        client = get_client()
+    with _spinner("正在创建用户..."):
+        backend = _backend()
+        if not backend:
+            return False, "数据库未配置"
+
         try:
             # 检查用户名是否已存在
-            check = client.table("users").select("username").eq("username", username).execute()
-            if check.data and len(check.data) > 0:
+            if backend.user_exists(username):
                 return False, "用户名已存在"
 
             new_user = {
                 "username": username,
-                "password": password,
+                "password": auth.hash_password(password),
                 "full_name": full_name,
                 "department": department,
                 "phone": phone,
                 "is_admin": False
             }
             
-            client.table("users").insert(new_user).execute()
+            backend.insert_user(new_user)
+            # 新用户会出现在用户列表、姓名筛选列表和目标概览中
+            cache.invalidate("users", "employee_names")
+            get_monthly_goal_overview.clear()
             return True, "创建成功"
         except Exception as e:
             print(f"Create user error: {e}")
@@ -82,50 +291,152 @@ def update_password(username, new_password):
     """
     用户修改密码
     """
-    with st.spinner("正在修改密码..."):
-        client = get_client()
+    with _spinner("正在修改密码..."):
+        backend = _backend()
+        if not backend:
+            return False
+
         try:
-            client.table("users").update({"password": new_password}).eq("username", username).execute()
-            return True
+            backend.update_user_password(username, auth.hash_password(new_password))
+            cache.invalidate("users")
         except Exception as e:
             print(f"Update password error: {e}")
             return False
+        # 其他设备上的登录随之失效
+        revoke_user_sessions(username)
+        return True
+
+USER_LIST_COLUMNS = "username, full_name, department, phone, is_admin, created_at"
 
+@cache.cached("users")
 def get_all_users():
     """
     获取所有用户信息 (仅管理员)
     """
-    client = get_client()
+    backend = _backend()
+    if not backend:
+        return pd.DataFrame()
+
     try:
-        # 查询所有用户，按创建时间倒序
-        response = client.table("users").select("*").order("created_at", desc=True).execute()
-        data = response.data
+        # 查询所有用户，按创建时间倒序 (只取页面展示需要的列，不传输密码)
+        data = backend.list_users(USER_LIST_COLUMNS)
         if not data:
             return pd.DataFrame()
         return pd.DataFrame(data)
     except Exception as e:
         print(f"Get all users error: {e}")
+        cache.skip_store()
         return pd.DataFrame()
 
-def admin_reset_password(username, default_password="123456"):
+def admin_reset_password(username, new_password=None):
     """
-    管理员重置用户密码
+    管理员重置用户密码：不指定 new_password 时生成随机临时密码
+    返回设置的新密码 (用于告知用户)，失败时返回 None
     """
-    client = get_client()
+    backend = _backend()
+    if not backend:
+        return None
+
+    new_password = new_password or auth.generate_password()
     try:
-        client.table("users").update({"password": default_password}).eq("username", username).execute()
-        return True
+        backend.update_user_password(username, auth.hash_password(new_password))
+        cache.invalidate("users")
     except Exception as e:
         print(f"Admin reset password error: {e}")
+        return None
+    revoke_user_sessions(username)
+    return new_password
+
+def hash_plaintext_passwords():
+    """
+    将 users 表中剩余的明文密码 (旧数据) 替换为哈希，返回替换的用户数
+    已被用户修改过的行不会被覆盖
+    """
+    backend = _backend()
+    if not backend:
+        return 0
+
+    try:
+        rows = backend.list_plaintext_passwords(auth.HASH_PREFIX)
+    except Exception as e:
+        print(f"List plaintext passwords error: {e}")
+        return 0
+
+    updated = 0
+    for row, hashed in zip(rows, auth.hash_passwords(row['password'] for row in rows)):
+        try:
+            if backend.update_user_password(row['username'], hashed, previous=row['password']):
+                updated += 1
+        except Exception as e:
+            print(f"Hash password error for {row['username']}: {e}")
+    return updated
+
+# --- 会话吊销 (见 auth.SessionDenylist) ---
+REVOCATION_BATCH_SIZE = 1000
+
+def list_session_revocations(after_id=0):
+    """
+    读取 id 大于 after_id 且未过期的会话吊销记录 (各进程的吊销列表定期调用)
+    查询失败时返回 None
+    """
+    backend = _backend()
+    if not backend:
+        return None
+
+    try:
+        rows = []
+        now = datetime.now(timezone.utc)
+        while True:
+            batch = backend.list_session_revocations(after_id, now, REVOCATION_BATCH_SIZE)
+            rows.extend(batch)
+            if len(batch) < REVOCATION_BATCH_SIZE:
+                return rows
+            after_id = batch[-1]['id']
+    except Exception as e:
+        print(f"List session revocations error: {e}")
+        return None
+
+def _save_revocation(revocation):
+    # 本进程立即生效 (写入数据库失败时也生效)；其他进程在下次刷新时加载
+    auth.denylist.add(revocation)
+    backend = _backend()
+    if not backend:
+        return False
+
+    try:
+        backend.insert_session_revocation(revocation)
+    except Exception as e:
+        print(f"Save session revocation error: {e}")
         return False
+    # 写入后立即刷新，同时加载其他进程在此期间写入的吊销记录，不等下一个刷新周期
+    auth.denylist.refresh()
+    return True
+
+def revoke_session(token):
+    """
+    吊销单个会话令牌 (退出登录)
+    """
+    claims = auth.token_claims(token)
+    if not claims or not claims.get('sid'):
+        return False
+    return _save_revocation(auth.revocation(claims['username'], claims['sid'], claims['exp']))
+
+def revoke_user_sessions(username):
+    """
+    吊销该用户此前签发的全部会话令牌 (修改 / 重置密码)
+    """
+    return _save_revocation(auth.revocation(username))
+
+# 注册后吊销列表在后台线程中加载和刷新；调用时再取模块属性，使用套上耗时统计后的函数
+auth.denylist.set_loader(lambda after_id: list_session_revocations(after_id))
 
 def add_report(employee_name, report_date, work_content, next_plan, problems):
     """
-    添加一条新的日报记录到 Supabase
+    添加一条新的日报记录
     """
-    with st.spinner("正在提交日报..."):
-        client = get_client()
-        if not client:
+    with _spinner("正在提交日报..."):
+        backend = _backend()
+        if not backend:
             return False
             
         try:
@@ -139,180 +450,401 @@ def add_report(employee_name, report_date, work_content, next_plan, problems):
                 # "created_at": datetime.now().isoformat()
             }
             
-            response = client.table("reports").insert(data).execute()
-            # 检查响应（新版 supabase-py 如果出错通常会抛异常，或者返回错误信息）
+            backend.insert_report(data)
+            report_cache.get_cache().mark_stale()
+            # 日报列表、统计、上次计划都已变化；首次提交日报的员工会出现在姓名列表中
+            cache.invalidate("reports", "employee_names")
+            _forget_latest_reports(employee_name)
             return True
         except Exception as e:
-            print(f"Error adding report to Supabase: {e}")
+            print(f"Error adding report: {e}")
             st.error(f"提交失败: {e}")
             return False
 
+# --- 上一份日报 (填写日报页展示“昨日计划”) ---
+# 结果按 (员工, 日期) 记在当前会话中：表单 rerun 不再请求数据库；
+# 登录时后台预热今天的结果，本人提交日报后失效
+PREVIOUS_REPORT_COLUMNS = "report_date, next_plan"
+
+def _latest_report_memo():
+    """
+    当前会话的 {(员工, 日期): 日报 dict / None / 进行中的 Future}
+    没有 Streamlit 上下文时 (脚本外调用) 返回临时 dict，即不做记忆
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return {}
+    return st.session_state.setdefault('_latest_report_memo', {})
+
+def _fetch_latest_report_before(employee_name, current_date):
+    backend = _reports_backend()
+    if not backend:
+        raise RuntimeError("数据库未配置")
+    return backend.latest_report_before(employee_name, current_date, PREVIOUS_REPORT_COLUMNS)
+
+def _forget_latest_reports(employee_name):
+    memo = _latest_report_memo()
+    for key in [k for k in memo if k[0] == employee_name]:
+        del memo[key]
+
+def warm_latest_report_before(employee_name, current_date):
+    """
+    在后台线程中预先查询上一份日报 (登录时调用，不阻塞页面跳转)
+    """
+    memo = _latest_report_memo()
+    key = (employee_name, current_date)
+    if key not in memo:
+        memo[key] = _get_prefetch_pool().submit(
+            resilience.with_context(functools.partial(_fetch_latest_report_before, employee_name, current_date))
+        )
+
+def get_latest_report_before(employee_name, current_date):
+    """
+    获取该员工在 current_date 之前的最近一份日报，只包含 report_date 与 next_plan
+    没有记录时返回 None；查询失败时返回 None 且不记忆，下次重新查询
+    """
+    memo = _latest_report_memo()
+    key = (employee_name, current_date)
+    if key in memo:
+        value = memo[key]
+        if not isinstance(value, Future):
+            return value
+        try:
+            memo[key] = value.result()
+            return memo[key]
+        except Exception as e:
+            # 预热失败：丢弃，下面重新查询
+            print(f"Error warming previous report: {e}")
+            memo.pop(key, None)
+
+    try:
+        report = _fetch_latest_report_before(employee_name, current_date)
+    except Exception as e:
+        print(f"Error getting previous report: {e}")
+        return None
+    memo[key] = report
+    return report
+
 def get_previous_plan(employee_name, current_date):
     """
-    获取最近一次日报的“明日计划”
-    逻辑：查找该员工在 current_date 之前提交的最后一条日报
+    获取最近一次日报的“明日计划”，返回 (next_plan, report_date)，没有时为 (None, None)
     """
-    client = get_client()
+    report = get_latest_report_before(employee_name, current_date)
+    if report:
+        return report.get('next_plan', ''), report.get('report_date', '')
+    return None, None
+
+# --- 日报分页查询 ---
+# 表格只展示摘要列，正文 (work_content/next_plan/problems) 按需加载
+REPORT_SUMMARY_COLUMNS = "id, report_date, employee_name, created_at"
+REPORT_DETAIL_COLUMNS = "id, work_content, next_plan, problems"
+REPORT_PAGE_SIZE = 50
+# 每个会话缓存最近打开的日报详情条数
+REPORT_DETAIL_CACHE_SIZE = 20
+# 单次请求的最大行数 (低于 PostgREST 默认的 max-rows，避免结果被静默截断)
+REPORT_BATCH_SIZE = 1000
+
+def _report_cursor(row):
+    """
+    keyset 分页游标：(report_date, created_at) 不唯一 (批量导入的日报时间相同)，以 id 区分
+    """
+    return row['report_date'], row['created_at'], row['id']
+
+@cache.cached("reports")
+def get_reports_page(employee_name=None, report_date=None, cursor=None, page_size=REPORT_PAGE_SIZE):
+    """
+    分页获取日报摘要 (id, report_date, employee_name, created_at)
+    按 (report_date, created_at, id) 倒序做 keyset 分页
+    - employee_name / report_date: 可选筛选条件，在数据库端过滤
+    - cursor: 上一页返回的 next_cursor，None 表示第一页
+
+    返回 (DataFrame, next_cursor)，没有下一页时 next_cursor 为 None
+    """
+    with _spinner("正在加载日报记录..."):
+        backend = _reports_backend()
+        if not backend:
+            return pd.DataFrame(), None
+
+        try:
+            # 多取一行，用来判断是否还有下一页
+            rows = backend.reports_page(
+                REPORT_SUMMARY_COLUMNS, employee_name, report_date, cursor, page_size + 1
+            )
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                next_cursor = _report_cursor(rows[-1])
+
+            if not rows:
+                return pd.DataFrame(), None
+            return pd.DataFrame(rows), next_cursor
+        except Exception as e:
+            print(f"Error reading report page: {e}")
+            cache.skip_store()
+            st.error(f"读取数据失败: {e}")
+            return pd.DataFrame(), None
+
+def iter_reports(employee_name=None, report_date=None, columns="*", batch_size=REPORT_BATCH_SIZE):
+    """
+    按页遍历符合条件的全部日报 (生成器，每次产出一行 dict)
+    用于导出等需要完整结果的场景，不受 PostgREST 单次返回行数上限影响
+    """
+    backend = _reports_backend()
+    if not backend:
+        return
+
+    # 游标需要 report_date / created_at / id 三列
+    if columns.strip() != "*":
+        names = [c.strip() for c in columns.split(",")]
+        columns = ", ".join(names + [c for c in ("id", "report_date", "created_at") if c not in names])
+
+    cursor = None
+    while True:
+        rows = backend.reports_page(columns, employee_name, report_date, cursor, batch_size)
+        yield from rows
+        if len(rows) < batch_size:
+            break
+        cursor = _report_cursor(rows[-1])
+
+@cache.cached("reports")
+def count_reports(employee_name=None, report_date=None, estimate=False):
+    """
+    统计符合条件的日报数量 (只取 count，不传输数据行)
+    estimate=True: Supabase 上数据量大时返回估计值 (count=estimated)，本地查询时总是精确值
+    """
+    backend = _reports_backend()
+    if not backend:
+        return 0
+
     try:
-        # 查找该员工，且日期小于当前日期的记录，按日期倒序排列，取第一条
-        response = (
-            client.table("reports")
-            .select("next_plan, report_date")
-            .eq("employee_name", employee_name)
-            .lt("report_date", current_date)
-            .order("report_date", desc=True)
-            .limit(1)
-            .execute()
-        )
-            
-        data = response.data
-        if data and len(data) > 0:
-            return data[0].get('next_plan', ''), data[0].get('report_date', '')
-        return None, None
+        return backend.count_reports(employee_name, report_date, estimate)
     except Exception as e:
-        print(f"Get previous plan error: {e}")
-        return None, None
+        print(f"Error counting reports: {e}")
+        cache.skip_store()
+        return 0
+
+@cache.cached("reports")
+def get_report_counts_by_employee(start_day=None, end_day=None):
+    """
+    按员工统计日报数量 (日期范围可选，含两端)
+    返回列: employee_name, reports (按数量倒序)
+    """
+    backend = _reports_backend()
+    if not backend:
+        return pd.DataFrame(columns=['employee_name', 'reports'])
+
+    try:
+        rows = backend.report_counts_by_employee(start_day, end_day)
+        return pd.DataFrame(rows, columns=['employee_name', 'reports'])
+    except Exception as e:
+        print(f"Error counting reports by employee: {e}")
+        cache.skip_store()
+        return pd.DataFrame(columns=['employee_name', 'reports'])
+
+@cache.cached("reports")
+def get_report_counts_by_day(start_day=None, end_day=None, employee_name=None):
+    """
+    按汇报日期统计日报数量
+    返回列: report_date ('YYYY-MM-DD'), reports；指定了日期范围时缺失的日期补 0
+    """
+    backend = _reports_backend()
+    if not backend:
+        return pd.DataFrame(columns=['report_date', 'reports'])
+
+    try:
+        rows = backend.report_counts_by_day(start_day, end_day, employee_name)
+    except Exception as e:
+        print(f"Error counting reports by day: {e}")
+        cache.skip_store()
+        return pd.DataFrame(columns=['report_date', 'reports'])
+
+    counts = pd.DataFrame(rows, columns=['report_date', 'reports'])
+    counts['report_date'] = counts['report_date'].astype(str)
+    if start_day and end_day:
+        days = pd.date_range(start_day, end_day, freq="D").strftime('%Y-%m-%d')
+        counts = counts.set_index('report_date').reindex(days, fill_value=0).rename_axis('report_date').reset_index()
+    return counts
+
+# --- 全文搜索 ---
+SEARCH_RESULT_COLUMNS = ['id', 'report_date', 'employee_name', 'created_at', 'snippet', 'score']
+SEARCH_PAGE_SIZE = 20
+
+@cache.cached("reports")
+def search_reports(query, employee_name=None, report_date=None, page=0, page_size=SEARCH_PAGE_SIZE):
+    """
+    全文搜索日报的工作内容、计划和困难 (空格分隔多个关键词，需全部命中)
+    返回 (当前页 DataFrame, 命中总数)，按相关度排序
+    snippet 列为已转义的 HTML 摘要，关键词用 <mark> 高亮
+    """
+    empty = pd.DataFrame(columns=SEARCH_RESULT_COLUMNS)
+    query = (query or "").strip()
+    backend = _reports_backend()
+    if not backend or not query:
+        return empty, 0
 
+    try:
+        rows, total = backend.search_reports(query, employee_name, report_date, page_size, page * page_size)
+        return pd.DataFrame(rows, columns=SEARCH_RESULT_COLUMNS), total
+    except Exception as e:
+        print(f"Error searching reports: {e}")
+        cache.skip_store()
+        return empty, 0
+
+def get_report_by_id(report_id):
+    """
+    获取单条日报的正文 (work_content, next_plan, problems)
+    点击表格行时才按需加载，最近打开的日报缓存在当前会话中 (LRU)
+    """
+    detail_cache = st.session_state.setdefault('_report_detail_cache', OrderedDict())
+    if report_id in detail_cache:
+        detail_cache.move_to_end(report_id)
+        return detail_cache[report_id]
+
+    backend = _reports_backend()
+    if not backend:
+        return None
+
+    try:
+        report = backend.get_report(report_id, REPORT_DETAIL_COLUMNS)
+        if not report:
+            return None
+
+        detail_cache[report_id] = report
+        if len(detail_cache) > REPORT_DETAIL_CACHE_SIZE:
+            detail_cache.popitem(last=False)
+        return report
+    except Exception as e:
+        print(f"Error getting report {report_id}: {e}")
+        return None
+
+@cache.cached("reports")
 def get_all_reports(username=None, is_admin=False):
     """
     获取日报记录
-    - 返回所有记录 (所有人可见)
+    - 返回所有记录 (所有人可见)，按页拉取，不会被行数上限截断
       
     参数:
     username (str): (已弃用，保留参数兼容)
     is_admin (bool): (已弃用，保留参数兼容)
     """
-    with st.spinner("正在加载日报记录..."):
-        client = get_client()
-        if not client:
-            return pd.DataFrame()
-            
+    with _spinner("正在加载日报记录..."):
         try:
-            query = client.table("reports").select("*").order("report_date", desc=True).order("created_at", desc=True)
-            
             # 以前只有管理员能看所有人，现在所有人都能看所有人，所以不再过滤
-            # if not is_admin and username:
-            #     query = query.eq("employee_name", username)
-                
-            response = query.execute()
-            
-            data = response.data
+            data = list(iter_reports())
             if not data:
                 return pd.DataFrame()
                 
             df = pd.DataFrame(data)
             return df
         except Exception as e:
-            print(f"Error reading reports from Supabase: {e}")
+            print(f"Error reading reports: {e}")
+            cache.skip_store()
             st.error(f"读取数据失败: {e}")
             return pd.DataFrame()
 
 def get_latest_previous_report(employee_name, current_date):
     """
-    获取指定日期之前的最近一份日报，用于提取“明日计划”
+    获取指定日期之前的最近一份日报 (同 get_latest_report_before，只返回 report_date 与 next_plan)
     """
-    client = get_client()
-    if not client:
-        return None
-        
-    try:
-        # 查询日期小于 current_date 的最近一条记录
-        response = client.table("reports").select("*")\
-            .eq("employee_name", employee_name)\
-            .lt("report_date", current_date)\
-            .order("report_date", desc=True)\
-            .limit(1)\
-            .execute()
-            
-        data = response.data
-        if data and len(data) > 0:
-            return data[0]
-        return None
-    except Exception as e:
-        print(f"Error getting previous report: {e}")
-        return None
+    return get_latest_report_before(employee_name, current_date)
 
+@cache.cached("employee_names")
 def get_unique_names(username=None, is_admin=False):
     """
     获取筛选用的姓名列表
     - 返回所有唯一姓名 (所有人可见)
+    - 姓名列表变化很少，结果缓存 (新建用户时失效)
     """
     # 以前普通用户只能看自己，现在所有人都能看所有人
     # if not is_admin and username:
     #     return [username]
 
-    with st.spinner("正在加载筛选列表..."):
-        client = get_client()
-        if not client:
-            return []
-            
-        try:
-            # 由于 supabase-py 可能不支持直接的 distinct 查询，
-            # 我们可以查询所有姓名然后在 Python 端去重，或者使用 rpc (如果写了 SQL function)
-            # 这里为了简单，先查询 employee_name 字段
-            response = client.table("reports").select("employee_name").execute()
-            data = response.data
-            
-            if not data:
-                return []
-                
-            names = sorted(list(set(item['employee_name'] for item in data)))
-            return names
-        except Exception as e:
-            print(f"Error getting names from Supabase: {e}")
-            return []
+    backend = _reports_backend()
+    if not backend:
+        return []
+
+    try:
+        return backend.unique_employee_names()
+    except Exception as e:
+        print(f"Error getting names: {e}")
+        cache.skip_store()
+        return []
 
+@cache.cached("monthly_goals")
 def get_user_monthly_goal(username, month_str):
     """
     获取用户某月的业绩目标和完成情况
     username: 登录用户名 (非全名，保持唯一性)
     month_str: 'YYYY-MM'
     """
-    with st.spinner("正在加载目标数据..."):
-        client = get_client()
-        try:
-            response = client.table("monthly_goals").select("*")\
-                .eq("username", username)\
-                .eq("month", month_str)\
-                .execute()
-            
-            data = response.data
-            if data and len(data) > 0:
-                return data[0]
+    with _spinner("正在加载目标数据..."):
+        backend = _backend()
+        if not backend:
             return None
+
+        try:
+            return backend.get_monthly_goal(username, month_str)
         except Exception as e:
             print(f"Error getting monthly goal: {e}")
+            cache.skip_store()
             return None
 
+@cache.cached("monthly_goals")
 def get_all_monthly_goals(month_str):
     """
     获取某月所有用户的业绩目标和完成情况
     month_str: 'YYYY-MM'
+    (页面展示请使用 get_monthly_goal_overview，已关联姓名/部门)
     """
-    with st.spinner("正在加载全员目标..."):
-        client = get_client()
+    with _spinner("正在加载全员目标..."):
+        backend = _backend()
+        if not backend:
+            return pd.DataFrame()
+
         try:
-            # 同时关联 users 表获取 full_name 会更好，但 Supabase py 客户端联表查询可能比较麻烦
-            # 这里假设 monthly_goals 表里只有 username，我们需要结合 users 表来显示姓名
-            # 或者先简单点，直接返回 monthly_goals，在 app.py 里再匹配姓名
-            
-            response = client.table("monthly_goals").select("*").eq("month", month_str).execute()
-            data = response.data
-            
+            data = backend.list_monthly_goals(month_str)
             if not data:
                 return pd.DataFrame()
                 
             return pd.DataFrame(data)
         except Exception as e:
             print(f"Error getting all monthly goals: {e}")
+            cache.skip_store()
+            return pd.DataFrame()
+
+GOAL_OVERVIEW_COLUMNS = "username, full_name, department, target_amount, completed_amount, revenue_amount"
+
+@cache.cached("monthly_goals")
+def get_monthly_goal_overview(month_str):
+    """
+    获取某月全员目标概览 (已关联 users 表的 full_name / department)
+    一次查询 monthly_goal_overview 视图 (见 migrations.py 第 3 号迁移)
+    month_str: 'YYYY-MM'
+    """
+    with _spinner("正在加载全员目标..."):
+        backend = _backend()
+        if not backend:
+            return pd.DataFrame()
+
+        try:
+            data = backend.monthly_goal_overview(month_str, GOAL_OVERVIEW_COLUMNS)
+            if not data:
+                return pd.DataFrame()
+            return pd.DataFrame(data)
+        except Exception as e:
+            print(f"Error getting monthly goal overview: {e}")
+            cache.skip_store()
             return pd.DataFrame()
 
 def update_user_monthly_goal(username, month_str, target_amount, completed_amount, revenue_amount, added_completed=0, added_revenue=0):
     """
-    更新或创建月度业绩目标，并记录日志
+    更新或创建月度业绩目标 (直接写入总额)，并记录日志
+    页面提交增量请使用 increment_user_monthly_goal，避免并发提交时丢失更新
     """
-    with st.spinner("正在更新目标..."):
-        client = get_client()
+    with _spinner("正在更新目标..."):
+        backend = _backend()
+        if not backend:
+            return False, "数据库未配置"
+
         try:
             # 1. 更新 monthly_goals
             data = {
@@ -323,9 +855,7 @@ def update_user_monthly_goal(username, month_str, target_amount, completed_amoun
                 "revenue_amount": revenue_amount,
                 "updated_at": datetime.now().isoformat()
             }
-            
-            # on_conflict 对应 unique 约束的列
-            client.table("monthly_goals").upsert(data, on_conflict="username, month").execute()
+            backend.upsert_monthly_goal(data)
             
             # 2. 插入 performance_logs (如果增量大于0)
             if added_completed > 0 or added_revenue > 0:
@@ -336,69 +866,430 @@ def update_user_monthly_goal(username, month_str, target_amount, completed_amoun
                     "added_revenue": added_revenue,
                     # created_at 由数据库默认生成
                 }
-                client.table("performance_logs").insert(log_data).execute()
-                
+                backend.insert_performance_log(log_data)
+
+            get_user_monthly_goal.invalidate(username, month_str)
+            get_all_monthly_goals.invalidate(month_str)
+            get_monthly_goal_overview.invalidate(month_str)
+            get_performance_logs.invalidate(username, month_str)
+            cache.invalidate("performance_rollup")
             return True, "更新成功"
         except Exception as e:
             print(f"Error updating monthly goal: {e}")
             return False, str(e)
 
+def increment_user_monthly_goal(username, month_str, added_completed=0, added_revenue=0, target_amount=None):
+    """
+    原子地累加本月业绩/营收，并追加一条提交日志
+    - 在数据库端一次完成 (Supabase RPC increment_monthly_goal / SQLite 事务)，无需先读再写，
+      多人同时提交也不会丢失更新
+    - target_amount 为 None 时保持原目标不变
+    返回 (success, msg, 更新后的目标记录 dict)
+    """
+    with _spinner("正在更新目标..."):
+        backend = _backend()
+        if not backend:
+            return False, "数据库未配置", None
+
+        try:
+            goal = backend.increment_monthly_goal(username, month_str, added_completed, added_revenue, target_amount)
+
+            get_user_monthly_goal.invalidate(username, month_str)
+            get_all_monthly_goals.invalidate(month_str)
+            get_monthly_goal_overview.invalidate(month_str)
+            get_performance_logs.invalidate(username, month_str)
+            cache.invalidate("performance_rollup")
+            return True, "更新成功", goal
+        except Exception as e:
+            print(f"Error incrementing monthly goal: {e}")
+            return False, str(e), None
+
+@cache.cached("performance_logs")
 def get_performance_logs(username, month_str):
     """
     获取某月的业绩提交记录
     """
-    with st.spinner("正在加载提交记录..."):
-        client = get_client()
+    with _spinner("正在加载提交记录..."):
+        backend = _backend()
+        if not backend:
+            return pd.DataFrame()
+
         try:
-            response = client.table("performance_logs").select("*")\
-                .eq("username", username)\
-                .eq("month", month_str)\
-                .order("created_at", desc=True)\
-                .execute()
-            
-            data = response.data
+            data = backend.list_performance_logs(username, month_str)
             if not data:
                 return pd.DataFrame()
             return pd.DataFrame(data)
         except Exception as e:
             print(f"Error getting performance logs: {e}")
+            cache.skip_store()
             return pd.DataFrame()
 
-# --- 附录：Supabase 建表 SQL ---
-# 请在 Supabase Dashboard -> SQL Editor 中运行以下语句：
-"""
--- 1. 启用 RLS
-ALTER TABLE users ENABLE ROW LEVEL SECURITY;
-ALTER TABLE reports ENABLE ROW LEVEL SECURITY;
-
--- 2. 创建允许匿名访问的策略 (适用于当前使用 anon key 的场景)
--- 允许所有操作 (增删改查)
-CREATE POLICY "Allow all access for public" ON users FOR ALL USING (true) WITH CHECK (true);
-CREATE POLICY "Allow all access for public" ON reports FOR ALL USING (true) WITH CHECK (true);
-
--- 3. 月度业绩目标表
-CREATE TABLE monthly_goals (
-  id bigint generated by default as identity primary key,
-  username text not null,
-  month text not null, -- 格式 YYYY-MM
-  target_amount double precision default 0,
-  completed_amount double precision default 0,
-  revenue_amount double precision default 0,
-  updated_at timestamp with time zone default timezone('utc'::text, now()),
-  unique(username, month)
-);
-ALTER TABLE monthly_goals ENABLE ROW LEVEL SECURITY;
-CREATE POLICY "Allow all access for public" ON monthly_goals FOR ALL USING (true) WITH CHECK (true);
-
--- 4. 业绩提交日志表
-CREATE TABLE performance_logs (
-  id bigint generated by default as identity primary key,
-  username text not null,
-  month text not null, -- 格式 YYYY-MM
-  added_completed double precision default 0,
-  added_revenue double precision default 0,
-  created_at timestamp with time zone default timezone('utc'::text, now())
-);
-ALTER TABLE performance_logs ENABLE ROW LEVEL SECURITY;
-CREATE POLICY "Allow all access for public" ON performance_logs FOR ALL USING (true) WITH CHECK (true);
-"""
+# --- 增量刷新 (snapshot.SessionSnapshot 使用) ---
+# 只返回高水位之后变化的数据；出错时返回 None，调用方保留原有数据下次再试
+def get_users_since(created_at):
+    """
+    获取 created_at 晚于给定时间的新用户 (列同 get_all_users)
+    """
+    backend = _backend()
+    if not backend:
+        return None
+
+    try:
+        return pd.DataFrame(backend.list_users_since(USER_LIST_COLUMNS, created_at))
+    except Exception as e:
+        print(f"Error getting new users: {e}")
+        return None
+
+def get_latest_report_id():
+    """
+    获取当前最大的日报 id (没有日报时为 0)
+    """
+    backend = _reports_backend()
+    if not backend:
+        return None
+
+    try:
+        return backend.latest_report_id() or 0
+    except Exception as e:
+        print(f"Error getting latest report id: {e}")
+        return None
+
+def get_names_since(report_id):
+    """
+    获取 id 大于 report_id 的日报中出现的员工姓名
+    """
+    backend = _reports_backend()
+    if not backend:
+        return None
+
+    try:
+        return backend.employee_names_since(report_id)
+    except Exception as e:
+        print(f"Error getting new names: {e}")
+        return None
+
+def get_monthly_goal_if_changed(username, month_str, updated_at):
+    """
+    updated_at 与给定值不同时返回最新的目标记录，未变化 (或没有记录) 时返回 None
+    """
+    backend = _backend()
+    if not backend:
+        return None
+
+    try:
+        return backend.monthly_goal_changed_since(username, month_str, updated_at)
+    except Exception as e:
+        print(f"Error checking monthly goal: {e}")
+        return None
+
+# --- 业绩汇总 ---
+# 趋势图、排行榜、部门汇总读取按日预汇总的 performance_daily_rollup (由数据库触发器随日志写入维护)，
+# 不再扫描 performance_logs 明细
+ROLLUP_COLUMNS = "username, full_name, department, month, day, added_completed, added_revenue, submissions"
+ROLLUP_VALUE_COLUMNS = ['added_completed', 'added_revenue', 'submissions']
+PERFORMANCE_GRANULARITIES = ("day", "week", "month")
+# 核对时允许的金额误差 (浮点累加)
+RECONCILE_TOLERANCE = 0.01
+UNASSIGNED_DEPARTMENT = "未分配"
+
+def _rollup_frame(rows):
+    df = pd.DataFrame(rows, columns=[c.strip() for c in ROLLUP_COLUMNS.split(",")])
+    df[ROLLUP_VALUE_COLUMNS] = df[ROLLUP_VALUE_COLUMNS].fillna(0)
+    df['department'] = df['department'].fillna(UNASSIGNED_DEPARTMENT)
+    return df
+
+@cache.cached("performance_rollup")
+def get_performance_rollup(month_str=None, start_day=None, end_day=None, username=None):
+    """
+    获取按 (用户, 月份, 日期) 汇总的业绩
+    日期为北京时间 'YYYY-MM-DD'；month 为提交时选择的目标月份
+    """
+    with _spinner("正在加载业绩汇总..."):
+        backend = _backend()
+        if not backend:
+            return _rollup_frame([])
+
+        try:
+            rows = backend.performance_rollup(ROLLUP_COLUMNS, month_str, start_day, end_day, username)
+            return _rollup_frame(rows)
+        except Exception as e:
+            print(f"Error getting performance rollup: {e}")
+            cache.skip_store()
+            return _rollup_frame([])
+
+def get_performance_series(granularity="day", month_str=None, start_day=None, end_day=None, username=None, department=None,
+                           rollup=None):
+    """
+    业绩时间序列
+    granularity: "day" (按日，缺失日期补 0) / "week" (按周，period 为周一日期) / "month" (按目标月份)
+    rollup: 已加载的同一范围的 get_performance_rollup 结果 (如页面预取的数据)，不传时查询
+    返回列: period, added_completed, added_revenue, submissions
+    """
+    if granularity not in PERFORMANCE_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity!r}")
+
+    df = rollup if rollup is not None else get_performance_rollup(month_str, start_day, end_day, username)
+    if department:
+        df = df[df['department'] == department]
+    if df.empty:
+        return pd.DataFrame(columns=['period'] + ROLLUP_VALUE_COLUMNS)
+
+    if granularity == "month":
+        series = df.groupby('month')[ROLLUP_VALUE_COLUMNS].sum()
+    else:
+        days = pd.to_datetime(df['day'])
+        series = df.groupby(days)[ROLLUP_VALUE_COLUMNS].sum()
+        full_range = pd.date_range(start_day or series.index.min(), end_day or series.index.max(), freq="D")
+        series = series.reindex(full_range, fill_value=0)
+        if granularity == "week":
+            series = series.resample("W-MON", label="left", closed="left").sum()
+        series.index = series.index.strftime('%Y-%m-%d')
+
+    series.index.name = 'period'
+    return series.reset_index()
+
+def get_performance_leaderboard(month_str, limit=None, rollup=None):
+    """
+    某月个人业绩排行 (按已完成业绩倒序)
+    rollup: 已加载的该月 get_performance_rollup 结果，不传时查询
+    返回列: username, full_name, department, added_completed, added_revenue, submissions
+    """
+    df = rollup if rollup is not None else get_performance_rollup(month_str)
+    board = df.groupby(['username', 'full_name', 'department'], as_index=False)[ROLLUP_VALUE_COLUMNS].sum()
+    board = board.sort_values(['added_completed', 'added_revenue'], ascending=False, ignore_index=True)
+    return board.head(limit) if limit else board
+
+def get_department_totals(month_str, rollup=None):
+    """
+    某月按部门汇总的业绩
+    rollup: 已加载的该月 get_performance_rollup 结果，不传时查询
+    返回列: department, members, added_completed, added_revenue, submissions
+    """
+    df = rollup if rollup is not None else get_performance_rollup(month_str)
+    totals = df.groupby('department').agg(
+        members=('username', 'nunique'),
+        added_completed=('added_completed', 'sum'),
+        added_revenue=('added_revenue', 'sum'),
+        submissions=('submissions', 'sum'),
+    )
+    return totals.sort_values('added_completed', ascending=False).reset_index()
+
+def reconcile_monthly_goals(month_str, tolerance=RECONCILE_TOLERANCE):
+    """
+    核对 monthly_goals 中的累计值与提交日志汇总是否一致
+    直接读取数据库 (不走缓存)，返回存在差异的用户:
+    username, goal_completed, logged_completed, completed_diff, goal_revenue, logged_revenue, revenue_diff
+    查询失败时返回 None
+    """
+    backend = _backend()
+    if not backend:
+        return None
+
+    try:
+        goals = pd.DataFrame(
+            backend.list_monthly_goals(month_str),
+            columns=['username', 'completed_amount', 'revenue_amount'],
+        )
+        logged = _rollup_frame(backend.performance_rollup(ROLLUP_COLUMNS, month_str))
+    except Exception as e:
+        print(f"Error reconciling monthly goals: {e}")
+        return None
+
+    goals = goals[['username', 'completed_amount', 'revenue_amount']].rename(
+        columns={'completed_amount': 'goal_completed', 'revenue_amount': 'goal_revenue'}
+    )
+    logged = logged.groupby('username', as_index=False)[['added_completed', 'added_revenue']].sum().rename(
+        columns={'added_completed': 'logged_completed', 'added_revenue': 'logged_revenue'}
+    )
+    merged = goals.merge(logged, on='username', how='outer')
+    value_columns = ['goal_completed', 'logged_completed', 'goal_revenue', 'logged_revenue']
+    merged[value_columns] = merged[value_columns].astype("float64").fillna(0)
+    merged['completed_diff'] = merged['goal_completed'] - merged['logged_completed']
+    merged['revenue_diff'] = merged['goal_revenue'] - merged['logged_revenue']
+
+    drift = (merged['completed_diff'].abs() > tolerance) | (merged['revenue_diff'].abs() > tolerance)
+    columns = ['username', 'goal_completed', 'logged_completed', 'completed_diff',
+               'goal_revenue', 'logged_revenue', 'revenue_diff']
+    return merged.loc[drift, columns].sort_values('username', ignore_index=True)
+
+def rebuild_performance_rollup():
+    """
+    按 performance_logs 全量重建汇总表 (汇总表本身出现偏差时使用)
+    """
+    backend = _backend()
+    if not backend:
+        return False, "数据库未配置"
+
+    try:
+        backend.rebuild_performance_rollup()
+        cache.invalidate("performance_rollup")
+        return True, "汇总数据已重建"
+    except Exception as e:
+        print(f"Error rebuilding performance rollup: {e}")
+        return False, str(e)
+
+# --- 批量导入 ---
+# 每块行数：每块一次冲突检测查询 + 一次多行插入
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+
+def _iter_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _new_import_result():
+    """
+    批量导入结果：inserted 为成功行数，skipped/failed 为 [(行号, 原因), ...]
+    """
+    return {'inserted': 0, 'skipped': [], 'failed': []}
+
+def _insert_rows_one_by_one(insert, chunk, result, skip_reason):
+    """
+    整块插入失败时逐行重试，把错误定位到具体的行
+    insert 返回实际插入的行数，为 0 时记为跳过；返回插入成功的行号集合
+    """
+    inserted = set()
+    for row_no, record in chunk:
+        try:
+            if insert([record]):
+                result['inserted'] += 1
+                inserted.add(row_no)
+            else:
+                result['skipped'].append((row_no, skip_reason(record)))
+        except Exception as e:
+            result['failed'].append((row_no, str(e)))
+    return inserted
+
+def bulk_create_users(rows, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    批量创建用户
+    rows: 可迭代的 (行号, {username, password, full_name, department, phone})，按块消费，不需要一次全部读入
+    已存在的用户名和文件内重复的用户名会跳过；密码写入前计算哈希；progress(已处理行数) 在每块完成后调用
+    """
+    result = _new_import_result()
+    backend = _backend()
+    if not backend:
+        result['failed'].append((None, "数据库未配置"))
+        return result
+
+    seen = set()
+    processed = 0
+    for chunk in _iter_chunks(rows, chunk_size):
+        batch = []
+        for row_no, user in chunk:
+            if user['username'] in seen:
+                result['skipped'].append((row_no, f"文件中重复的用户名: {user['username']}"))
+            else:
+                seen.add(user['username'])
+                batch.append((row_no, dict(user, is_admin=False)))
+
+        # 密码在写入前批量计算哈希
+        for (_, user), hashed in zip(batch, auth.hash_passwords(user['password'] for _, user in batch)):
+            user['password'] = hashed
+
+        try:
+            created = backend.insert_users([user for _, user in batch])
+            result['inserted'] += len(created)
+            result['skipped'].extend(
+                (row_no, f"用户名已存在: {user['username']}") for row_no, user in batch if user['username'] not in created
+            )
+        except Exception as e:
+            print(f"Bulk create users error: {e}")
+            _insert_rows_one_by_one(
+                lambda users: len(backend.insert_users(users)), batch, result,
+                lambda user: f"用户名已存在: {user['username']}",
+            )
+
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+
+    if result['inserted']:
+        cache.invalidate("users", "employee_names")
+        get_monthly_goal_overview.clear()
+    return result
+
+def bulk_add_reports(rows, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    批量导入日报 (如从表格迁移历史日报)
+    rows: 可迭代的 (行号, {employee_name, report_date, work_content, next_plan, problems[, created_at]})
+    与已有日报或文件中前面的行完全相同 (姓名、日期、工作内容一致) 的行会跳过，重复导入同一文件不会产生重复数据
+    """
+    result = _new_import_result()
+    backend = _backend()
+    if not backend:
+        result['failed'].append((None, "数据库未配置"))
+        return result
+
+    # 只保存摘要，内存占用与正文长度无关
+    seen = set()
+    names = set()
+    processed = 0
+    for chunk in _iter_chunks(rows, chunk_size):
+        keys = [(r['employee_name'], r['report_date'], r['work_content']) for _, r in chunk]
+        try:
+            existing = backend.existing_report_keys(list(set(keys)))
+        except Exception as e:
+            print(f"Error checking existing reports: {e}")
+            result['failed'].extend((row_no, str(e)) for row_no, _ in chunk)
+            processed += len(chunk)
+            if progress:
+                progress(processed)
+            continue
+
+        # 本块中第一次出现的日报 (行号 -> 摘要)；块内与其相同的行等插入结果出来后再判定
+        batch, digests, repeats = [], {}, []
+        first_row = {}
+        for (row_no, report), key in zip(chunk, keys):
+            digest = hashlib.sha1("\x1f".join(map(str, key)).encode("utf-8")).digest()
+            if key in existing:
+                result['skipped'].append((row_no, "日报已存在"))
+            elif digest in seen:
+                result['skipped'].append((row_no, "文件中重复的日报"))
+            elif digest in first_row:
+                repeats.append((row_no, digest))
+            else:
+                first_row[digest] = row_no
+                digests[row_no] = digest
+                batch.append((row_no, report))
+
+        try:
+            if batch:
+                result['inserted'] += backend.insert_reports([report for _, report in batch])
+            inserted = set(digests)
+        except Exception as e:
+            print(f"Bulk add reports error: {e}")
+            inserted = _insert_rows_one_by_one(backend.insert_reports, batch, result, lambda report: "日报已存在")
+        # 只记录插入成功的日报：插入失败的行在文件后面再次出现时会重新尝试，而不是被当作重复
+        seen.update(digests[row_no] for row_no in inserted)
+        for row_no, digest in repeats:
+            if digest in seen:
+                result['skipped'].append((row_no, "文件中重复的日报"))
+            else:
+                result['failed'].append((row_no, f"与第 {first_row[digest]} 行相同，该行导入失败"))
+        names.update(report['employee_name'] for row_no, report in batch if row_no in inserted)
+
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+
+    if result['inserted']:
+        report_cache.get_cache().mark_stale()
+        cache.invalidate("reports", "employee_names")
+        for name in names:
+            _forget_latest_reports(name)
+    return result
+
+# --- 耗时统计 ---
+# 本模块的全部公开函数 (连接管理除外) 都记录耗时、行数、传输字节数和缓存命中，见 metrics.py
+metrics.instrument_module(globals(), "db", skip={"get_client", "close_client", "get_backend_name", "init_db"})
+
+# --- 附录：建表 SQL ---
+# 表结构、索引、视图、数据库函数均由 migrations.py 中按版本号排列的迁移维护：
+#   python migrations.py postgres <DATABASE_URL>   直接连接 Supabase 数据库执行尚未应用的迁移
+#   python migrations.py --sql                      输出完整 SQL，粘贴到 Supabase Dashboard -> SQL Editor 运行
+#   python migrations.py postgres --check           检查热点查询是否走索引
+# 使用 SQLite 后端时无需手动建表，首次连接时自动迁移
@@ -0,0 +1,106 @@
+"""
+日报导出 (CSV / Excel)
+- 数据从数据库按页读取 (db_manager.iter_reports)，逐批写入临时文件
+- 生成文件时的内存占用只与批大小有关，与导出的日期范围无关
+- 返回文件对象，交给 st.download_button
+限制：st.download_button 会把文件完整读入内存 (MediaFileManager) 后再提供下载，
+因此下载时整个导出文件会在服务进程内存中驻留一次 (不会再有 DataFrame 等额外副本)
+"""
+import csv
+import io
+import tempfile
+from itertools import islice
+
+import lazy
+import transforms
+
+# 只在导出 Excel 时导入
+xlsxwriter = lazy.module("xlsxwriter")
+
+EXPORT_COLUMNS = ['report_date', 'employee_name', 'work_content', 'next_plan', 'problems', 'created_at']
+EXPORT_HEADERS = {
+    "report_date": "汇报日期",
+    "employee_name": "员工姓名",
+    "work_content": "今日工作内容",
+    "next_plan": "明日工作计划",
+    "problems": "遇到的困难/协助",
+    "created_at": "提交时间",
+}
+# 每批处理的行数 (时区转换按批向量化)
+EXPORT_BATCH_SIZE = 1000
+# Excel 单个工作表最多 1048576 行 (含表头)，超出后续写到新工作表
+XLSX_MAX_ROWS = 1048575
+
+def _iter_batches(rows, batch_size=EXPORT_BATCH_SIZE):
+    """
+    按批产出导出行 (list of list)，提交时间转换为北京时间字符串
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        created_at = transforms.to_beijing_time([row.get('created_at') for row in batch])
+        created_at = created_at.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+        yield [
+            [row.get(col) for col in EXPORT_COLUMNS[:-1]] + [created]
+            for row, created in zip(batch, created_at)
+        ]
+
+def _as_download(tmp):
+    """
+    将写好的临时文件转为 st.download_button 可接受的文件对象
+    """
+    tmp.flush()
+    tmp.seek(0)
+    if isinstance(tmp, io.BufferedRandom):
+        # 交出底层 FileIO (RawIOBase)，临时文件在对象释放后自动删除
+        return tmp.detach()
+    data = tmp.read()
+    tmp.close()
+    return data
+
+def build_csv(rows):
+    """
+    将日报行写为 CSV (UTF-8 BOM，Excel 可直接打开中文)
+    rows: 可迭代的 dict (如 db_manager.iter_reports 的结果)
+    """
+    tmp = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(tmp, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow([EXPORT_HEADERS[col] for col in EXPORT_COLUMNS])
+    for batch in _iter_batches(rows):
+        writer.writerows(batch)
+    text.flush()
+    # 分离文本包装，保留底层文件
+    return _as_download(text.detach())
+
+def build_xlsx(rows):
+    """
+    将日报行写为 Excel (.xlsx)
+    使用 constant_memory 模式，逐行落盘，不在内存中保留整张表
+    """
+    tmp = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(tmp, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    text_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+
+    worksheet = None
+    row_index = XLSX_MAX_ROWS
+    for batch in _iter_batches(rows):
+        for values in batch:
+            if row_index >= XLSX_MAX_ROWS:
+                worksheet = workbook.add_worksheet()
+                worksheet.set_column(0, 1, 12)
+                worksheet.set_column(2, 4, 40)
+                worksheet.set_column(5, 5, 20)
+                worksheet.write_row(0, 0, [EXPORT_HEADERS[col] for col in EXPORT_COLUMNS], header_format)
+                row_index = 0
+            row_index += 1
+            worksheet.write_row(row_index, 0, values, text_format)
+
+    if worksheet is None:
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [EXPORT_HEADERS[col] for col in EXPORT_COLUMNS], header_format)
+    workbook.close()
+    return _as_download(tmp)
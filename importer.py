@@ -0,0 +1,189 @@
+"""
+批量导入 (CSV / Excel)
+- 逐行读取上传的文件：CSV 按流解码，Excel 使用 openpyxl 只读模式逐行解析
+- 每行校验后交给 db_manager.bulk_create_users / bulk_add_reports 按块写入数据库
+- 表头可以用英文字段名或中文列名；日报表头与导出文件 (export.py) 一致，导出的文件可直接导回
+"""
+import codecs
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+
+import db_manager
+import export
+import lazy
+
+# 只在导入 Excel 文件时导入
+openpyxl = lazy.module("openpyxl")
+
+BEIJING = timezone(timedelta(hours=8))
+# 检测 CSV 编码时读取的字节数
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+USER_HEADERS = {
+    "username": "用户名",
+    "password": "密码",
+    "full_name": "姓名",
+    "department": "部门",
+    "phone": "电话",
+}
+USER_REQUIRED = ("username", "password", "full_name")
+REPORT_HEADERS = export.EXPORT_HEADERS
+REPORT_REQUIRED = ("employee_name", "report_date", "work_content")
+
+def _detect_encoding(file):
+    """
+    UTF-8 (含 BOM) 或 GB18030 (Excel 另存为 CSV 的默认编码)
+    """
+    head = file.read(ENCODING_SNIFF_BYTES)
+    file.seek(0)
+    try:
+        # 非 final 模式：末尾被截断的多字节字符不算错误
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding=_detect_encoding(file), newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        # 不随包装对象一起关闭上传的文件
+        text.detach()
+
+def _iter_xlsx(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_rows(file, filename):
+    """
+    按行产出上传文件的单元格值 (第一行为表头)
+    """
+    if filename.lower().endswith(".xlsx"):
+        return _iter_xlsx(file)
+    return _iter_csv(file)
+
+def _header_index(header, headers, required):
+    """
+    将表头映射为 {字段名: 列序号}，缺少必填列时抛出 ValueError
+    """
+    aliases = {}
+    for field, label in headers.items():
+        aliases[field] = field
+        aliases[label] = field
+    index = {}
+    for i, cell in enumerate(header):
+        field = aliases.get(str(cell).strip()) if cell is not None else None
+        if field and field not in index:
+            index[field] = i
+    missing = [headers[field] for field in required if field not in index]
+    if missing:
+        raise ValueError(f"缺少必填列: {', '.join(missing)}")
+    return index
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Excel 中的电话号码等数字列
+        value = int(value)
+    return str(value).strip()
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = _text(value).replace("/", "-").replace(".", "-")
+    return datetime.strptime(text, "%Y-%m-%d").date().isoformat()
+
+def _parse_created_at(value):
+    """
+    提交时间：没有时区的时间按北京时间处理 (与导出文件一致)，统一转为 UTC
+    """
+    if value is None or _text(value) == "":
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(_text(value).replace("/", "-"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=BEIJING)
+    return value.astimezone(timezone.utc)
+
+def _iter_records(rows, headers, required, parse):
+    """
+    产出 (行号, 记录, 错误)；空行跳过，校验失败的行记录为错误，不中断导入
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("文件为空")
+    index = _header_index(header, headers, required)
+
+    for row_no, row in enumerate(rows, start=2):
+        if not any(_text(cell) for cell in row):
+            continue
+        values = {field: (row[i] if i < len(row) else None) for field, i in index.items()}
+        missing = [headers[field] for field in required if not _text(values.get(field))]
+        if missing:
+            yield row_no, None, f"缺少: {', '.join(missing)}"
+            continue
+        try:
+            yield row_no, parse(values), None
+        except ValueError as e:
+            yield row_no, None, f"格式错误: {e}"
+
+def _parse_user(values):
+    return {field: _text(values.get(field)) for field in USER_HEADERS}
+
+def _parse_report(values):
+    report = {
+        "employee_name": _text(values.get("employee_name")),
+        "report_date": _parse_date(values.get("report_date")),
+        "work_content": _text(values.get("work_content")),
+        "next_plan": _text(values.get("next_plan")),
+        "problems": _text(values.get("problems")),
+    }
+    created_at = _parse_created_at(values.get("created_at"))
+    if created_at is not None:
+        report["created_at"] = created_at
+    return report
+
+def _run_import(rows, headers, required, parse, bulk_insert, chunk_size, progress):
+    """
+    校验失败的行直接记为失败，其余行按块交给 bulk_insert
+    """
+    invalid = []
+
+    def valid_records():
+        for row_no, record, error in _iter_records(rows, headers, required, parse):
+            if error:
+                invalid.append((row_no, error))
+            else:
+                yield row_no, record
+
+    result = bulk_insert(valid_records(), chunk_size=chunk_size, progress=progress)
+    result['failed'] = sorted(invalid + result['failed'], key=lambda item: item[0] or 0)
+    return result
+
+def import_users(file, filename, chunk_size=db_manager.IMPORT_CHUNK_SIZE, progress=None):
+    """
+    从 CSV/XLSX 批量创建用户，列: 用户名、密码、姓名 (必填)、部门、电话
+    返回 db_manager.bulk_create_users 的结果，文件格式错误时抛出 ValueError
+    """
+    return _run_import(
+        iter_rows(file, filename), USER_HEADERS, USER_REQUIRED, _parse_user,
+        db_manager.bulk_create_users, chunk_size, progress,
+    )
+
+def import_reports(file, filename, chunk_size=db_manager.IMPORT_CHUNK_SIZE, progress=None):
+    """
+    从 CSV/XLSX 批量导入日报，列: 汇报日期、员工姓名、今日工作内容 (必填)、明日工作计划、遇到的困难/协助、提交时间
+    """
+    return _run_import(
+        iter_rows(file, filename), REPORT_HEADERS, REPORT_REQUIRED, _parse_report,
+        db_manager.bulk_add_reports, chunk_size, progress,
+    )
@@ -0,0 +1,43 @@
+"""
+按需导入重量级依赖 (pandas、supabase、openpyxl 等)，缩短冷启动时间
+    pd = lazy.module("pandas")
+模块在第一次访问其属性时才导入：未登录时的登录页不加载 pandas，使用 SQLite 后端时不加载 supabase，
+Excel 相关的库只在导入 / 导出时加载
+"""
+import importlib
+import sys
+import threading
+
+# 页面数据由线程池并发加载 (snapshot)，多个线程可能同时第一次访问 pandas / numpy；
+# 并发导入互相依赖的模块时 Python 可能返回未初始化完的模块，这里让按需导入逐个进行
+_import_lock = threading.RLock()
+
+class LazyModule:
+    """
+    模块代理：第一次访问属性时导入，之后直接转发到真实模块
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with _import_lock:
+                module = self._module
+                if module is None:
+                    module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def module(name):
+    return LazyModule(name)
+
+def loaded(name):
+    """
+    返回已导入的模块；尚未导入时返回 None (不触发导入)
+    """
+    return sys.modules.get(name)
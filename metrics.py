@@ -0,0 +1,381 @@
+"""
+热点路径的耗时统计
+- span(kind, name) / timed(kind)：记录一次调用的耗时、返回行数、网络传输字节数、缓存命中情况
+  kind: page (app.py 的 render_*_page)、db (db_manager 公开函数)、backend (存储后端方法，即实际的数据库请求)
+- 每次页面运行的调用记录供管理员的“性能面板”展示 (begin_run / run_spans)
+- 进程级的 Prometheus 风格计数器和直方图，可通过本地 HTTP 端口导出 (METRICS_PORT)
+- 每次调用输出一行 JSON 日志 (logger "mtpdr.metrics")：慢调用为 WARNING，页面为 INFO，其余为 DEBUG
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lazy
+
+# 超过该耗时 (毫秒) 的调用以 WARNING 级别记录
+SLOW_CALL_MS = float(os.environ.get("METRICS_SLOW_MS", "500"))
+# 设置后在该端口提供 /metrics (Prometheus 文本格式)
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+# 耗时直方图的桶 (秒)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_PREFIX = "mtpdr"
+
+logger = logging.getLogger("mtpdr.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.environ.get("METRICS_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+# --- Prometheus 风格的指标 ---
+_metrics_lock = threading.Lock()
+_counters = {}    # (指标名, 标签) -> 值
+_histograms = {}  # (指标名, 标签) -> [各桶计数..., +Inf 计数, 总和]
+_help = {
+    "calls_total": ("counter", "调用次数"),
+    "call_duration_seconds": ("histogram", "调用耗时"),
+    "rows_total": ("counter", "返回的行数"),
+    "payload_bytes_total": ("counter", "从数据库接收的字节数"),
+    "cache_requests_total": ("counter", "进程缓存查询次数"),
+}
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+def inc(metric, value=1, **labels):
+    """
+    计数器加 value
+    """
+    key = (metric, _labels(**labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(metric, value, **labels):
+    """
+    向直方图记录一个观测值
+    """
+    key = (metric, _labels(**labels))
+    with _metrics_lock:
+        buckets = _histograms.get(key)
+        if buckets is None:
+            buckets = _histograms[key] = [0] * (len(DURATION_BUCKETS) + 2)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        buckets[-2] += 1
+        buckets[-1] += value
+
+def counter_total(metric, **labels):
+    """
+    计数器中标签匹配的各序列之和，如 counter_total("calls_total", kind="backend")
+    """
+    wanted = set(labels.items())
+    with _metrics_lock:
+        return sum(value for (name, series), value in _counters.items() if name == metric and wanted <= set(series))
+
+def _format_labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def prometheus_text():
+    """
+    以 Prometheus 文本格式输出全部指标
+    """
+    with _metrics_lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+
+    lines = []
+    for name, (metric_type, help_text) in _help.items():
+        full_name = f"{METRIC_PREFIX}_{name}"
+        if metric_type == "counter":
+            series = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+        else:
+            series = sorted((labels, value) for (n, labels), value in histograms.items() if n == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for labels, value in series:
+            if metric_type == "counter":
+                lines.append(f"{full_name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(DURATION_BUCKETS, value):
+                lines.append(f"{full_name}_bucket{_format_labels(labels, le=bound)} {count}")
+            lines.append(f"{full_name}_bucket{_format_labels(labels, le='+Inf')} {value[-2]}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {value[-1]:.6f}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """
+    清空全部指标
+    """
+    with _metrics_lock:
+        _counters.clear()
+        _histograms.clear()
+
+class _ExporterHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_exporter_lock = threading.Lock()
+_exporter = None
+
+def start_exporter(port=None, host=None):
+    """
+    在后台线程中启动 /metrics 端口 (每个进程只启动一次)；未配置端口时不启动
+    返回 HTTP 服务对象或 None
+    """
+    global _exporter
+    port = port if port is not None else METRICS_PORT
+    if port in (None, ""):
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            try:
+                _exporter = ThreadingHTTPServer((host or METRICS_HOST, int(port)), _ExporterHandler)
+            except OSError as e:
+                # 多个进程共用同一端口时只有第一个能启动
+                print(f"Metrics exporter not started: {e}")
+                return None
+            threading.Thread(target=_exporter.serve_forever, name="metrics-exporter", daemon=True).start()
+    return _exporter
+
+# --- 调用记录 ---
+_current_span = contextvars.ContextVar("metrics_current_span", default=None)
+_run_spans = contextvars.ContextVar("metrics_run_spans", default=None)
+_span_lock = threading.Lock()
+
+class Span:
+    """
+    一次调用的统计；rows 只统计本层返回值，bytes 和缓存次数会累加到外层调用
+    """
+    __slots__ = ("kind", "name", "parent", "depth", "start", "duration", "rows",
+                 "bytes", "cache_hits", "cache_misses", "error")
+
+    def __init__(self, kind, name, parent):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.start = time.perf_counter()
+        self.duration = None
+        self.rows = None
+        self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.error = None
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'depth': self.depth,
+            'ms': round(self.duration * 1000, 2),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'error': self.error,
+        }
+
+def begin_run():
+    """
+    开始一次页面运行，之后的调用记录到新的列表中
+    """
+    _run_spans.set({'started': time.perf_counter(), 'spans': []})
+
+def run_spans():
+    """
+    本次运行的调用记录 (按开始时间排序)，每项含 offset_ms (相对运行开始的时间)
+    """
+    run = _run_spans.get()
+    if run is None:
+        return []
+    with _span_lock:
+        spans = sorted(run['spans'], key=lambda s: s.start)
+    return [dict(span.as_dict(), offset_ms=round((span.start - run['started']) * 1000, 2)) for span in spans]
+
+def run_elapsed_ms():
+    """
+    本次运行开始至今的耗时 (毫秒)
+    """
+    run = _run_spans.get()
+    return (time.perf_counter() - run['started']) * 1000 if run is not None else 0.0
+
+def _has_rows(value):
+    if isinstance(value, list):
+        return True
+    # 返回值是 DataFrame 时 pandas 必然已导入，这里不主动导入；
+    # 其他线程正在导入 pandas 时模块里可能还没有 DataFrame
+    frame = getattr(lazy.loaded("pandas"), "DataFrame", None)
+    return frame is not None and isinstance(value, frame)
+
+def count_rows(value):
+    """
+    估计返回值的行数：DataFrame / list 取长度，(数据, 游标或总数) 取第一项的长度，dict 记 1 行
+    """
+    if value is None:
+        return 0
+    if _has_rows(value):
+        return len(value)
+    if isinstance(value, tuple) and value and _has_rows(value[0]):
+        return len(value[0])
+    if isinstance(value, dict):
+        return 1
+    return None
+
+def add_bytes(count):
+    """
+    记录当前调用从数据库接收的字节数 (supabase_backend 的 HTTP 响应钩子调用)
+    """
+    span = _current_span.get()
+    if span is not None:
+        with _span_lock:
+            span.bytes += count
+
+def record_cache(table, result):
+    """
+    记录一次进程缓存查询 (cache 回调)，result 为 hit / miss / stale
+    """
+    inc("cache_requests_total", table=table, result=result)
+    span = _current_span.get()
+    if span is not None:
+        with _span_lock:
+            if result == "hit":
+                span.cache_hits += 1
+            else:
+                span.cache_misses += 1
+
+def _finish(span, duration=None):
+    span.duration = duration if duration is not None else time.perf_counter() - span.start
+    status = "error" if span.error else "ok"
+    inc("calls_total", kind=span.kind, name=span.name, status=status)
+    observe("call_duration_seconds", span.duration, kind=span.kind, name=span.name)
+    if span.rows:
+        inc("rows_total", span.rows, kind=span.kind, name=span.name)
+    if span.bytes and span.kind == "backend":
+        # 只在最内层统计网络字节，外层的累加值不重复计数
+        inc("payload_bytes_total", span.bytes, kind=span.kind, name=span.name)
+
+    with _span_lock:
+        if span.parent is not None:
+            span.parent.bytes += span.bytes
+            span.parent.cache_hits += span.cache_hits
+            span.parent.cache_misses += span.cache_misses
+        run = _run_spans.get()
+        if run is not None:
+            run['spans'].append(span)
+
+    ms = span.duration * 1000
+    if ms >= SLOW_CALL_MS:
+        level = logging.WARNING
+    elif span.kind == "page":
+        level = logging.INFO
+    else:
+        level = logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(dict(span.as_dict(), event="call", ts=round(time.time(), 3)), ensure_ascii=False))
+
+class span:
+    """
+    上下文管理器：统计 with 块的耗时
+        with metrics.span("db", "get_reports_page") as s:
+            ...
+            s.rows = len(df)
+    """
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self._span = Span(self.kind, self.name, _current_span.get())
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self._span.error = type(exc).__name__
+        _finish(self._span)
+        return False
+
+def timed(kind, name=None):
+    """
+    装饰器：统计函数调用
+    生成器函数统计迭代结束时的产出行数和生成器自身的耗时 (不含调用方处理每一项的时间)
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                s = Span(kind, label, _current_span.get())
+                s.rows = 0
+                elapsed = 0.0
+                inner = func(*args, **kwargs)
+                try:
+                    while True:
+                        # 只在生成器内部执行时把它设为当前调用，暂停期间不影响调用方的统计
+                        token = _current_span.set(s)
+                        step_start = time.perf_counter()
+                        try:
+                            item = next(inner)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - step_start
+                            _current_span.reset(token)
+                        s.rows += 1
+                        yield item
+                except Exception as e:
+                    s.error = type(e).__name__
+                    raise
+                finally:
+                    inner.close()
+                    _finish(s, elapsed)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, label) as s:
+                result = func(*args, **kwargs)
+                s.rows = count_rows(result)
+                return result
+        return wrapper
+    return decorator
+
+def instrument_module(namespace, kind, skip=()):
+    """
+    为模块中定义的全部公开函数套上 timed(kind) (在模块末尾调用：instrument_module(globals(), "db"))
+    """
+    module = namespace.get("__name__")
+    for attr, value in list(namespace.items()):
+        if attr.startswith("_") or attr in skip:
+            continue
+        if inspect.isfunction(value) and value.__module__ == module:
+            namespace[attr] = timed(kind)(value)
@@ -0,0 +1,908 @@
+"""
+数据库结构迁移
+- 按版本号排列的迁移，分别提供 Postgres (Supabase) 与 SQLite 两种方言的 SQL
+- schema_migrations 表记录已执行的版本，重复运行只会执行尚未应用的迁移
+- 每个迁移在一个事务中执行，语句本身也尽量可重复执行 (IF NOT EXISTS / OR REPLACE)
+- check_index_usage() 用 EXPLAIN 确认热点查询走索引
+
+用法:
+    python migrations.py sqlite [数据库文件]        # 默认 SQLITE_PATH 或 daily_reports.db
+    python migrations.py postgres [DATABASE_URL]    # 需要安装 psycopg 或 psycopg2
+    python migrations.py sqlite --check             # 迁移后检查热点查询的执行计划
+    python migrations.py --sql                      # 输出 Postgres SQL，可粘贴到 Supabase Dashboard -> SQL Editor
+SQLite 后端在首次连接时自动执行迁移 (见 sqlite_backend.SQLiteBackend._connect)
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+
+DIALECTS = ("postgres", "sqlite")
+
+# 中日韩文字 (含全角标点、假名、谚文)：短关键词索引中每个字单独成词
+_CJK_RE = re.compile(r"([\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef])")
+
+def cjk_spaced(text):
+    """
+    在每个中日韩文字前后加空格，unicode61 分词后每个字是一个词元 (第 9 号迁移的短关键词索引)
+    """
+    if not text:
+        return text
+    return _CJK_RE.sub(r" \1 ", text)
+
+def register_sqlite_functions(conn):
+    """
+    注册迁移和触发器用到的 SQL 函数；每个写入 reports 的 SQLite 连接都要注册
+    (用 sqlite3 命令行等其他工具写入 reports 会报 no such function: cjk_spaced)
+    """
+    conn.create_function("cjk_spaced", 1, cjk_spaced, deterministic=True)
+
+SCHEMA_MIGRATIONS_SQL = {
+    "postgres": """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version integer primary key,
+  name text not null,
+  applied_at timestamp with time zone default timezone('utc'::text, now())
+);
+-- 不开放给 anon key 访问
+ALTER TABLE schema_migrations ENABLE ROW LEVEL SECURITY;
+""",
+    "sqlite": """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+""",
+}
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "name": "initial_schema",
+        "postgres": """
+CREATE TABLE IF NOT EXISTS users (
+  id bigint generated by default as identity primary key,
+  username text not null unique,
+  password text not null,
+  full_name text,
+  department text,
+  phone text,
+  is_admin boolean default false,
+  created_at timestamp with time zone default timezone('utc'::text, now())
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+  id bigint generated by default as identity primary key,
+  employee_name text not null,
+  report_date date not null,
+  work_content text not null,
+  next_plan text,
+  problems text,
+  created_at timestamp with time zone default timezone('utc'::text, now())
+);
+
+-- 月度业绩目标表
+CREATE TABLE IF NOT EXISTS monthly_goals (
+  id bigint generated by default as identity primary key,
+  username text not null,
+  month text not null, -- 格式 YYYY-MM
+  target_amount double precision default 0,
+  completed_amount double precision default 0,
+  revenue_amount double precision default 0,
+  updated_at timestamp with time zone default timezone('utc'::text, now()),
+  unique(username, month)
+);
+
+-- 业绩提交日志表
+CREATE TABLE IF NOT EXISTS performance_logs (
+  id bigint generated by default as identity primary key,
+  username text not null,
+  month text not null, -- 格式 YYYY-MM
+  added_completed double precision default 0,
+  added_revenue double precision default 0,
+  created_at timestamp with time zone default timezone('utc'::text, now())
+);
+
+-- 启用 RLS，并创建允许匿名访问的策略 (适用于当前使用 anon key 的场景)
+ALTER TABLE users ENABLE ROW LEVEL SECURITY;
+ALTER TABLE reports ENABLE ROW LEVEL SECURITY;
+ALTER TABLE monthly_goals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE performance_logs ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow all access for public" ON users;
+CREATE POLICY "Allow all access for public" ON users FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all access for public" ON reports;
+CREATE POLICY "Allow all access for public" ON reports FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all access for public" ON monthly_goals;
+CREATE POLICY "Allow all access for public" ON monthly_goals FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all access for public" ON performance_logs;
+CREATE POLICY "Allow all access for public" ON performance_logs FOR ALL USING (true) WITH CHECK (true);
+""",
+        "sqlite": """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    full_name TEXT,
+    department TEXT,
+    phone TEXT,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_name TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    work_content TEXT NOT NULL,
+    next_plan TEXT,
+    problems TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS monthly_goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    month TEXT NOT NULL,
+    target_amount REAL DEFAULT 0,
+    completed_amount REAL DEFAULT 0,
+    revenue_amount REAL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    UNIQUE (username, month)
+);
+
+CREATE TABLE IF NOT EXISTS performance_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    month TEXT NOT NULL,
+    added_completed REAL DEFAULT 0,
+    added_revenue REAL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+""",
+    },
+    {
+        "version": 2,
+        "name": "hot_path_indexes",
+        # 与热点查询的过滤 + 排序列一一对应:
+        # - get_previous_plan / get_latest_previous_report: employee_name = ? AND report_date < ? ORDER BY report_date DESC LIMIT 1
+        #   (也用于 get_unique_employee_names 的跳跃扫描)
+        # - get_reports_page: ORDER BY report_date DESC, created_at DESC (keyset 分页)
+        # - get_performance_logs: username = ? AND month = ? ORDER BY created_at DESC
+        # - get_all_monthly_goals / 概览: month = ?
+        "postgres": """
+CREATE INDEX IF NOT EXISTS reports_employee_name_report_date_idx ON reports (employee_name, report_date DESC);
+CREATE INDEX IF NOT EXISTS reports_report_date_created_at_idx ON reports (report_date DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS performance_logs_username_month_idx ON performance_logs (username, month, created_at DESC);
+CREATE INDEX IF NOT EXISTS monthly_goals_month_idx ON monthly_goals (month);
+""",
+        "sqlite": """
+CREATE INDEX IF NOT EXISTS reports_employee_name_report_date_idx ON reports (employee_name, report_date);
+CREATE INDEX IF NOT EXISTS reports_report_date_created_at_idx ON reports (report_date, created_at);
+CREATE INDEX IF NOT EXISTS performance_logs_username_month_idx ON performance_logs (username, month, created_at);
+CREATE INDEX IF NOT EXISTS monthly_goals_month_idx ON monthly_goals (month);
+""",
+    },
+    {
+        "version": 3,
+        "name": "goal_overview_and_increment",
+        "postgres": """
+-- 员工姓名去重查询 (get_unique_names 使用)
+-- 借助 (employee_name, report_date) 索引做跳跃扫描，只需约 "员工数" 次索引查找
+CREATE OR REPLACE FUNCTION get_unique_employee_names()
+RETURNS TABLE (employee_name text)
+LANGUAGE sql STABLE AS $$
+  WITH RECURSIVE names AS (
+    (SELECT r.employee_name FROM reports r ORDER BY r.employee_name LIMIT 1)
+    UNION ALL
+    SELECT (SELECT r.employee_name FROM reports r WHERE r.employee_name > n.employee_name ORDER BY r.employee_name LIMIT 1)
+    FROM names n WHERE n.employee_name IS NOT NULL
+  )
+  SELECT employee_name FROM names WHERE employee_name IS NOT NULL;
+$$;
+
+-- 月度目标概览视图 (get_monthly_goal_overview 使用)
+-- 一次查询返回目标 + 姓名/部门，不传输 users 表的密码、电话等列
+CREATE OR REPLACE VIEW monthly_goal_overview AS
+SELECT
+  g.username,
+  g.month,
+  COALESCE(u.full_name, g.username) AS full_name,
+  u.department,
+  g.target_amount,
+  g.completed_amount,
+  g.revenue_amount
+FROM monthly_goals g
+LEFT JOIN users u ON u.username = g.username;
+
+-- 原子累加业绩 (increment_user_monthly_goal 使用)
+-- 在同一事务中累加 monthly_goals 并写入 performance_logs，返回更新后的记录
+-- p_target_amount 为 NULL 时保持原目标不变
+CREATE OR REPLACE FUNCTION increment_monthly_goal(
+  p_username text,
+  p_month text,
+  p_added_completed double precision DEFAULT 0,
+  p_added_revenue double precision DEFAULT 0,
+  p_target_amount double precision DEFAULT NULL
+)
+RETURNS monthly_goals
+LANGUAGE plpgsql AS $$
+DECLARE
+  result monthly_goals;
+BEGIN
+  INSERT INTO monthly_goals AS g (username, month, target_amount, completed_amount, revenue_amount, updated_at)
+  VALUES (p_username, p_month, COALESCE(p_target_amount, 0), p_added_completed, p_added_revenue, timezone('utc'::text, now()))
+  ON CONFLICT (username, month) DO UPDATE SET
+    target_amount = COALESCE(p_target_amount, g.target_amount),
+    completed_amount = g.completed_amount + EXCLUDED.completed_amount,
+    revenue_amount = g.revenue_amount + EXCLUDED.revenue_amount,
+    updated_at = EXCLUDED.updated_at
+  RETURNING * INTO result;
+
+  IF p_added_completed > 0 OR p_added_revenue > 0 THEN
+    INSERT INTO performance_logs (username, month, added_completed, added_revenue)
+    VALUES (p_username, p_month, p_added_completed, p_added_revenue);
+  END IF;
+
+  RETURN result;
+END;
+$$;
+""",
+        "sqlite": """
+CREATE VIEW IF NOT EXISTS monthly_goal_overview AS
+SELECT
+    g.username,
+    g.month,
+    COALESCE(u.full_name, g.username) AS full_name,
+    u.department,
+    g.target_amount,
+    g.completed_amount,
+    g.revenue_amount
+FROM monthly_goals g
+LEFT JOIN users u ON u.username = g.username;
+""",
+    },
+    {
+        "version": 4,
+        "name": "performance_daily_rollup",
+        # 按 (用户, 月份, 北京时间日期) 汇总的业绩，由 performance_logs 的插入触发器增量维护
+        "postgres": """
+CREATE TABLE IF NOT EXISTS performance_daily_rollup (
+  username text not null,
+  month text not null, -- 格式 YYYY-MM
+  day date not null,
+  added_completed double precision not null default 0,
+  added_revenue double precision not null default 0,
+  submissions integer not null default 0,
+  primary key (username, month, day)
+);
+CREATE INDEX IF NOT EXISTS performance_daily_rollup_day_idx ON performance_daily_rollup (day);
+CREATE INDEX IF NOT EXISTS performance_daily_rollup_month_day_idx ON performance_daily_rollup (month, day);
+ALTER TABLE performance_daily_rollup ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow all access for public" ON performance_daily_rollup;
+CREATE POLICY "Allow all access for public" ON performance_daily_rollup FOR ALL USING (true) WITH CHECK (true);
+
+CREATE OR REPLACE FUNCTION performance_logs_rollup()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO performance_daily_rollup AS r (username, month, day, added_completed, added_revenue, submissions)
+  VALUES (NEW.username, NEW.month, (NEW.created_at AT TIME ZONE 'Asia/Shanghai')::date,
+          COALESCE(NEW.added_completed, 0), COALESCE(NEW.added_revenue, 0), 1)
+  ON CONFLICT (username, month, day) DO UPDATE SET
+    added_completed = r.added_completed + EXCLUDED.added_completed,
+    added_revenue = r.added_revenue + EXCLUDED.added_revenue,
+    submissions = r.submissions + 1;
+  RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER performance_logs_rollup
+AFTER INSERT ON performance_logs
+FOR EACH ROW EXECUTE FUNCTION performance_logs_rollup();
+
+-- 从日志全量重建汇总表 (首次创建时回填历史数据，之后用于修复)
+CREATE OR REPLACE FUNCTION rebuild_performance_rollup()
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  row_count integer;
+BEGIN
+  LOCK TABLE performance_logs IN SHARE MODE;
+  DELETE FROM performance_daily_rollup;
+  INSERT INTO performance_daily_rollup (username, month, day, added_completed, added_revenue, submissions)
+  SELECT username, month, (created_at AT TIME ZONE 'Asia/Shanghai')::date,
+         SUM(COALESCE(added_completed, 0)), SUM(COALESCE(added_revenue, 0)), COUNT(*)
+  FROM performance_logs
+  GROUP BY 1, 2, 3;
+  GET DIAGNOSTICS row_count = ROW_COUNT;
+  RETURN row_count;
+END;
+$$;
+
+SELECT rebuild_performance_rollup();
+
+CREATE OR REPLACE VIEW performance_daily_overview AS
+SELECT
+  r.username,
+  COALESCE(u.full_name, r.username) AS full_name,
+  u.department,
+  r.month,
+  r.day,
+  r.added_completed,
+  r.added_revenue,
+  r.submissions
+FROM performance_daily_rollup r
+LEFT JOIN users u ON u.username = r.username;
+""",
+        "sqlite": """
+CREATE TABLE IF NOT EXISTS performance_daily_rollup (
+    username TEXT NOT NULL,
+    month TEXT NOT NULL,
+    day TEXT NOT NULL,
+    added_completed REAL NOT NULL DEFAULT 0,
+    added_revenue REAL NOT NULL DEFAULT 0,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, month, day)
+);
+
+CREATE INDEX IF NOT EXISTS performance_daily_rollup_day_idx ON performance_daily_rollup (day);
+CREATE INDEX IF NOT EXISTS performance_daily_rollup_month_day_idx ON performance_daily_rollup (month, day);
+
+-- 汇总表为空时从历史日志回填 (已有汇总数据的旧数据库不会重复累加)
+INSERT INTO performance_daily_rollup (username, month, day, added_completed, added_revenue, submissions)
+SELECT username, month, date(created_at, '+8 hours'),
+       SUM(COALESCE(added_completed, 0)), SUM(COALESCE(added_revenue, 0)), COUNT(*)
+FROM performance_logs
+WHERE NOT EXISTS (SELECT 1 FROM performance_daily_rollup)
+GROUP BY username, month, date(created_at, '+8 hours');
+
+CREATE TRIGGER IF NOT EXISTS performance_logs_rollup AFTER INSERT ON performance_logs
+BEGIN
+    INSERT INTO performance_daily_rollup (username, month, day, added_completed, added_revenue, submissions)
+    VALUES (NEW.username, NEW.month, date(NEW.created_at, '+8 hours'),
+            COALESCE(NEW.added_completed, 0), COALESCE(NEW.added_revenue, 0), 1)
+    ON CONFLICT (username, month, day) DO UPDATE SET
+        added_completed = added_completed + excluded.added_completed,
+        added_revenue = added_revenue + excluded.added_revenue,
+        submissions = submissions + 1;
+END;
+
+CREATE VIEW IF NOT EXISTS performance_daily_overview AS
+SELECT
+    r.username,
+    COALESCE(u.full_name, r.username) AS full_name,
+    u.department,
+    r.month,
+    r.day,
+    r.added_completed,
+    r.added_revenue,
+    r.submissions
+FROM performance_daily_rollup r
+LEFT JOIN users u ON u.username = r.username;
+""",
+    },
+    {
+        "version": 5,
+        "name": "report_count_functions",
+        # 看板顶部的分组计数 (db_manager.get_report_counts_by_employee / get_report_counts_by_day)
+        # 在数据库中 GROUP BY，只返回计数结果；SQLite 直接执行同样的查询，无需额外对象
+        "postgres": """
+CREATE OR REPLACE FUNCTION report_counts_by_employee(p_start date DEFAULT NULL, p_end date DEFAULT NULL)
+RETURNS TABLE (employee_name text, reports bigint)
+LANGUAGE sql STABLE AS $$
+  SELECT r.employee_name, count(*) AS reports
+  FROM reports r
+  WHERE (p_start IS NULL OR r.report_date >= p_start)
+    AND (p_end IS NULL OR r.report_date <= p_end)
+  GROUP BY r.employee_name
+  ORDER BY reports DESC, r.employee_name;
+$$;
+
+CREATE OR REPLACE FUNCTION report_counts_by_day(
+  p_start date DEFAULT NULL,
+  p_end date DEFAULT NULL,
+  p_employee_name text DEFAULT NULL
+)
+RETURNS TABLE (report_date date, reports bigint)
+LANGUAGE sql STABLE AS $$
+  SELECT r.report_date, count(*) AS reports
+  FROM reports r
+  WHERE (p_start IS NULL OR r.report_date >= p_start)
+    AND (p_end IS NULL OR r.report_date <= p_end)
+    AND (p_employee_name IS NULL OR r.employee_name = p_employee_name)
+  GROUP BY r.report_date
+  ORDER BY r.report_date;
+$$;
+""",
+        "sqlite": "",
+    },
+    {
+        "version": 6,
+        "name": "report_search",
+        # 日报正文全文索引 (db_manager.search_reports)
+        # Postgres 使用 PGroonga (默认 bigram 分词支持中文，Supabase 自带该扩展)；SQLite 使用 FTS5 trigram 分词
+        "postgres": r"""
+CREATE EXTENSION IF NOT EXISTS pgroonga;
+
+CREATE INDEX IF NOT EXISTS reports_content_pgroonga_idx
+  ON reports USING pgroonga ((ARRAY[work_content, next_plan, problems]));
+
+CREATE OR REPLACE FUNCTION search_reports(
+  p_query text,
+  p_employee_name text DEFAULT NULL,
+  p_report_date date DEFAULT NULL,
+  p_limit integer DEFAULT 20,
+  p_offset integer DEFAULT 0
+)
+RETURNS TABLE (
+  id bigint, report_date date, employee_name text, created_at timestamptz,
+  snippet text, score double precision, total bigint
+)
+LANGUAGE sql STABLE AS $$
+  -- 先排序分页，只为当前页生成摘要
+  WITH page AS (
+    SELECT r.id, r.report_date, r.employee_name, r.created_at, r.work_content, r.next_plan, r.problems,
+           pgroonga_score(r.tableoid, r.ctid) AS score,
+           count(*) OVER () AS total
+    FROM reports r
+    WHERE ARRAY[r.work_content, r.next_plan, r.problems] &@~ p_query
+      AND (p_employee_name IS NULL OR r.employee_name = p_employee_name)
+      AND (p_report_date IS NULL OR r.report_date = p_report_date)
+    ORDER BY score DESC, r.report_date DESC, r.id DESC
+    LIMIT p_limit OFFSET p_offset
+  )
+  SELECT p.id, p.report_date, p.employee_name, p.created_at,
+         regexp_replace(
+           array_to_string(
+             pgroonga_snippet_html(
+               concat_ws(' / ', p.work_content, p.next_plan, p.problems),
+               pgroonga_query_extract_keywords(p_query),
+               120
+             ),
+             ' … '
+           ),
+           '<span class="keyword">(.*?)</span>', '<mark>\1</mark>', 'g'
+         ) AS snippet,
+         p.score, p.total
+  FROM page p
+  ORDER BY p.score DESC, p.report_date DESC, p.id DESC;
+$$;
+""",
+        "sqlite": """
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    work_content, next_plan, problems,
+    content='reports', content_rowid='id', tokenize='trigram'
+);
+
+INSERT INTO reports_fts (reports_fts) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports
+BEGIN
+    INSERT INTO reports_fts (rowid, work_content, next_plan, problems)
+    VALUES (NEW.id, NEW.work_content, NEW.next_plan, NEW.problems);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports
+BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, work_content, next_plan, problems)
+    VALUES ('delete', OLD.id, OLD.work_content, OLD.next_plan, OLD.problems);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE ON reports
+BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, work_content, next_plan, problems)
+    VALUES ('delete', OLD.id, OLD.work_content, OLD.next_plan, OLD.problems);
+    INSERT INTO reports_fts (rowid, work_content, next_plan, problems)
+    VALUES (NEW.id, NEW.work_content, NEW.next_plan, NEW.problems);
+END;
+""",
+    },
+    {
+        "version": 7,
+        "name": "session_revocations",
+        # 已吊销的会话令牌 (见 auth.py)：sid 不为空时吊销单个会话 (退出登录)，
+        # 否则吊销该用户在 revoked_at 之前签发的全部令牌 (修改 / 重置密码)
+        # 各进程按 id 增量加载未过期 (expires_at 之后令牌本身已失效) 的记录
+        "postgres": """
+CREATE TABLE IF NOT EXISTS session_revocations (
+  id bigint generated by default as identity primary key,
+  sid text,
+  username text not null,
+  revoked_at timestamp with time zone not null,
+  expires_at timestamp with time zone not null
+);
+
+CREATE INDEX IF NOT EXISTS session_revocations_expires_at_idx ON session_revocations (expires_at);
+
+ALTER TABLE session_revocations ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow all access for public" ON session_revocations;
+CREATE POLICY "Allow all access for public" ON session_revocations FOR ALL USING (true) WITH CHECK (true);
+""",
+        "sqlite": """
+CREATE TABLE IF NOT EXISTS session_revocations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sid TEXT,
+    username TEXT NOT NULL,
+    revoked_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS session_revocations_expires_at_idx ON session_revocations (expires_at);
+""",
+    },
+    {
+        "version": 8,
+        "name": "reports_keyset_tiebreaker",
+        # (report_date, created_at) 不唯一 (同一批导入的日报时间相同)，keyset 分页以 id 作为最后一个排序键，
+        # 否则分页边界上时间相同的行会被跳过；索引随之加上 id
+        "postgres": """
+DROP INDEX IF EXISTS reports_report_date_created_at_idx;
+CREATE INDEX reports_report_date_created_at_idx ON reports (report_date DESC, created_at DESC, id DESC);
+""",
+        "sqlite": """
+DROP INDEX IF EXISTS reports_report_date_created_at_idx;
+CREATE INDEX reports_report_date_created_at_idx ON reports (report_date, created_at, id);
+""",
+    },
+    {
+        "version": 9,
+        "name": "report_search_short_terms",
+        # Postgres: 用户输入按 Groonga 查询语法解析，"(", "-x", 末尾的 OR 等会报语法错误，先用 pgroonga_query_escape 转义
+        # SQLite: trigram 索引只能匹配 3 个字符以上的关键词，"客户"、"华为" 这类两个字的词只能全表 LIKE；
+        # 另建一个 unicode61 分词的无内容 (contentless) 索引，正文经 cjk_spaced() 逐字分开，
+        # 短关键词按短语匹配 (相邻的字)，英文、数字短关键词按词前缀匹配
+        "postgres": r"""
+CREATE OR REPLACE FUNCTION search_reports(
+  p_query text,
+  p_employee_name text DEFAULT NULL,
+  p_report_date date DEFAULT NULL,
+  p_limit integer DEFAULT 20,
+  p_offset integer DEFAULT 0
+)
+RETURNS TABLE (
+  id bigint, report_date date, employee_name text, created_at timestamptz,
+  snippet text, score double precision, total bigint
+)
+LANGUAGE sql STABLE AS $$
+  -- 先排序分页，只为当前页生成摘要
+  WITH page AS (
+    SELECT r.id, r.report_date, r.employee_name, r.created_at, r.work_content, r.next_plan, r.problems,
+           pgroonga_score(r.tableoid, r.ctid) AS score,
+           count(*) OVER () AS total
+    FROM reports r
+    WHERE ARRAY[r.work_content, r.next_plan, r.problems] &@~ pgroonga_query_escape(p_query)
+      AND (p_employee_name IS NULL OR r.employee_name = p_employee_name)
+      AND (p_report_date IS NULL OR r.report_date = p_report_date)
+    ORDER BY score DESC, r.report_date DESC, r.id DESC
+    LIMIT p_limit OFFSET p_offset
+  )
+  SELECT p.id, p.report_date, p.employee_name, p.created_at,
+         regexp_replace(
+           array_to_string(
+             pgroonga_snippet_html(
+               concat_ws(' / ', p.work_content, p.next_plan, p.problems),
+               pgroonga_query_extract_keywords(pgroonga_query_escape(p_query)),
+               120
+             ),
+             ' … '
+           ),
+           '<span class="keyword">(.*?)</span>', '<mark>\1</mark>', 'g'
+         ) AS snippet,
+         p.score, p.total
+  FROM page p
+  ORDER BY p.score DESC, p.report_date DESC, p.id DESC;
+$$;
+""",
+        "sqlite": """
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts_short USING fts5(
+    work_content, next_plan, problems,
+    content='', tokenize='unicode61'
+);
+
+DELETE FROM reports_fts_short;
+INSERT INTO reports_fts_short (rowid, work_content, next_plan, problems)
+SELECT id, cjk_spaced(work_content), cjk_spaced(next_plan), cjk_spaced(problems) FROM reports;
+
+-- 无内容索引删除时要提供原来写入的值 (cjk_spaced 是确定性的，重新计算即可)
+CREATE TRIGGER IF NOT EXISTS reports_fts_short_insert AFTER INSERT ON reports
+BEGIN
+    INSERT INTO reports_fts_short (rowid, work_content, next_plan, problems)
+    VALUES (NEW.id, cjk_spaced(NEW.work_content), cjk_spaced(NEW.next_plan), cjk_spaced(NEW.problems));
+END;
+
+CREATE TRIGGER IF NOT EXISTS reports_fts_short_delete AFTER DELETE ON reports
+BEGIN
+    INSERT INTO reports_fts_short (reports_fts_short, rowid, work_content, next_plan, problems)
+    VALUES ('delete', OLD.id, cjk_spaced(OLD.work_content), cjk_spaced(OLD.next_plan), cjk_spaced(OLD.problems));
+END;
+
+CREATE TRIGGER IF NOT EXISTS reports_fts_short_update AFTER UPDATE ON reports
+BEGIN
+    INSERT INTO reports_fts_short (reports_fts_short, rowid, work_content, next_plan, problems)
+    VALUES ('delete', OLD.id, cjk_spaced(OLD.work_content), cjk_spaced(OLD.next_plan), cjk_spaced(OLD.problems));
+    INSERT INTO reports_fts_short (rowid, work_content, next_plan, problems)
+    VALUES (NEW.id, cjk_spaced(NEW.work_content), cjk_spaced(NEW.next_plan), cjk_spaced(NEW.problems));
+END;
+""",
+    },
+    {
+        "version": 10,
+        "name": "existing_report_keys",
+        # 批量导入日报时的查重 (db_manager.bulk_add_reports)：传入本批的 (姓名, 日期, 正文 md5)，
+        # 经 (employee_name, report_date) 索引精确连接，只返回已存在的组合，不下载候选行的正文
+        # SQLite 直接用 VALUES 连接，无需额外对象
+        "postgres": """
+CREATE OR REPLACE FUNCTION existing_report_keys(p_names text[], p_dates date[], p_hashes text[])
+RETURNS TABLE (employee_name text, report_date date, content_md5 text)
+LANGUAGE sql STABLE AS $$
+  SELECT DISTINCT k.employee_name, k.report_date, k.content_md5
+  FROM unnest(p_names, p_dates, p_hashes) AS k(employee_name, report_date, content_md5)
+  JOIN reports r
+    ON r.employee_name = k.employee_name
+   AND r.report_date = k.report_date
+   AND md5(coalesce(r.work_content, '')) = k.content_md5;
+$$;
+""",
+        "sqlite": "",
+    },
+]
+
+# 热点查询及其应使用的索引 (参数占位符统一写 ?，Postgres 下替换为 %s)
+HOT_QUERIES = [
+    {
+        "name": "latest_report_before",
+        "sql": "SELECT next_plan FROM reports WHERE employee_name = ? AND report_date < ? "
+               "ORDER BY report_date DESC LIMIT 1",
+        "params": ("张三", "2024-01-01"),
+        "index": "reports_employee_name_report_date_idx",
+    },
+    {
+        "name": "reports_page",
+        "sql": "SELECT id, report_date, employee_name, created_at FROM reports "
+               "ORDER BY report_date DESC, created_at DESC, id DESC LIMIT 50",
+        "params": (),
+        "index": "reports_report_date_created_at_idx",
+    },
+    {
+        "name": "reports_page_keyset",
+        "sql": "SELECT id, report_date, employee_name, created_at FROM reports "
+               "WHERE (report_date, created_at, id) < (?, ?, ?) "
+               "ORDER BY report_date DESC, created_at DESC, id DESC LIMIT 50",
+        "params": ("2024-01-01", "2024-01-01 00:00:00", 1),
+        "index": "reports_report_date_created_at_idx",
+    },
+    {
+        "name": "performance_logs",
+        "sql": "SELECT * FROM performance_logs WHERE username = ? AND month = ? ORDER BY created_at DESC",
+        "params": ("zhangsan", "2024-01"),
+        "index": "performance_logs_username_month_idx",
+    },
+    {
+        "name": "monthly_goals_by_month",
+        "sql": "SELECT * FROM monthly_goals WHERE month = ?",
+        "params": ("2024-01",),
+        "index": "monthly_goals_month_idx",
+    },
+    {
+        "name": "performance_rollup_by_month",
+        "sql": "SELECT * FROM performance_daily_rollup WHERE month = ? ORDER BY day",
+        "params": ("2024-01",),
+        "index": "performance_daily_rollup_month_day_idx",
+    },
+]
+
+def latest_version():
+    return MIGRATIONS[-1]["version"]
+
+def connect(dialect, target):
+    """
+    按方言打开数据库连接
+    target: SQLite 文件路径 / Postgres 连接串
+    """
+    if dialect == "sqlite":
+        return sqlite3.connect(target, isolation_level=None)
+    if dialect == "postgres":
+        try:
+            import psycopg
+            return psycopg.connect(target)
+        except ImportError:
+            pass
+        try:
+            import psycopg2
+            return psycopg2.connect(target)
+        except ImportError:
+            raise RuntimeError("连接 Postgres 需要安装 psycopg 或 psycopg2 (pip install psycopg[binary])")
+    raise ValueError(f"Unknown dialect: {dialect!r}")
+
+def applied_versions(conn, dialect):
+    """
+    返回已执行的迁移版本号集合 (schema_migrations 不存在时返回空集合)
+    """
+    cur = conn.cursor()
+    try:
+        if dialect == "sqlite":
+            exists = cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+            ).fetchone()
+        else:
+            cur.execute("SELECT to_regclass('schema_migrations')")
+            exists = cur.fetchone()[0]
+        if not exists:
+            return set()
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+        if dialect == "postgres":
+            conn.rollback()
+
+def _migrate_sqlite(conn, migration):
+    # executescript 会先提交未完成的事务，所以 BEGIN / COMMIT 写在脚本里；
+    # 先写入版本号：其他进程已执行过该迁移时主键冲突，整个事务回滚
+    script = (
+        "BEGIN IMMEDIATE;\n"
+        f"INSERT INTO schema_migrations (version, name) VALUES ({int(migration['version'])}, '{migration['name']}');\n"
+        f"{migration['sqlite']}\n"
+        "COMMIT;"
+    )
+    try:
+        conn.executescript(script)
+        return True
+    except sqlite3.IntegrityError as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if "schema_migrations" in str(e):
+            return False
+        raise
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+def _migrate_postgres(conn, migration):
+    cur = conn.cursor()
+    try:
+        # 排他锁保证多个进程同时迁移时按顺序执行
+        cur.execute("LOCK TABLE schema_migrations IN EXCLUSIVE MODE")
+        cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration['version'],))
+        if cur.fetchone():
+            conn.rollback()
+            return False
+        cur.execute(migration['postgres'])
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+            (migration['version'], migration['name']),
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def migrate(conn, dialect, target_version=None):
+    """
+    执行尚未应用的迁移 (可重复调用)，返回本次执行的版本号列表
+    target_version: 只迁移到指定版本 (默认最新)
+    """
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unknown dialect: {dialect!r}")
+
+    if dialect == "sqlite":
+        register_sqlite_functions(conn)
+        conn.executescript(SCHEMA_MIGRATIONS_SQL["sqlite"])
+    else:
+        cur = conn.cursor()
+        cur.execute(SCHEMA_MIGRATIONS_SQL["postgres"])
+        cur.close()
+        conn.commit()
+
+    done = applied_versions(conn, dialect)
+    applied = []
+    for migration in MIGRATIONS:
+        version = migration["version"]
+        if version in done or (target_version is not None and version > target_version):
+            continue
+        run = _migrate_sqlite if dialect == "sqlite" else _migrate_postgres
+        if run(conn, migration):
+            applied.append(version)
+    return applied
+
+def render_sql(dialect="postgres"):
+    """
+    将全部迁移拼成一个脚本 (可重复执行)，用于粘贴到 Supabase SQL Editor
+    """
+    parts = [SCHEMA_MIGRATIONS_SQL[dialect].strip()]
+    for migration in MIGRATIONS:
+        parts.append(f"-- {migration['version']:04d}_{migration['name']}")
+        parts.append(migration[dialect].strip())
+        parts.append(
+            f"INSERT INTO schema_migrations (version, name) VALUES ({migration['version']}, '{migration['name']}') "
+            "ON CONFLICT (version) DO NOTHING;"
+        )
+    return "\n\n".join(parts) + "\n"
+
+def explain(conn, dialect, sql, params=()):
+    """
+    返回查询计划的文本行
+    Postgres 下关闭顺序扫描 (小表上规划器总会选择顺序扫描)，只看索引是否可用
+    """
+    if dialect == "sqlite":
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute(f"EXPLAIN {sql.replace('?', '%s')}", params)
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.rollback()
+
+def check_index_usage(conn, dialect):
+    """
+    检查 HOT_QUERIES 中的每个查询是否使用了预期的索引，且不需要额外排序
+    返回 [(查询名, 是否通过, 执行计划文本), ...]
+    """
+    results = []
+    for query in HOT_QUERIES:
+        plan = explain(conn, dialect, query["sql"], query["params"])
+        text = "\n".join(plan)
+        uses_index = query["index"] in text
+        if dialect == "sqlite":
+            # 需要排序时会出现 "USE TEMP B-TREE FOR ORDER BY"
+            no_sort = "TEMP B-TREE" not in text
+        else:
+            no_sort = not any(line.lstrip(" ->").startswith("Sort") for line in plan)
+        results.append((query["name"], uses_index and no_sort, text))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument("dialect", nargs="?", choices=DIALECTS, help="数据库类型")
+    parser.add_argument("target", nargs="?", help="SQLite 文件路径或 Postgres 连接串")
+    parser.add_argument("--sql", action="store_true", help="只输出 Postgres 迁移 SQL，不连接数据库")
+    parser.add_argument("--check", action="store_true", help="迁移后用 EXPLAIN 检查热点查询是否走索引")
+    args = parser.parse_args(argv)
+
+    if args.sql:
+        print(render_sql("postgres"))
+        return 0
+    if not args.dialect:
+        parser.error("请指定 sqlite 或 postgres")
+
+    target = args.target
+    if not target:
+        if args.dialect == "sqlite":
+            target = os.environ.get("SQLITE_PATH", "daily_reports.db")
+        else:
+            target = os.environ.get("DATABASE_URL")
+    if not target:
+        parser.error("请指定 Postgres 连接串或设置 DATABASE_URL")
+
+    conn = connect(args.dialect, target)
+    try:
+        applied = migrate(conn, args.dialect)
+        if applied:
+            print(f"已执行迁移: {', '.join(str(v) for v in applied)}")
+        else:
+            print(f"数据库已是最新版本 ({latest_version()})")
+
+        if args.check:
+            failed = 0
+            for name, ok, plan in check_index_usage(conn, args.dialect):
+                print(f"[{'OK' if ok else 'FAIL'}] {name}")
+                if not ok:
+                    failed += 1
+                    print("    " + plan.replace("\n", "\n    "))
+            return 1 if failed else 0
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
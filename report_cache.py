@@ -0,0 +1,127 @@
+"""
+日报表的本地缓存 (使用 Supabase 后端时)
+- 在本机 SQLite 文件中保存一份 reports 的副本，同一进程内所有 Streamlit 会话共享
+- 按 id 增量同步：每次拉取 id 大于本地最大 id 的新行 (日报只新增、不修改)
+- Postgres 在插入时分配 id，但行在事务提交后才可见：同时提交的两条日报中 id 较小的可能后提交，
+  只按最大 id 同步会永久漏掉它。因此每次同步还会比对最近 SYNC_LOOKBACK 个 id 的窗口 (只取 id 列)，
+  补拉本地缺失的行；提交延迟超过这个窗口的行仍会漏掉，可调大 REPORT_CACHE_SYNC_LOOKBACK
+- 看板的分页/筛选、计数、详情、导出都在本地副本上执行，每次同步的网络流量只有新增的日报和回看窗口内的 id
+"""
+import os
+import threading
+import time
+
+import sqlite_backend
+
+REPORT_CACHE_PATH = os.environ.get("REPORT_CACHE_PATH", "report_cache.db")
+# REPORT_CACHE=0 关闭本地缓存，所有查询直接访问 Supabase
+ENABLED = os.environ.get("REPORT_CACHE", "1") != "0"
+# 两次同步之间的最短间隔 (秒)；有新日报提交时立即同步
+SYNC_INTERVAL = float(os.environ.get("REPORT_CACHE_SYNC_INTERVAL", "10"))
+# 每次请求拉取的行数 (低于 PostgREST 默认的 max-rows)
+SYNC_BATCH_SIZE = 1000
+# 每次同步重新核对的 id 窗口大小 (本地最大 id 之前的多少个 id)，0 表示不核对
+SYNC_LOOKBACK = int(os.environ.get("REPORT_CACHE_SYNC_LOOKBACK", "1000"))
+# 按 id 补拉缺失行时每次请求的 id 数 (id 放在 URL 中)
+GAP_BATCH_SIZE = 200
+
+def _ids_between(backend, start, end):
+    """
+    读取 start < id <= end 的全部日报 id
+    """
+    ids = []
+    while True:
+        rows = backend.reports_after(start, "id", SYNC_BATCH_SIZE)
+        ids.extend(row['id'] for row in rows if row['id'] <= end)
+        if len(rows) < SYNC_BATCH_SIZE or rows[-1]['id'] >= end:
+            return ids
+        start = rows[-1]['id']
+
+class ReportCache:
+    """
+    reports 的本地副本及同步状态
+    """
+    def __init__(self, path):
+        self.local = sqlite_backend.get_backend(path)
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._ready = False
+
+    @property
+    def ready(self):
+        """
+        是否至少完成过一次完整同步 (之前不能用本地副本回答查询)
+        """
+        return self._ready
+
+    def mark_stale(self):
+        """
+        标记需要同步 (本进程提交了新日报)
+        """
+        self._last_sync = 0.0
+
+    def _due(self):
+        return time.monotonic() - self._last_sync >= SYNC_INTERVAL
+
+    def _fill_gaps(self, source, last_id):
+        """
+        补拉回看窗口 (last_id - SYNC_LOOKBACK, last_id] 内远端已提交、本地缺失的日报，返回补拉行数
+        """
+        start = max(last_id - SYNC_LOOKBACK, 0)
+        if SYNC_LOOKBACK <= 0 or last_id <= start:
+            return 0
+        missing = sorted(set(_ids_between(source, start, last_id)) - set(_ids_between(self.local, start, last_id)))
+        pulled = 0
+        for i in range(0, len(missing), GAP_BATCH_SIZE):
+            rows = source.reports_by_ids(missing[i:i + GAP_BATCH_SIZE], "*")
+            if rows:
+                self.local.mirror_reports(rows)
+                pulled += len(rows)
+        return pulled
+
+    def sync(self, source, force=False):
+        """
+        从 source 拉取本地没有的日报 (新行及回看窗口内的缺口)，返回新增行数；同步失败时返回 None
+        多个会话同时触发时只有一个会话执行同步
+        """
+        if not force and not self._due():
+            return 0
+
+        with self._lock:
+            # 等锁期间其他会话可能已经同步过
+            if not force and not self._due():
+                return 0
+
+            pulled = 0
+            try:
+                last_id = self.local.latest_report_id() or 0
+                pulled += self._fill_gaps(source, last_id)
+                while True:
+                    rows = source.reports_after(last_id, "*", SYNC_BATCH_SIZE)
+                    if rows:
+                        self.local.mirror_reports(rows)
+                        pulled += len(rows)
+                        last_id = rows[-1]['id']
+                    if len(rows) < SYNC_BATCH_SIZE:
+                        break
+            except Exception as e:
+                print(f"Error syncing report cache: {e}")
+                return None
+
+            self._last_sync = time.monotonic()
+            self._ready = True
+            return pulled
+
+_cache_lock = threading.Lock()
+_cache = None
+
+def get_cache():
+    """
+    获取进程内共享的日报缓存
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache(REPORT_CACHE_PATH)
+    return _cache
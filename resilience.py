@@ -0,0 +1,294 @@
+"""
+数据库调用的容错策略
+- 截止时间：每次调用在工作线程中执行，超时后脚本线程立即返回，页面不会被慢响应卡住
+- 重试：幂等的读操作遇到临时错误 (网络中断、5xx、连接池耗尽、数据库锁) 时按指数退避重试
+- 熔断：同一后端连续失败达到阈值后暂停访问一段时间，期间直接失败，由 cache 返回上一次缓存的结果
+- 失败时抛出 BackendError 的子类 (超时 / 不可用 / 查询错误)，并记录到本次页面运行的提示列表中
+"""
+import contextvars
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import lazy
+import metrics
+
+# 单次调用 (含重试) 的截止时间 (秒)
+READ_DEADLINE = float(os.environ.get("DB_READ_DEADLINE", "8"))
+WRITE_DEADLINE = float(os.environ.get("DB_WRITE_DEADLINE", "15"))
+# 个别耗时较长的操作单独设置截止时间
+DEADLINE_OVERRIDES = {
+    "rebuild_performance_rollup": 120,
+}
+# 读操作最多尝试次数；退避时间 = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^(n-1))，再乘以 0.5~1 的随机抖动
+RETRY_ATTEMPTS = int(os.environ.get("DB_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.environ.get("DB_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = 2.0
+# 连续失败多少次后熔断，以及熔断持续时间 (秒)
+BREAKER_THRESHOLD = int(os.environ.get("DB_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("DB_BREAKER_COOLDOWN", "30"))
+# 执行数据库调用的线程数
+CALL_WORKERS = int(os.environ.get("DB_CALL_WORKERS", "16"))
+
+# 以这些前缀开头的后端方法是写操作：不重试 (重复执行可能写入两次)
+WRITE_PREFIXES = ("insert_", "update_", "upsert_", "increment_", "mirror_", "rebuild_")
+# 不经过容错策略的方法
+PASSTHROUGH_METHODS = frozenset({"close"})
+
+# --- 错误类型 ---
+class BackendError(Exception):
+    """
+    数据库调用失败；message 为可以直接展示给用户的说明
+    """
+    kind = "error"
+    message = "数据服务出错"
+
+    def __init__(self, operation, cause=None):
+        self.operation = operation
+        self.cause = cause
+        super().__init__(f"{self.message} ({operation}: {cause})" if cause else f"{self.message} ({operation})")
+
+class BackendTimeout(BackendError):
+    """
+    超过截止时间仍未返回
+    """
+    kind = "timeout"
+    message = "数据服务响应超时"
+
+class BackendUnavailable(BackendError):
+    """
+    临时错误重试后仍失败，或后端处于熔断状态
+    """
+    kind = "unavailable"
+    message = "数据服务暂时不可用"
+
+class BackendQueryError(BackendError):
+    """
+    后端正常响应但拒绝了请求 (如约束冲突、参数错误)，重试无效
+    """
+    kind = "query"
+    message = "数据查询失败"
+
+def is_transient(error):
+    """
+    判断错误是否为临时性的 (重试可能成功)
+    """
+    # httpx / postgrest 只在使用 Supabase 后端时才导入；未导入 (或尚未导入完) 时错误不可能来自它们
+    transport_error = getattr(lazy.loaded("httpx"), "TransportError", None)
+    if transport_error is not None and isinstance(error, transport_error):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        text = str(error).lower()
+        return "locked" in text or "busy" in text
+    api_error = getattr(lazy.loaded("postgrest.exceptions"), "APIError", None)
+    if api_error is not None and isinstance(error, api_error):
+        code = error.code
+        if code is None:
+            # 网关 (而非 PostgREST) 返回的错误没有 code
+            return True
+        if isinstance(code, int):
+            # 响应体不是 JSON 时 code 为 HTTP 状态码
+            return code >= 500 or code in (408, 429)
+        code = str(code)
+        # PGRST000~003: 数据库连接失败 / 连接池超时；
+        # SQLSTATE 08 连接异常、40 事务回滚 (死锁、序列化失败)、53 资源不足、57 被取消 (如语句超时)
+        return code.startswith("PGRST00") or code[:2] in ("08", "40", "53", "57")
+    return False
+
+# --- 本次页面运行的提示 ---
+# 每次脚本运行开始时 begin_run() 放入新列表；预取线程和调用线程复制上下文后写入同一个列表
+_run_notices = contextvars.ContextVar("db_run_notices", default=None)
+
+def begin_run():
+    """
+    开始一次页面运行，清空上一次运行的提示
+    """
+    _run_notices.set([])
+
+def run_notices():
+    """
+    本次运行中记录的提示: [{'kind', 'message', 'operation', 'stale_age'}, ...]
+    """
+    return list(_run_notices.get() or [])
+
+def _note(notice):
+    notices = _run_notices.get()
+    if notices is not None:
+        notices.append(notice)
+
+def _record(error):
+    print(f"Backend call failed: {error}")
+    _note({'kind': error.kind, 'message': error.message, 'operation': error.operation, 'stale_age': None})
+    return error
+
+def note_stale(operation, age):
+    """
+    记录本次运行返回了过期的缓存数据 (由 cache 在调用失败时回调)
+    """
+    _note({'kind': "stale", 'message': "显示的是缓存数据", 'operation': operation, 'stale_age': age})
+
+def with_context(task):
+    """
+    让任务在当前上下文的副本中运行 (提交到其他线程时使用，提示会记录到本次运行)
+    """
+    return functools.partial(contextvars.copy_context().run, task)
+
+# --- 熔断器 ---
+class CircuitBreaker:
+    """
+    closed: 正常访问；open: 直接失败，持续 cooldown 秒；
+    之后进入 half-open，只放行一个试探请求，成功则恢复，失败则再次熔断
+    """
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"Circuit breaker opened for {self.name}")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+# --- 调用 ---
+_pool_lock = threading.Lock()
+_pool = None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=CALL_WORKERS, thread_name_prefix="db-call")
+    return _pool
+
+def _backoff(attempt):
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+def call(operation, func, *args, idempotent=True, deadline=None, breaker=None, **kwargs):
+    """
+    按容错策略执行 func(*args, **kwargs)
+    - idempotent=True 时临时错误会重试，所有尝试共用同一个截止时间
+    - 超时抛出 BackendTimeout，临时错误重试后仍失败或熔断中抛出 BackendUnavailable，其他错误抛出 BackendQueryError
+    注意：写操作超时后，已发出的请求仍可能在后台执行成功
+    """
+    if deadline is None:
+        deadline = READ_DEADLINE if idempotent else WRITE_DEADLINE
+    deadline_at = time.monotonic() + deadline
+    attempts = max(RETRY_ATTEMPTS, 1) if idempotent else 1
+
+    for attempt in range(1, attempts + 1):
+        if breaker is not None and not breaker.allow():
+            raise _record(BackendUnavailable(operation, "熔断中，暂停访问"))
+
+        future = _get_pool().submit(with_context(functools.partial(func, *args, **kwargs)))
+        try:
+            result = future.result(timeout=max(deadline_at - time.monotonic(), 0))
+        except FutureTimeout:
+            if breaker is not None:
+                breaker.failure()
+            raise _record(BackendTimeout(operation, f"超过 {deadline:g} 秒"))
+        except Exception as e:
+            if not is_transient(e):
+                # 后端有响应，只是请求本身有问题：不计入熔断
+                if breaker is not None:
+                    breaker.success()
+                raise _record(BackendQueryError(operation, e)) from e
+            if breaker is not None:
+                breaker.failure()
+            delay = _backoff(attempt)
+            if attempt == attempts or time.monotonic() + delay >= deadline_at:
+                raise _record(BackendUnavailable(operation, e)) from e
+            time.sleep(delay)
+            continue
+
+        if breaker is not None:
+            breaker.success()
+        return result
+
+class GuardedBackend:
+    """
+    存储后端的包装：每个公开方法都按容错策略调用，其他属性原样转发
+    """
+    def __init__(self, backend, breaker):
+        self._backend = backend
+        self.breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if name.startswith("_") or name in PASSTHROUGH_METHODS or not callable(attr):
+            return attr
+
+        idempotent = not name.startswith(WRITE_PREFIXES)
+        operation = f"{getattr(self._backend, 'name', 'backend')}.{name}"
+        deadline = DEADLINE_OVERRIDES.get(name)
+
+        @functools.wraps(attr)
+        def guarded(*args, **kwargs):
+            # 实际的数据库请求 (含重试) 单独计时，与 db_manager 函数中的 pandas 处理区分开
+            with metrics.span("backend", operation) as span:
+                result = call(operation, attr, *args, idempotent=idempotent, deadline=deadline, breaker=self.breaker, **kwargs)
+                span.rows = metrics.count_rows(result)
+                return result
+        return guarded
+
+_guarded_lock = threading.Lock()
+_guarded = {}  # id(后端实例) -> GuardedBackend
+
+def guard(backend):
+    """
+    获取后端实例对应的 GuardedBackend (每个实例一个熔断器)
+    """
+    if backend is None or isinstance(backend, GuardedBackend):
+        return backend
+    guarded = _guarded.get(id(backend))
+    if guarded is None or guarded._backend is not backend:
+        with _guarded_lock:
+            guarded = _guarded.get(id(backend))
+            if guarded is None or guarded._backend is not backend:
+                name = getattr(backend, 'path', None) or getattr(backend, 'name', 'backend')
+                guarded = GuardedBackend(backend, CircuitBreaker(name))
+                _guarded[id(backend)] = guarded
+    return guarded
+
+def breaker_states():
+    """
+    各后端熔断器的状态: {名称: closed/open/half-open}
+    """
+    with _guarded_lock:
+        return {guarded.breaker.name: guarded.breaker.state for guarded in _guarded.values()}
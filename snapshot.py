@@ -0,0 +1,157 @@
+"""
+登录后的会话数据快照
+- 登录时一次并发加载本会话常用的数据：用户列表 (管理员)、姓名列表、本月目标，并在后台预热上一份日报
+- 之后按高水位增量刷新：用户按 created_at、姓名按日报 id、目标按 updated_at，只取变化的行
+- 页面切换直接读内存；超过 SNAPSHOT_MAX_AGE 秒或点击“刷新数据”时增量刷新
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+import db_manager
+import lazy
+
+pd = lazy.module("pandas")
+
+# 快照自动增量刷新的间隔 (秒)
+SNAPSHOT_MAX_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", "300"))
+SESSION_KEY = "session_snapshot"
+
+def _beijing_today():
+    return (datetime.now(timezone.utc) + timedelta(hours=8)).date()
+
+def _names_with_watermark(fetch_names, *args):
+    """
+    先读日报 id 高水位，再读姓名：读取期间新增的日报 id 都大于该高水位，下次刷新时不会漏掉
+    """
+    report_id = db_manager.get_latest_report_id()
+    return report_id, fetch_names(*args)
+
+def _max_value(df, column):
+    if df is None or df.empty or column not in df.columns:
+        return None
+    return df[column].max()
+
+class SessionSnapshot:
+    """
+    一个会话的常用数据及其高水位
+    """
+    __slots__ = (
+        "username", "full_name", "is_admin", "month",
+        "users", "names", "goal",
+        "users_hwm", "reports_hwm", "goal_hwm", "refreshed_at",
+    )
+
+    def __init__(self, user):
+        self.username = user['username']
+        self.full_name = user['full_name']
+        self.is_admin = bool(user.get('is_admin', False))
+        self.month = _beijing_today().strftime("%Y-%m")
+        self.users = None
+        self.names = []
+        self.goal = None
+        self.users_hwm = None
+        self.reports_hwm = None
+        self.goal_hwm = None
+        self.refreshed_at = 0.0
+
+    def load(self):
+        """
+        全量加载 (登录时调用)
+        """
+        calls = {
+            "names": (_names_with_watermark, db_manager.get_unique_names),
+            "goal": (db_manager.get_user_monthly_goal, self.username, self.month),
+        }
+        if self.is_admin:
+            calls["users"] = (db_manager.get_all_users,)
+        data = db_manager.prefetch(**calls)
+
+        self.reports_hwm, names = data['names']
+        self.names = sorted(names or [])
+        self.set_goal(data['goal'])
+        if self.is_admin:
+            self.users = data['users']
+            self.users_hwm = _max_value(self.users, 'created_at')
+        self.refreshed_at = time.monotonic()
+        return self
+
+    def set_goal(self, goal):
+        """
+        更新本月目标 (提交业绩后直接使用返回的最新记录，无需再查询)
+        """
+        self.goal = goal
+        self.goal_hwm = goal.get('updated_at') if goal else None
+
+    def refresh(self):
+        """
+        增量刷新：只查询高水位之后变化的数据
+        跨月时重新加载本月目标
+        """
+        month = _beijing_today().strftime("%Y-%m")
+        if month != self.month:
+            self.month = month
+            self.set_goal(None)
+
+        calls = {
+            "goal": (db_manager.get_monthly_goal_if_changed, self.username, self.month, self.goal_hwm),
+        }
+        if self.reports_hwm is not None:
+            calls["names"] = (_names_with_watermark, db_manager.get_names_since, self.reports_hwm)
+        else:
+            calls["names"] = (_names_with_watermark, db_manager.get_unique_names)
+        if self.is_admin:
+            if self.users_hwm is not None:
+                calls["users"] = (db_manager.get_users_since, self.users_hwm)
+            else:
+                calls["users"] = (db_manager.get_all_users,)
+        data = db_manager.prefetch(**calls)
+
+        report_id, names = data['names']
+        if names is not None and report_id is not None:
+            self.names = sorted(set(self.names).union(names))
+            self.reports_hwm = report_id
+        if data['goal'] is not None:
+            self.set_goal(data['goal'])
+        if self.is_admin and data['users'] is not None and not data['users'].empty:
+            # 新用户按创建时间倒序排在前面，与 get_all_users 的顺序一致
+            if self.users is None or self.users.empty or self.users_hwm is None:
+                self.users = data['users']
+            else:
+                self.users = pd.concat([data['users'], self.users], ignore_index=True)
+            self.users_hwm = _max_value(self.users, 'created_at')
+        self.refreshed_at = time.monotonic()
+        return self
+
+    def is_stale(self):
+        return time.monotonic() - self.refreshed_at > SNAPSHOT_MAX_AGE
+
+def bootstrap(user):
+    """
+    登录成功后调用：加载快照，并在后台预热填写日报页的“昨日计划”
+    """
+    db_manager.warm_latest_report_before(user['full_name'], _beijing_today().strftime("%Y-%m-%d"))
+    snapshot = SessionSnapshot(user).load()
+    st.session_state[SESSION_KEY] = snapshot
+    return snapshot
+
+def current(user=None):
+    """
+    获取当前会话的快照
+    - 没有快照 (如页面刷新后会话重建) 或用户已变化时重新加载
+    - 超过 SNAPSHOT_MAX_AGE 时增量刷新
+    """
+    snapshot = st.session_state.get(SESSION_KEY)
+    if user is not None and (snapshot is None or snapshot.username != user['username']):
+        return bootstrap(user)
+    if snapshot is not None and snapshot.is_stale():
+        snapshot.refresh()
+    return snapshot
+
+def clear():
+    """
+    退出登录时丢弃快照
+    """
+    st.session_state.pop(SESSION_KEY, None)
@@ -0,0 +1,614 @@
+"""
+本地 SQLite 存储后端
+适用于单机部署或离线压测 (不需要 Supabase 项目)
+- WAL 日志模式：读写互不阻塞
+- 每个线程一个连接，全部使用参数化语句 (sqlite3 会缓存已编译的语句)
+- 与 supabase_backend.SupabaseBackend 实现相同的数据访问接口
+- 表结构由 migrations.py 维护，首次连接时自动迁移到最新版本
+"""
+import html
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import migrations
+
+# 每个连接缓存的已编译语句数量
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_SECONDS = 5
+
+# 从日志全量重建汇总表 (修复漂移时使用)
+REBUILD_ROLLUP_SQL = """
+INSERT INTO performance_daily_rollup (username, month, day, added_completed, added_revenue, submissions)
+SELECT username, month, date(created_at, '+8 hours'),
+       SUM(COALESCE(added_completed, 0)), SUM(COALESCE(added_revenue, 0)), COUNT(*)
+FROM performance_logs
+GROUP BY username, month, date(created_at, '+8 hours')
+"""
+
+_COLUMN_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# trigram 分词只能匹配 3 个字符以上的关键词；只有更短的关键词时查 reports_fts_short (逐字分词，见第 9 号迁移)
+FTS_MIN_TERM_LENGTH = 3
+# 搜索摘要的长度 (字符数) 及高亮标记 (转义 HTML 后替换为 <mark>)
+SNIPPET_LENGTH = 48
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+SEARCH_COLUMNS = ("work_content", "next_plan", "problems")
+
+def _highlight(snippet):
+    """
+    转义摘要中的 HTML，并把高亮标记换成 <mark>
+    """
+    return html.escape(snippet or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+def _like_snippet(row, terms):
+    """
+    不走全文索引时在 Python 中截取摘要：取第一个命中关键词附近的文字
+    """
+    text = " / ".join(row[col] for col in SEARCH_COLUMNS if row.get(col))
+    hits = [text.find(term) for term in terms if term in text]
+    start = max(min(hits) - SNIPPET_LENGTH // 4, 0) if hits else 0
+    snippet = text[start:start + SNIPPET_LENGTH]
+    for term in terms:
+        snippet = snippet.replace(term, f"{_MARK_OPEN}{term}{_MARK_CLOSE}")
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + SNIPPET_LENGTH < len(text) else ""
+    return _highlight(f"{prefix}{snippet}{suffix}")
+
+def _like_results(rows, terms):
+    """
+    不走 trigram 索引的搜索结果：摘要在 Python 中截取，没有相关度
+    """
+    return [
+        {
+            'id': row['id'],
+            'report_date': row['report_date'],
+            'employee_name': row['employee_name'],
+            'created_at': row['created_at'],
+            'snippet': _like_snippet(row, terms),
+            'score': None,
+        }
+        for row in rows
+    ]
+
+def _short_match(term):
+    """
+    短关键词在 reports_fts_short 中的查询：含中文时按逐字短语匹配，否则按词前缀匹配；
+    没有可索引的字符 (只有标点) 时返回 None
+    """
+    spaced = migrations.cjk_spaced(term)
+    if not re.search(r"[^\W_]", spaced):
+        return None
+    phrase = '"' + " ".join(spaced.split()).replace('"', '""') + '"'
+    return phrase if spaced != term else phrase + "*"
+
+_backends_lock = threading.Lock()
+_backends = {}
+
+def get_backend(path):
+    """
+    获取某个数据库文件对应的后端实例 (进程内共享)
+    """
+    backend = _backends.get(path)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(path)
+            if backend is None:
+                backend = _backends[path] = SQLiteBackend(path)
+    return backend
+
+def _utc_now():
+    # 与 Supabase 一致使用 UTC；保留微秒，保证 (report_date, created_at) 分页游标有序且少有重复
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+def _format_created_at(value):
+    """
+    统一为 _utc_now 的格式 (UTC 字符串)，保证与其他日报的 created_at 可以按字符串排序
+    """
+    if value is None:
+        return _utc_now()
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return value
+
+def _columns(columns):
+    """
+    将 "a, b, c" 形式的列名转为 SQL 片段 (列名均来自代码中的常量，这里再做一次白名单校验)
+    """
+    if columns.strip() == "*":
+        return "*"
+    names = [c.strip() for c in columns.split(",")]
+    for name in names:
+        if not _COLUMN_RE.match(name):
+            raise ValueError(f"Invalid column name: {name!r}")
+    return ", ".join(names)
+
+def _user_row(row):
+    if row is None:
+        return None
+    user = dict(row)
+    if 'is_admin' in user:
+        user['is_admin'] = bool(user['is_admin'])
+    return user
+
+class SQLiteBackend:
+    """
+    基于本地 SQLite 文件的后端
+    所有方法出错时直接抛异常，由 db_manager 统一处理
+    """
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,  # 自动提交；多语句写入时显式 BEGIN
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        # reports 的全文索引触发器用到 cjk_spaced()
+        migrations.register_sqlite_functions(conn)
+
+        with self._schema_lock:
+            if not self._schema_ready:
+                migrations.migrate(conn, "sqlite")
+                self._schema_ready = True
+
+        self._local.conn = conn
+        return conn
+
+    def _all(self, sql, params=()):
+        return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def _one(self, sql, params=()):
+        row = self._connect().execute(sql, params).fetchone()
+        return dict(row) if row is not None else None
+
+    def _insert(self, table, row):
+        names = list(row)
+        for name in names:
+            if not _COLUMN_RE.match(name):
+                raise ValueError(f"Invalid column name: {name!r}")
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        self._connect().execute(sql, [row[name] for name in names])
+
+    def close(self):
+        """
+        关闭当前线程的连接
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- users ---
+    def find_user(self, username):
+        # 返回的 password 为哈希 (或尚未迁移的明文)，由 db_manager 校验
+        row = self._connect().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return _user_row(row)
+
+    def user_exists(self, username):
+        return self._one("SELECT 1 AS found FROM users WHERE username = ?", (username,)) is not None
+
+    def insert_user(self, user):
+        user = dict(user, is_admin=int(bool(user.get('is_admin'))))
+        self._insert("users", user)
+
+    def insert_users(self, users):
+        """
+        批量创建用户，已存在的用户名跳过；返回实际创建的用户名集合
+        同一事务内先用一条查询找出冲突的用户名，再多行插入其余用户
+        """
+        if not users:
+            return set()
+        columns = ['username', 'password', 'full_name', 'department', 'phone', 'is_admin']
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            usernames = [user['username'] for user in users]
+            existing = {
+                row[0] for row in conn.execute(
+                    f"SELECT username FROM users WHERE username IN ({', '.join('?' for _ in usernames)})", usernames
+                )
+            }
+            new_users = [user for user in users if user['username'] not in existing]
+            conn.executemany(
+                f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [[user.get(col) for col in columns[:-1]] + [int(bool(user.get('is_admin')))] for user in new_users],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {user['username'] for user in new_users}
+
+    def update_user_password(self, username, password, previous=None):
+        """
+        previous 不为空时只在当前密码仍为 previous 时更新 (登录时替换旧哈希，避免覆盖并发修改的新密码)
+        返回是否更新
+        """
+        if previous is None:
+            cursor = self._connect().execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+        else:
+            cursor = self._connect().execute(
+                "UPDATE users SET password = ? WHERE username = ? AND password = ?", (password, username, previous)
+            )
+        return cursor.rowcount > 0
+
+    def list_plaintext_passwords(self, prefix):
+        # 密码不以哈希前缀开头的用户 (instr 不受 LIKE 通配符影响)
+        return self._all("SELECT username, password FROM users WHERE instr(password, ?) != 1", (prefix,))
+
+    def list_users(self, columns):
+        rows = self._connect().execute(
+            f"SELECT {_columns(columns)} FROM users ORDER BY created_at DESC"
+        ).fetchall()
+        return [_user_row(row) for row in rows]
+
+    def list_users_since(self, columns, created_at):
+        rows = self._connect().execute(
+            f"SELECT {_columns(columns)} FROM users WHERE created_at > ? ORDER BY created_at DESC", (created_at,)
+        ).fetchall()
+        return [_user_row(row) for row in rows]
+
+    # --- reports ---
+    def insert_report(self, report):
+        self._insert("reports", dict(report, created_at=report.get('created_at') or _utc_now()))
+
+    def insert_reports(self, reports):
+        """
+        多行插入日报 (单个事务)；created_at 可以是带时区的 datetime，缺省为当前时间
+        """
+        columns = ['employee_name', 'report_date', 'work_content', 'next_plan', 'problems', 'created_at']
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"INSERT INTO reports ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [[report.get(col) for col in columns[:-1]] + [_format_created_at(report.get('created_at'))] for report in reports],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(reports)
+
+    def existing_report_keys(self, keys):
+        """
+        在一条查询中找出已存在的日报 (employee_name, report_date, work_content)
+        """
+        if not keys:
+            return set()
+        values = ", ".join("(?, ?, ?)" for _ in keys)
+        rows = self._connect().execute(
+            f"WITH incoming (employee_name, report_date, work_content) AS (VALUES {values}) "
+            "SELECT DISTINCT i.employee_name, i.report_date, i.work_content FROM incoming i "
+            "JOIN reports r ON r.employee_name = i.employee_name AND r.report_date = i.report_date "
+            "AND r.work_content = i.work_content",
+            [value for key in keys for value in key],
+        ).fetchall()
+        return {tuple(row) for row in rows}
+
+    def latest_report_before(self, employee_name, current_date, columns):
+        return self._one(
+            f"SELECT {_columns(columns)} FROM reports "
+            "WHERE employee_name = ? AND report_date < ? "
+            "ORDER BY report_date DESC LIMIT 1",
+            (employee_name, current_date),
+        )
+
+    def _report_filters(self, employee_name=None, report_date=None):
+        clauses, params = [], []
+        if employee_name:
+            clauses.append("employee_name = ?")
+            params.append(employee_name)
+        if report_date:
+            clauses.append("report_date = ?")
+            params.append(report_date)
+        return clauses, params
+
+    def reports_page(self, columns, employee_name=None, report_date=None, cursor=None, limit=50):
+        clauses, params = self._report_filters(employee_name, report_date)
+        if cursor:
+            # 行值比较可以直接在 (report_date, created_at, id) 索引上做范围扫描
+            clauses.append("(report_date, created_at, id) < (?, ?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._all(
+            f"SELECT {_columns(columns)} FROM reports {where}"
+            "ORDER BY report_date DESC, created_at DESC, id DESC LIMIT ?",
+            params + [limit],
+        )
+
+    def count_reports(self, employee_name=None, report_date=None, estimate=False):
+        clauses, params = self._report_filters(employee_name, report_date)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connect().execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def _report_date_range(self, start_day=None, end_day=None):
+        clauses, params = [], []
+        if start_day:
+            clauses.append("report_date >= ?")
+            params.append(start_day)
+        if end_day:
+            clauses.append("report_date <= ?")
+            params.append(end_day)
+        return clauses, params
+
+    def report_counts_by_employee(self, start_day=None, end_day=None):
+        clauses, params = self._report_date_range(start_day, end_day)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._all(
+            f"SELECT employee_name, COUNT(*) AS reports FROM reports {where}"
+            "GROUP BY employee_name ORDER BY reports DESC, employee_name",
+            params,
+        )
+
+    def report_counts_by_day(self, start_day=None, end_day=None, employee_name=None):
+        clauses, params = self._report_date_range(start_day, end_day)
+        if employee_name:
+            clauses.append("employee_name = ?")
+            params.append(employee_name)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._all(
+            f"SELECT report_date, COUNT(*) AS reports FROM reports {where}GROUP BY report_date ORDER BY report_date",
+            params,
+        )
+
+    def search_reports(self, query, employee_name=None, report_date=None, limit=20, offset=0):
+        """
+        全文搜索日报正文，返回 (当前页结果, 命中总数)
+        结果按相关度排序；snippet 为已转义的 HTML，关键词用 <mark> 标出
+        """
+        terms = query.split()
+        fts_terms = [t for t in terms if len(t) >= FTS_MIN_TERM_LENGTH]
+        short_terms = [t for t in terms if len(t) < FTS_MIN_TERM_LENGTH]
+
+        clauses, params = self._report_filters(employee_name, report_date)
+        conn = self._connect()
+        short_match = [_short_match(t) for t in short_terms]
+        if short_terms and not fts_terms and not clauses and all(short_match):
+            # 只有短关键词且没有其他筛选条件 (否则要扫描全表)：在 reports_fts_short 上计数，
+            # 按 id 倒序 (最近提交的在前) 取当前页，不必对全部命中排序
+            match = " ".join(short_match)
+            total = conn.execute(
+                "SELECT COUNT(*) FROM reports_fts_short WHERE reports_fts_short MATCH ?", (match,)
+            ).fetchone()[0]
+            rows = self._all(
+                f"SELECT r.id, r.report_date, r.employee_name, r.created_at, {', '.join(SEARCH_COLUMNS)} "
+                "FROM (SELECT rowid FROM reports_fts_short WHERE reports_fts_short MATCH ? "
+                "ORDER BY rowid DESC LIMIT ? OFFSET ?) f JOIN reports r ON r.id = f.rowid ORDER BY r.id DESC",
+                (match, limit, offset),
+            )
+            return _like_results(rows, short_terms), total
+
+        # 短关键词与长关键词同时出现或带有筛选条件时，候选行已经很少，直接用 LIKE 过滤
+        for term in short_terms:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(" + " OR ".join(f"r.{col} LIKE ? ESCAPE '\\'" for col in SEARCH_COLUMNS) + ")")
+            params.extend([pattern] * len(SEARCH_COLUMNS))
+
+        if fts_terms:
+            # 每个关键词作为短语匹配 (多个关键词之间为 AND)
+            match = " ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+            where = " AND ".join(["reports_fts MATCH ?"] + clauses)
+            source = "reports_fts JOIN reports r ON r.id = reports_fts.rowid"
+            total = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", [match, *params]).fetchone()[0]
+            rows = self._all(
+                f"SELECT r.id, r.report_date, r.employee_name, r.created_at, "
+                f"snippet(reports_fts, -1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_LENGTH // 3}) AS snippet, "
+                f"-bm25(reports_fts) AS score "
+                f"FROM {source} WHERE {where} "
+                f"ORDER BY bm25(reports_fts), r.report_date DESC, r.id DESC LIMIT ? OFFSET ?",
+                [match, *params, limit, offset],
+            )
+            for row in rows:
+                row['snippet'] = _highlight(row['snippet'])
+            return rows, total
+
+        # 只有短关键词且带筛选条件 (或关键词只有标点)：按日期倒序
+        where = " AND ".join(clauses) if clauses else "1"
+        total = conn.execute(f"SELECT COUNT(*) FROM reports r WHERE {where}", params).fetchone()[0]
+        rows = self._all(
+            f"SELECT r.id, r.report_date, r.employee_name, r.created_at, {', '.join(SEARCH_COLUMNS)} "
+            f"FROM reports r WHERE {where} ORDER BY r.report_date DESC, r.id DESC LIMIT ? OFFSET ?",
+            [*params, limit, offset],
+        )
+        return _like_results(rows, short_terms), total
+
+    def get_report(self, report_id, columns):
+        return self._one(f"SELECT {_columns(columns)} FROM reports WHERE id = ?", (report_id,))
+
+    def unique_employee_names(self):
+        # (employee_name, report_date) 索引上的 DISTINCT 只需扫描索引
+        rows = self._connect().execute(
+            "SELECT DISTINCT employee_name FROM reports ORDER BY employee_name"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def reports_after(self, report_id, columns, limit):
+        return self._all(
+            f"SELECT {_columns(columns)} FROM reports WHERE id > ? ORDER BY id LIMIT ?", (report_id, limit)
+        )
+
+    def reports_by_ids(self, ids, columns):
+        ids = list(ids)
+        return self._all(
+            f"SELECT {_columns(columns)} FROM reports WHERE id IN ({', '.join('?' for _ in ids)}) ORDER BY id", ids
+        )
+
+    def mirror_reports(self, rows):
+        """
+        按原 id 写入日报副本 (report_cache 同步使用)，重复同步同一行时覆盖
+        """
+        columns = ['id', 'employee_name', 'report_date', 'work_content', 'next_plan', 'problems', 'created_at']
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 用 upsert 而不是 INSERT OR REPLACE：REPLACE 删除旧行时不触发 DELETE 触发器，全文索引会残留旧内容
+            updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != 'id')
+            conn.executemany(
+                f"INSERT INTO reports ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}",
+                [[row.get(col) for col in columns] for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def latest_report_id(self):
+        return self._connect().execute("SELECT MAX(id) FROM reports").fetchone()[0]
+
+    def employee_names_since(self, report_id):
+        rows = self._connect().execute(
+            "SELECT DISTINCT employee_name FROM reports WHERE id > ?", (report_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- monthly_goals ---
+    def get_monthly_goal(self, username, month_str):
+        return self._one(
+            "SELECT * FROM monthly_goals WHERE username = ? AND month = ?", (username, month_str)
+        )
+
+    def monthly_goal_changed_since(self, username, month_str, updated_at):
+        return self._one(
+            "SELECT * FROM monthly_goals WHERE username = ? AND month = ? AND updated_at IS NOT ?",
+            (username, month_str, updated_at),
+        )
+
+    def list_monthly_goals(self, month_str):
+        return self._all("SELECT * FROM monthly_goals WHERE month = ?", (month_str,))
+
+    def monthly_goal_overview(self, month_str, columns):
+        return self._all(
+            f"SELECT {_columns(columns)} FROM monthly_goal_overview WHERE month = ?", (month_str,)
+        )
+
+    def upsert_monthly_goal(self, goal):
+        self._connect().execute(
+            "INSERT INTO monthly_goals (username, month, target_amount, completed_amount, revenue_amount, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (username, month) DO UPDATE SET "
+            "target_amount = excluded.target_amount, "
+            "completed_amount = excluded.completed_amount, "
+            "revenue_amount = excluded.revenue_amount, "
+            "updated_at = excluded.updated_at",
+            (
+                goal['username'], goal['month'], goal['target_amount'],
+                goal['completed_amount'], goal['revenue_amount'], goal.get('updated_at') or _utc_now(),
+            ),
+        )
+
+    def increment_monthly_goal(self, username, month_str, added_completed, added_revenue, target_amount=None):
+        """
+        在一个写事务内累加目标记录并写入日志，返回更新后的记录
+        BEGIN IMMEDIATE 先拿到写锁，并发提交按顺序执行，不会丢失更新
+        """
+        conn = self._connect()
+        now = _utc_now()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO monthly_goals (username, month, target_amount, completed_amount, revenue_amount, updated_at) "
+                "VALUES (?, ?, COALESCE(?, 0), ?, ?, ?) "
+                "ON CONFLICT (username, month) DO UPDATE SET "
+                "target_amount = COALESCE(?, target_amount), "
+                "completed_amount = completed_amount + excluded.completed_amount, "
+                "revenue_amount = revenue_amount + excluded.revenue_amount, "
+                "updated_at = excluded.updated_at",
+                (username, month_str, target_amount, added_completed, added_revenue, now, target_amount),
+            )
+            if added_completed > 0 or added_revenue > 0:
+                conn.execute(
+                    "INSERT INTO performance_logs (username, month, added_completed, added_revenue, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (username, month_str, added_completed, added_revenue, now),
+                )
+            goal = conn.execute(
+                "SELECT * FROM monthly_goals WHERE username = ? AND month = ?", (username, month_str)
+            ).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(goal)
+
+    # --- performance_logs ---
+    def insert_performance_log(self, log):
+        self._insert("performance_logs", dict(log, created_at=log.get('created_at') or _utc_now()))
+
+    def list_performance_logs(self, username, month_str):
+        return self._all(
+            "SELECT * FROM performance_logs WHERE username = ? AND month = ? ORDER BY created_at DESC",
+            (username, month_str),
+        )
+
+    # --- performance_daily_rollup ---
+    def performance_rollup(self, columns, month_str=None, start_day=None, end_day=None, username=None):
+        clauses, params = [], []
+        if month_str:
+            clauses.append("month = ?")
+            params.append(month_str)
+        if start_day:
+            clauses.append("day >= ?")
+            params.append(start_day)
+        if end_day:
+            clauses.append("day <= ?")
+            params.append(end_day)
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._all(
+            f"SELECT {_columns(columns)} FROM performance_daily_overview {where}ORDER BY day, username",
+            params,
+        )
+
+    def rebuild_performance_rollup(self):
+        """
+        清空并按日志重新计算汇总表，返回重建后的行数
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM performance_daily_rollup")
+            rows = conn.execute(REBUILD_ROLLUP_SQL).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    # --- session_revocations ---
+    def insert_session_revocation(self, revocation):
+        self._insert("session_revocations", dict(
+            revocation,
+            revoked_at=_format_created_at(revocation['revoked_at']),
+            expires_at=_format_created_at(revocation['expires_at']),
+        ))
+
+    def list_session_revocations(self, after_id, now, limit):
+        # 按 id 增量读取，跳过已过期的记录
+        return self._all(
+            "SELECT id, sid, username, revoked_at, expires_at FROM session_revocations "
+            "WHERE id > ? AND expires_at > ? ORDER BY id LIMIT ?",
+            (after_id, _format_created_at(now), limit),
+        )
@@ -0,0 +1,451 @@
+"""
+Supabase 存储后端
+- 整个进程共享一个带连接池的 Supabase 客户端
+- SupabaseBackend 实现 db_manager 使用的数据访问接口 (与 sqlite_backend.SQLiteBackend 相同)
+建表 SQL 见 migrations.py
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import postgrest.base_request_builder as postgrest_request_builder
+from postgrest import ReturnMethod
+from postgrest.exceptions import APIError
+from supabase import create_client, Client, ClientOptions
+
+import metrics
+
+# --- 连接池配置 ---
+# 整个进程共享一个 Supabase 客户端 (所有 Streamlit 会话、所有 rerun 复用)，
+# 底层 httpx 连接池保持长连接，避免每次查询都重新做 TLS 握手
+POOL_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60"))
+# 单个 HTTP 请求的超时 (秒)；整次调用 (含重试) 的截止时间由 resilience 控制
+HTTP_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "10"))
+
+# postgrest 遇到 503/520 时会自动重试 GET/HEAD 并依次 sleep 1、2、4... 秒，不受调用截止时间约束；
+# 重试统一由 resilience 负责 (带截止时间和熔断)，这里关闭内置重试
+postgrest_request_builder.MAX_RETRIES = 0
+
+# 分批读取汇总数据的行数 (低于 PostgREST 默认的 max-rows)
+ROLLUP_BATCH_SIZE = 1000
+
+_client_lock = threading.Lock()
+_client = None
+_client_http = None
+_client_config = None
+_backend = None
+
+def _record_payload(response):
+    # 响应钩子：读取响应体并记录字节数 (计入当前调用的统计)
+    response.read()
+    metrics.add_bytes(len(response.content))
+
+def _build_client(url, key):
+    """
+    创建带有限连接池的 Supabase 客户端
+    """
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        http2=True,
+        event_hooks={"response": [_record_payload]},
+    )
+    options = ClientOptions(
+        httpx_client=http_client,
+        # 仅使用 anon key 访问数据表，不需要登录会话和后台刷新 token
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return create_client(url, key, options=options), http_client
+
+def get_client(url, key) -> Client:
+    """
+    获取 Supabase 客户端实例 (进程内共享，线程安全)
+    url / key 变化时重建客户端并关闭旧的连接池
+    """
+    global _client, _client_http, _client_config, _backend
+
+    config = (url, key)
+    # 快速路径：配置未变化时直接复用，无需加锁
+    client = _client
+    if client is not None and _client_config == config:
+        return client
+
+    with _client_lock:
+        if _client is None or _client_config != config:
+            # 凭据变化：先创建新客户端，再关闭旧的连接池
+            old_http = _client_http
+            _client, _client_http = _build_client(url, key)
+            _client_config = config
+            _backend = None
+            if old_http is not None:
+                old_http.close()
+        return _client
+
+def get_backend(client):
+    """
+    获取与共享客户端绑定的后端实例
+    """
+    global _backend
+    backend = _backend
+    if backend is None or backend.client is not client:
+        backend = _backend = SupabaseBackend(client)
+    return backend
+
+def close_client():
+    """
+    关闭共享客户端及其连接池 (进程退出或测试时使用)
+    """
+    global _client, _client_http, _client_config, _backend
+    with _client_lock:
+        if _client_http is not None:
+            _client_http.close()
+        _client = None
+        _client_http = None
+        _client_config = None
+        _backend = None
+
+def _first(response):
+    data = response.data
+    if data and len(data) > 0:
+        return data[0]
+    return None
+
+class SupabaseBackend:
+    """
+    通过 PostgREST 访问 Supabase 数据表
+    所有方法出错时直接抛异常，由 db_manager 统一处理
+    """
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    # --- users ---
+    def find_user(self, username):
+        # 返回的 password 为哈希 (或尚未迁移的明文)，由 db_manager 校验
+        response = self.client.table("users").select("*").eq("username", username).execute()
+        return _first(response)
+
+    def user_exists(self, username):
+        response = self.client.table("users").select("username").eq("username", username).execute()
+        return bool(response.data)
+
+    def insert_user(self, user):
+        self.client.table("users").insert(user).execute()
+
+    def insert_users(self, users):
+        # 以 username 为冲突键的 upsert (忽略重复)：冲突检测和插入在同一条语句中完成
+        # 只有新插入的行会返回，据此得到实际创建的用户名
+        if not users:
+            return set()
+        response = self.client.table("users").upsert(
+            users, on_conflict="username", ignore_duplicates=True
+        ).execute()
+        return {row['username'] for row in response.data or []}
+
+    def update_user_password(self, username, password, previous=None):
+        # previous 不为空时只在当前密码仍为 previous 时更新；返回是否更新
+        query = self.client.table("users").update({"password": password}).eq("username", username)
+        if previous is not None:
+            query = query.eq("password", previous)
+        response = query.execute()
+        return bool(response.data)
+
+    def list_plaintext_passwords(self, prefix):
+        # PostgREST 的 like 以 * 为通配符
+        response = self.client.table("users").select("username, password").not_.like("password", f"{prefix}*").execute()
+        return response.data or []
+
+    def list_users(self, columns):
+        # 按创建时间倒序
+        response = self.client.table("users").select(columns).order("created_at", desc=True).execute()
+        return response.data or []
+
+    def list_users_since(self, columns, created_at):
+        response = self.client.table("users").select(columns)\
+            .gt("created_at", created_at)\
+            .order("created_at", desc=True)\
+            .execute()
+        return response.data or []
+
+    # --- reports ---
+    def insert_report(self, report):
+        self.client.table("reports").insert(report).execute()
+
+    def insert_reports(self, reports):
+        # 缺省 created_at 的行逐行递增 1 微秒，而不是使用数据库默认值 now()：
+        # 同一条 INSERT 中 now() 全部相同，整批日报的 created_at 一样，列表按导入顺序排列
+        now = datetime.now(timezone.utc)
+        rows = []
+        for i, report in enumerate(reports):
+            created_at = report.get('created_at') or now + timedelta(microseconds=i)
+            if isinstance(created_at, datetime):
+                created_at = created_at.isoformat()
+            rows.append(dict(report, created_at=created_at))
+        self.client.table("reports").insert(rows, returning=ReturnMethod.minimal, default_to_null=False).execute()
+        return len(rows)
+
+    def existing_report_keys(self, keys):
+        # 数据库函数 existing_report_keys (见 migrations.py 第 10 号迁移) 用 unnest 把本批的
+        # (姓名, 日期, 正文 md5) 与 reports 精确连接，只返回已存在的组合；参数放在请求体中，不受 URL 长度限制
+        if not keys:
+            return set()
+        by_digest = {
+            (name, str(day), hashlib.md5((content or "").encode("utf-8")).hexdigest()): (name, day, content)
+            for name, day, content in keys
+        }
+        response = self.client.rpc("existing_report_keys", {
+            "p_names": [key[0] for key in by_digest],
+            "p_dates": [key[1] for key in by_digest],
+            "p_hashes": [key[2] for key in by_digest],
+        }).execute()
+        return {
+            by_digest[key]
+            for key in ((row['employee_name'], row['report_date'], row['content_md5']) for row in response.data or [])
+            if key in by_digest
+        }
+
+    def latest_report_before(self, employee_name, current_date, columns):
+        # 查找该员工，且日期小于当前日期的记录，按日期倒序排列，取第一条
+        response = (
+            self.client.table("reports")
+            .select(columns)
+            .eq("employee_name", employee_name)
+            .lt("report_date", current_date)
+            .order("report_date", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return _first(response)
+
+    def _filter_reports(self, query, employee_name=None, report_date=None):
+        """
+        将姓名/日期筛选条件下推到数据库
+        """
+        if employee_name:
+            query = query.eq("employee_name", employee_name)
+        if report_date:
+            query = query.eq("report_date", report_date)
+        return query
+
+    def reports_page(self, columns, employee_name=None, report_date=None, cursor=None, limit=50):
+        """
+        按 (report_date, created_at, id) 倒序做 keyset 分页，返回一页原始数据
+        cursor: 上一页最后一行的 (report_date, created_at, id)
+        """
+        query = self._filter_reports(self.client.table("reports").select(columns), employee_name, report_date)
+        if cursor:
+            last_date, last_created, last_id = cursor
+            # 值中含有 ":" "." 等保留字符，需要加双引号
+            query = query.or_(
+                f'report_date.lt."{last_date}",'
+                f'and(report_date.eq."{last_date}",created_at.lt."{last_created}"),'
+                f'and(report_date.eq."{last_date}",created_at.eq."{last_created}",id.lt.{int(last_id)})'
+            )
+        response = (query.order("report_date", desc=True).order("created_at", desc=True).order("id", desc=True)
+                    .limit(limit).execute())
+        return response.data or []
+
+    def count_reports(self, employee_name=None, report_date=None, estimate=False):
+        # HEAD 请求只返回 count，不传输数据行
+        # estimate=True 时行数较多的情况下使用查询计划的估计值，不做全表计数
+        query = self.client.table("reports").select("id", count="estimated" if estimate else "exact", head=True)
+        response = self._filter_reports(query, employee_name, report_date).execute()
+        return response.count or 0
+
+    def report_counts_by_employee(self, start_day=None, end_day=None):
+        # 数据库函数 (见 migrations.py 第 5 号迁移) 分组计数，只返回每人一行
+        response = self.client.rpc("report_counts_by_employee", {"p_start": start_day, "p_end": end_day}).execute()
+        return response.data or []
+
+    def report_counts_by_day(self, start_day=None, end_day=None, employee_name=None):
+        response = self.client.rpc("report_counts_by_day", {
+            "p_start": start_day,
+            "p_end": end_day,
+            "p_employee_name": employee_name,
+        }).execute()
+        return response.data or []
+
+    def search_reports(self, query, employee_name=None, report_date=None, limit=20, offset=0):
+        # PGroonga 全文索引 + 数据库函数 (见 migrations.py 第 6 号迁移)，只返回当前页和摘要
+        response = self.client.rpc("search_reports", {
+            "p_query": query,
+            "p_employee_name": employee_name,
+            "p_report_date": report_date,
+            "p_limit": limit,
+            "p_offset": offset,
+        }).execute()
+        rows = response.data or []
+        total = rows[0]['total'] if rows else 0
+        return [{k: v for k, v in row.items() if k != 'total'} for row in rows], total
+
+    def get_report(self, report_id, columns):
+        response = self.client.table("reports").select(columns).eq("id", report_id).limit(1).execute()
+        return _first(response)
+
+    def unique_employee_names(self):
+        try:
+            # 优先使用数据库函数做 DISTINCT (见 migrations.py 第 3 号迁移)
+            response = self.client.rpc("get_unique_employee_names", {}).execute()
+            return [item['employee_name'] for item in response.data or []]
+        except APIError as e:
+            # 数据库函数尚未创建：退回到从 users 表 (数据量很小) 取姓名
+            print(f"RPC get_unique_employee_names unavailable, falling back to users: {e}")
+            response = self.client.table("users").select("full_name").execute()
+            return sorted({item['full_name'] for item in response.data or [] if item.get('full_name')})
+
+    def reports_after(self, report_id, columns, limit):
+        # 按主键范围读取，供本地缓存增量同步
+        response = self.client.table("reports").select(columns)\
+            .gt("id", report_id)\
+            .order("id")\
+            .limit(limit)\
+            .execute()
+        return response.data or []
+
+    def reports_by_ids(self, ids, columns):
+        response = self.client.table("reports").select(columns).in_("id", list(ids)).order("id").execute()
+        return response.data or []
+
+    def latest_report_id(self):
+        response = self.client.table("reports").select("id").order("id", desc=True).limit(1).execute()
+        row = _first(response)
+        return row['id'] if row else None
+
+    def employee_names_since(self, report_id):
+        response = self.client.table("reports").select("employee_name").gt("id", report_id).execute()
+        return list({item['employee_name'] for item in response.data or []})
+
+    # --- monthly_goals ---
+    def get_monthly_goal(self, username, month_str):
+        response = self.client.table("monthly_goals").select("*")\
+            .eq("username", username)\
+            .eq("month", month_str)\
+            .execute()
+        return _first(response)
+
+    def monthly_goal_changed_since(self, username, month_str, updated_at):
+        query = self.client.table("monthly_goals").select("*").eq("username", username).eq("month", month_str)
+        if updated_at is not None:
+            # 只比较是否不同 (历史数据的时间格式不统一，不能按大小比较)
+            query = query.neq("updated_at", updated_at)
+        return _first(query.execute())
+
+    def list_monthly_goals(self, month_str):
+        response = self.client.table("monthly_goals").select("*").eq("month", month_str).execute()
+        return response.data or []
+
+    def monthly_goal_overview(self, month_str, columns):
+        try:
+            response = self.client.table("monthly_goal_overview").select(columns).eq("month", month_str).execute()
+            return response.data or []
+        except APIError as e:
+            # 视图尚未创建：退回到两次按列查询
+            print(f"View monthly_goal_overview unavailable, falling back to two queries: {e}")
+            return self._monthly_goal_overview_fallback(month_str)
+
+    def _monthly_goal_overview_fallback(self, month_str):
+        """
+        未创建视图时的兼容查询：只取需要的列，只查本月有目标的用户
+        """
+        goals = self.client.table("monthly_goals")\
+            .select("username, target_amount, completed_amount, revenue_amount")\
+            .eq("month", month_str)\
+            .execute().data
+        if not goals:
+            return []
+
+        usernames = [g['username'] for g in goals]
+        users = self.client.table("users").select("username, full_name, department").in_("username", usernames).execute().data
+        users_by_name = {u['username']: u for u in users or []}
+        for goal in goals:
+            info = users_by_name.get(goal['username'], {})
+            goal['full_name'] = info.get('full_name') or goal['username']
+            goal['department'] = info.get('department')
+        return goals
+
+    def upsert_monthly_goal(self, goal):
+        # on_conflict 对应 unique 约束的列
+        self.client.table("monthly_goals").upsert(goal, on_conflict="username, month").execute()
+
+    def increment_monthly_goal(self, username, month_str, added_completed, added_revenue, target_amount=None):
+        # 数据库函数 increment_monthly_goal (见 migrations.py 第 3 号迁移) 在一个事务内完成累加和写日志
+        response = self.client.rpc("increment_monthly_goal", {
+            "p_username": username,
+            "p_month": month_str,
+            "p_added_completed": added_completed,
+            "p_added_revenue": added_revenue,
+            "p_target_amount": target_amount,
+        }).execute()
+        data = response.data
+        if isinstance(data, list):
+            return data[0] if data else None
+        return data
+
+    # --- performance_logs ---
+    def insert_performance_log(self, log):
+        self.client.table("performance_logs").insert(log).execute()
+
+    def list_performance_logs(self, username, month_str):
+        response = self.client.table("performance_logs").select("*")\
+            .eq("username", username)\
+            .eq("month", month_str)\
+            .order("created_at", desc=True)\
+            .execute()
+        return response.data or []
+
+    # --- performance_daily_rollup ---
+    def performance_rollup(self, columns, month_str=None, start_day=None, end_day=None, username=None):
+        """
+        读取按日汇总的业绩 (视图 performance_daily_overview，见 migrations.py 第 4 号迁移)
+        一个月约为 人数 x 天数 行，按主键顺序分批读取
+        """
+        rows, offset = [], 0
+        while True:
+            query = self.client.table("performance_daily_overview").select(columns)
+            if month_str:
+                query = query.eq("month", month_str)
+            if start_day:
+                query = query.gte("day", start_day)
+            if end_day:
+                query = query.lte("day", end_day)
+            if username:
+                query = query.eq("username", username)
+            response = query.order("day").order("username").order("month")\
+                .range(offset, offset + ROLLUP_BATCH_SIZE - 1)\
+                .execute()
+            batch = response.data or []
+            rows.extend(batch)
+            if len(batch) < ROLLUP_BATCH_SIZE:
+                return rows
+            offset += ROLLUP_BATCH_SIZE
+
+    def rebuild_performance_rollup(self):
+        response = self.client.rpc("rebuild_performance_rollup", {}).execute()
+        return response.data
+
+    # --- session_revocations ---
+    def insert_session_revocation(self, revocation):
+        row = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in revocation.items()}
+        self.client.table("session_revocations").insert(row, returning=ReturnMethod.minimal).execute()
+
+    def list_session_revocations(self, after_id, now, limit):
+        # 按 id 增量读取，跳过已过期的记录
+        response = self.client.table("session_revocations")\
+            .select("id, sid, username, revoked_at, expires_at")\
+            .gt("id", after_id)\
+            .gt("expires_at", now.isoformat())\
+            .order("id")\
+            .limit(limit)\
+            .execute()
+        return response.data or []
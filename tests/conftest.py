@@ -0,0 +1,106 @@
+"""
+测试公共设置：仓库根目录的模块 (db_manager、auth 等) 直接导入
+- sqlite_db: 临时 SQLite 数据库作为 db_manager 的后端
+- fake_postgrest: 本地的假 PostgREST 服务，按脚本返回响应并记录请求
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """
+    使用临时 SQLite 数据库作为 db_manager 的后端，返回数据库文件路径
+    """
+    import auth
+    import cache
+
+    path = str(tmp_path / "test.db")
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", path)
+    cache.invalidate()
+    auth.denylist.clear()
+    yield path
+    cache.invalidate()
+    auth.denylist.clear()
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # "drop" 步骤主动断开连接，不打印连接重置的堆栈
+        pass
+
+class FakePostgrest:
+    """
+    按脚本依次返回响应: (状态码, 响应体, 延迟秒数)；"drop" 表示不返回响应直接断开连接
+    脚本用完后返回 200 []
+    """
+    def __init__(self):
+        self.requests = []
+        self.bodies = []
+        self.script = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with fake._lock:
+                    fake.requests.append((self.command, self.path.split("?")[0]))
+                    fake.bodies.append(json.loads(body) if body else None)
+                    step = fake.script.pop(0) if fake.script else (200, [], 0)
+                if step == "drop":
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                status, body, delay = step
+                if delay:
+                    time.sleep(delay)
+                # 网关错误 (5xx / 429) 的响应体通常不是 JSON
+                data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain" if isinstance(body, str) else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_HEAD = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _QuietServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def calls(self, method=None):
+        return [r for r in self.requests if method is None or r[0] == method]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_postgrest():
+    """
+    本地的假 PostgREST 服务；supabase_backend 的客户端用 get_client(fake_postgrest.url, ...) 连接
+    """
+    import supabase_backend
+
+    fake = FakePostgrest()
+    yield fake
+    supabase_backend.close_client()
+    fake.close()
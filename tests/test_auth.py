@@ -0,0 +1,52 @@
+"""
+会话令牌：签名校验、过期、畸形输入
+"""
+import time
+
+import pytest
+
+import auth
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("AUTH_SECRET", "test-secret")
+    # 不依赖数据库：没有 loader 的吊销列表无需加载
+    monkeypatch.setattr(auth, "denylist", auth.SessionDenylist())
+
+USER = {'username': "zs", 'full_name': "张三", 'department': "销售", 'is_admin': False}
+
+def test_issue_and_read_token():
+    token = auth.issue_token(USER)
+    assert auth.read_token(token) == USER
+
+@pytest.mark.parametrize("token", [
+    None, "", ".", "abc", "abc.", ".abc", "a.b.c", "!!!.???",
+    "中.x", "abc.中", "中文", "eyJ4Ijoxé.abc", "abc.def​",
+])
+def test_malformed_tokens_are_rejected(token):
+    assert auth.token_claims(token) is None
+    assert auth.read_token(token) is None
+
+def test_tampered_token_is_rejected():
+    token = auth.issue_token(USER)
+    payload, _, signature = token.partition(".")
+    forged = auth.issue_token(dict(USER, is_admin=True)).partition(".")[0]
+    assert auth.read_token(f"{forged}.{signature}") is None
+    assert auth.read_token(f"{payload}.{signature[:-1]}") is None
+    assert auth.read_token(f"{payload}.中{signature[1:]}") is None
+
+def test_token_signed_with_another_secret_is_rejected(monkeypatch):
+    token = auth.issue_token(USER)
+    monkeypatch.setenv("AUTH_SECRET", "other-secret")
+    assert auth.read_token(token) is None
+
+def test_expired_token_is_rejected():
+    token = auth.issue_token(USER, ttl=-1)
+    assert auth.read_token(token) is None
+
+def test_cached_token_still_expires(monkeypatch):
+    token = auth.issue_token(USER, ttl=60)
+    assert auth.read_token(token) == USER
+    expires = auth.token_claims(token)['exp']
+    monkeypatch.setattr(time, "time", lambda: expires + 1)
+    assert auth.read_token(token) is None
@@ -0,0 +1,47 @@
+"""
+缓存键按函数签名归一化：同一次调用的不同写法共用一个缓存项
+"""
+import cache
+import db_manager
+
+def test_positional_keyword_and_default_share_entry(sqlite_db):
+    calls = []
+
+    @cache.cached("reports")
+    def lookup(name, month=None, limit=10):
+        calls.append((name, month, limit))
+        return [name, month, limit]
+
+    assert lookup("张三") == ["张三", None, 10]
+    assert lookup(name="张三") == ["张三", None, 10]
+    assert lookup("张三", None) == ["张三", None, 10]
+    assert lookup("张三", limit=10, month=None) == ["张三", None, 10]
+    assert len(calls) == 1
+
+    lookup("张三", "2024-03")
+    assert len(calls) == 2
+
+def test_invalidate_matches_any_spelling(sqlite_db):
+    calls = []
+
+    @cache.cached("reports")
+    def lookup(name, month=None):
+        calls.append(name)
+        return name
+
+    lookup(name="张三", month="2024-03")
+    lookup.invalidate("张三", "2024-03")
+    lookup("张三", month="2024-03")
+    assert len(calls) == 2
+
+    lookup.invalidate(month="2024-03", name="张三")
+    lookup("张三", "2024-03")
+    assert len(calls) == 3
+
+def test_rollup_shared_between_callers(sqlite_db):
+    cache.reset_stats()
+    db_manager.get_performance_rollup("2024-03")
+    db_manager.get_performance_series("day", month_str="2024-03")
+    counters = cache.stats()['tables']['performance_rollup']
+    assert counters['misses'] == 1
+    assert counters['hits'] == 1
@@ -0,0 +1,79 @@
+"""
+批量导入日报的查重：插入失败的行不算作已导入，Supabase 查重只提交 (姓名, 日期, 正文 md5)
+"""
+import hashlib
+
+import pytest
+
+import db_manager
+import sqlite_backend
+import supabase_backend
+
+def _report(content, name="张三", day="2024-03-01"):
+    return {'employee_name': name, 'report_date': day, 'work_content': content, 'next_plan': "", 'problems': ""}
+
+@pytest.fixture
+def failing_insert(sqlite_db, monkeypatch):
+    """
+    正文在 failing 集合中的日报插入失败 (整块和逐行重试都失败)
+    """
+    failing = set()
+    original = sqlite_backend.SQLiteBackend.insert_reports
+
+    def insert_reports(self, reports):
+        if any(report['work_content'] in failing for report in reports):
+            raise ValueError("insert rejected")
+        return original(self, reports)
+
+    monkeypatch.setattr(sqlite_backend.SQLiteBackend, "insert_reports", insert_reports)
+    return failing
+
+def _contents():
+    return sorted(row['work_content'] for row in db_manager.iter_reports(columns="work_content"))
+
+def test_failed_row_is_retried_in_later_chunk(failing_insert):
+    failing_insert.add("拜访客户")
+    rows = iter([(2, _report("拜访客户")), (3, _report("整理报价"))])
+
+    def later_rows():
+        yield from rows
+        # 第一块处理完后插入恢复正常
+        failing_insert.clear()
+        yield 4, _report("拜访客户")
+
+    result = db_manager.bulk_add_reports(later_rows(), chunk_size=2)
+    assert result['inserted'] == 2
+    assert [row_no for row_no, _ in result['failed']] == [2]
+    assert result['skipped'] == []
+    assert _contents() == ["拜访客户", "整理报价"]
+
+def test_repeat_in_same_chunk(failing_insert):
+    failing_insert.add("拜访客户")
+    rows = [(2, _report("拜访客户")), (3, _report("整理报价")), (4, _report("拜访客户")), (5, _report("整理报价"))]
+    result = db_manager.bulk_add_reports(rows, chunk_size=10)
+    assert result['inserted'] == 1
+    assert result['skipped'] == [(5, "文件中重复的日报")]
+    assert [row_no for row_no, _ in result['failed']] == [2, 4]
+    assert "第 2 行" in result['failed'][1][1]
+
+def test_existing_reports_are_skipped(sqlite_db):
+    assert db_manager.bulk_add_reports([(2, _report("拜访客户"))])['inserted'] == 1
+    result = db_manager.bulk_add_reports([(2, _report("拜访客户")), (3, _report("拜访客户", day="2024-03-02"))])
+    assert result['inserted'] == 1
+    assert result['skipped'] == [(2, "日报已存在")]
+
+def test_supabase_checks_keys_in_one_rpc(fake_postgrest):
+    client = supabase_backend.get_client(fake_postgrest.url, "test-key")
+    backend = supabase_backend.get_backend(client)
+    keys = [("张三", "2024-03-01", "拜访客户"), ("李四", "2024-03-02", "长" * 5000), ("王五", "2024-03-03", None)]
+    digest = hashlib.md5("拜访客户".encode("utf-8")).hexdigest()
+    fake_postgrest.script = [(200, [{'employee_name': "张三", 'report_date': "2024-03-01", 'content_md5': digest}], 0)]
+
+    assert backend.existing_report_keys(keys) == {keys[0]}
+    assert fake_postgrest.requests == [("POST", "/rest/v1/rpc/existing_report_keys")]
+    body = fake_postgrest.bodies[0]
+    assert body['p_names'] == ["张三", "李四", "王五"]
+    assert body['p_dates'] == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    assert body['p_hashes'] == [
+        digest, hashlib.md5(("长" * 5000).encode("utf-8")).hexdigest(), hashlib.md5(b"").hexdigest(),
+    ]
@@ -0,0 +1,79 @@
+"""
+迁移后热点查询走预期的索引 (EXPLAIN QUERY PLAN)，不做全表扫描或额外排序
+"""
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrations
+from conftest import ROOT
+
+LEGACY_DB = os.path.join(ROOT, "daily_reports.db")
+
+def _assert_indexes_used(conn):
+    failures = [(name, plan) for name, ok, plan in migrations.check_index_usage(conn, "sqlite") if not ok]
+    assert not failures, "\n".join(f"{name}:\n{plan}" for name, plan in failures)
+    # 全表扫描在计划中显示为不带 USING INDEX 的 "SCAN <表>"
+    for name, _, plan in migrations.check_index_usage(conn, "sqlite"):
+        assert not any(line.startswith("SCAN ") and "USING" not in line for line in plan.splitlines()), name
+
+def _migrate(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    migrations.migrate(conn, "sqlite")
+    return conn
+
+def test_fresh_database(tmp_path):
+    conn = _migrate(str(tmp_path / "fresh.db"))
+    try:
+        assert max(migrations.applied_versions(conn, "sqlite")) == migrations.latest_version()
+        _assert_indexes_used(conn)
+    finally:
+        conn.close()
+
+@pytest.mark.skipif(not os.path.exists(LEGACY_DB), reason="仓库中没有旧版数据库")
+def test_legacy_database(tmp_path):
+    # 仓库自带的数据库是迁移机制之前建的 (没有 schema_migrations 和索引)
+    path = str(tmp_path / "legacy.db")
+    shutil.copy(LEGACY_DB, path)
+    conn = _migrate(path)
+    try:
+        _assert_indexes_used(conn)
+        # 再次执行不应有任何迁移
+        assert migrations.migrate(conn, "sqlite") == []
+    finally:
+        conn.close()
+
+def test_upgrade_with_data_and_statistics(tmp_path):
+    # 旧版本的库 (只执行了第 1 号迁移) 中已有数据和统计信息，升级后规划器仍选择索引
+    path = str(tmp_path / "upgrade.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    migrations.migrate(conn, "sqlite", target_version=1)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO reports (employee_name, report_date, work_content, next_plan, problems, created_at) "
+        "VALUES (?, ?, ?, '', '', ?)",
+        [(f"员工{i % 50}", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", f"内容 {i}", "2024-03-01 08:00:00.000000")
+         for i in range(5000)],
+    )
+    conn.executemany(
+        "INSERT INTO performance_logs (username, month, added_completed, added_revenue) VALUES (?, ?, 1, 1)",
+        [(f"user{i % 50}", f"2024-{1 + i % 12:02d}") for i in range(5000)],
+    )
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    try:
+        assert migrations.migrate(conn, "sqlite") == [m["version"] for m in migrations.MIGRATIONS[1:]]
+        conn.execute("ANALYZE")
+        _assert_indexes_used(conn)
+    finally:
+        conn.close()
+
+def test_every_hot_query_names_an_existing_index(tmp_path):
+    conn = _migrate(str(tmp_path / "fresh.db"))
+    try:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {query["index"] for query in migrations.HOT_QUERIES} <= indexes
+    finally:
+        conn.close()
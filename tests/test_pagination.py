@@ -0,0 +1,50 @@
+"""
+日报 keyset 分页：(report_date, created_at) 相同的行在分页边界上不能丢失
+"""
+import db_manager
+import sqlite_backend
+
+TIED_AT = "2024-03-01 08:00:00.000000"
+
+def _seed(path):
+    backend = sqlite_backend.get_backend(path)
+    # 同一批导入的日报 created_at 相同
+    backend.insert_reports([
+        {'employee_name': f"员工{i % 7}", 'report_date': "2024-03-01", 'work_content': f"工作 {i}",
+         'next_plan': "", 'problems': "", 'created_at': TIED_AT}
+        for i in range(3000)
+    ] + [
+        {'employee_name': "员工0", 'report_date': f"2024-02-{day:02d}", 'work_content': "其他日期",
+         'next_plan': "", 'problems': "", 'created_at': f"2024-02-{day:02d} 09:00:00.000000"}
+        for day in range(1, 11)
+    ])
+    return 3010
+
+def test_reports_page_walks_tied_rows(sqlite_db):
+    total = _seed(sqlite_db)
+    seen, cursor = [], None
+    while True:
+        page, cursor = db_manager.get_reports_page(cursor=cursor, page_size=50)
+        seen.extend(page['id'].tolist())
+        if cursor is None:
+            break
+    assert len(seen) == total
+    assert len(set(seen)) == total
+
+def test_iter_reports_yields_every_row(sqlite_db):
+    total = _seed(sqlite_db)
+    ids = [row['id'] for row in db_manager.iter_reports(batch_size=700)]
+    assert len(ids) == total
+    assert len(set(ids)) == total
+
+def test_iter_reports_adds_cursor_columns(sqlite_db):
+    total = _seed(sqlite_db)
+    rows = list(db_manager.iter_reports(columns="employee_name", batch_size=700))
+    assert len(rows) == total
+    assert len({row['id'] for row in rows}) == total
+
+def test_keyset_order_matches_full_sort(sqlite_db):
+    _seed(sqlite_db)
+    rows = list(db_manager.iter_reports(columns="id, report_date, created_at", batch_size=333))
+    keys = [(row['report_date'], row['created_at'], row['id']) for row in rows]
+    assert keys == sorted(keys, reverse=True)
@@ -0,0 +1,51 @@
+"""
+业绩分析：趋势、排行榜和部门汇总可以直接使用页面预取的汇总数据
+"""
+import pandas as pd
+import pytest
+
+import cache
+import db_manager
+
+MONTH = "2024-03"
+
+@pytest.fixture
+def goal_db(sqlite_db):
+    for username, name, department in [("zs", "张三", "销售"), ("ls", "李四", "市场")]:
+        assert db_manager.create_user(username, "secret123", name, department, "")[0]
+    for username, completed in [("zs", 1000), ("ls", 3000), ("zs", 500)]:
+        assert db_manager.increment_user_monthly_goal(username, MONTH, added_completed=completed, added_revenue=completed / 2)[0]
+    return sqlite_db
+
+def test_prefetched_rollup_matches_query(goal_db):
+    rollup = db_manager.get_performance_rollup(MONTH)
+    assert not rollup.empty
+    cache.invalidate()
+    cache.reset_stats()
+
+    for granularity in ["day", "week"]:
+        pd.testing.assert_frame_equal(
+            db_manager.get_performance_series(granularity, month_str=MONTH, rollup=rollup),
+            db_manager.get_performance_series(granularity, month_str=MONTH),
+        )
+        cache.invalidate()
+    pd.testing.assert_frame_equal(
+        db_manager.get_performance_leaderboard(MONTH, limit=10, rollup=rollup),
+        db_manager.get_performance_leaderboard(MONTH, limit=10),
+    )
+    cache.invalidate()
+    pd.testing.assert_frame_equal(
+        db_manager.get_department_totals(MONTH, rollup=rollup),
+        db_manager.get_department_totals(MONTH),
+    )
+
+def test_prefetched_rollup_skips_query(goal_db):
+    rollup = db_manager.get_performance_rollup(MONTH)
+    cache.invalidate()
+    cache.reset_stats()
+    board = db_manager.get_performance_leaderboard(MONTH, rollup=rollup)
+    db_manager.get_performance_series("day", month_str=MONTH, rollup=rollup)
+    db_manager.get_department_totals(MONTH, rollup=rollup)
+    assert "performance_rollup" not in cache.stats()['tables']
+    assert list(board['username']) == ["ls", "zs"]
+    assert list(board['added_completed']) == [3000, 1500]
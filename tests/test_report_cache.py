@@ -0,0 +1,58 @@
+"""
+本地日报副本的增量同步：较小 id 的日报晚于较大 id 提交时也不会漏掉
+"""
+import pytest
+
+import report_cache
+import sqlite_backend
+
+def _report(report_id):
+    return {
+        'id': report_id, 'employee_name': f"员工{report_id % 3}", 'report_date': "2024-03-01",
+        'work_content': f"内容 {report_id}", 'next_plan': "", 'problems': "",
+        'created_at': f"2024-03-01 10:00:00.{report_id:06d}",
+    }
+
+def _local_ids(reports):
+    return [row['id'] for row in reports.local.reports_after(0, "id", 10000)]
+
+@pytest.fixture
+def source(tmp_path):
+    # 用一个 SQLite 库扮演 Supabase：mirror_reports 可以按指定 id 写入，模拟提交顺序
+    return sqlite_backend.get_backend(str(tmp_path / "source.db"))
+
+@pytest.fixture
+def reports(tmp_path):
+    return report_cache.ReportCache(str(tmp_path / "cache.db"))
+
+def test_late_commit_with_lower_id_is_synced(source, reports):
+    # id 2 已分配但尚未提交，id 3 先提交
+    source.mirror_reports([_report(1), _report(3)])
+    assert reports.sync(source, force=True) == 2
+    assert _local_ids(reports) == [1, 3]
+
+    source.mirror_reports([_report(2)])
+    assert reports.sync(source, force=True) == 1
+    assert _local_ids(reports) == [1, 2, 3]
+    assert reports.local.get_report(2, "work_content")['work_content'] == "内容 2"
+
+def test_gap_fill_with_new_rows_and_many_pages(source, reports, monkeypatch):
+    monkeypatch.setattr(report_cache, "SYNC_BATCH_SIZE", 7)
+    monkeypatch.setattr(report_cache, "GAP_BATCH_SIZE", 3)
+    late = {5, 6, 17, 30, 31, 32, 33}
+    source.mirror_reports([_report(i) for i in range(1, 41) if i not in late])
+    assert reports.sync(source, force=True) == 33
+
+    source.mirror_reports([_report(i) for i in sorted(late)] + [_report(i) for i in range(41, 51)])
+    assert reports.sync(source, force=True) == len(late) + 10
+    assert _local_ids(reports) == list(range(1, 51))
+    # 没有缺口时不再重复拉取
+    assert reports.sync(source, force=True) == 0
+
+def test_gap_outside_lookback_is_not_scanned(source, reports, monkeypatch):
+    monkeypatch.setattr(report_cache, "SYNC_LOOKBACK", 5)
+    source.mirror_reports([_report(i) for i in range(1, 21) if i != 3])
+    reports.sync(source, force=True)
+    source.mirror_reports([_report(3)])
+    assert reports.sync(source, force=True) == 0
+    assert 3 not in _local_ids(reports)
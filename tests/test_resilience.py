@@ -0,0 +1,179 @@
+"""
+容错策略 (resilience) 对真实 HTTP 请求的行为：本地启动一个假的 PostgREST 服务，
+用 supabase_backend 的客户端访问，检查重试、截止时间、熔断，以及后端故障时返回缓存的旧数据
+"""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import cache
+import db_manager
+import resilience
+import supabase_backend
+
+@pytest.fixture
+def server(fake_postgrest):
+    return fake_postgrest
+
+@pytest.fixture
+def backend(server, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(resilience, "READ_DEADLINE", 5)
+    monkeypatch.setattr(resilience, "WRITE_DEADLINE", 5)
+    client = supabase_backend.get_client(server.url, "test-key")
+    breaker = resilience.CircuitBreaker("fake", threshold=3, cooldown=0.3)
+    return resilience.GuardedBackend(supabase_backend.get_backend(client), breaker)
+
+USERS = [{'username': "zs"}]
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504, 429])
+def test_read_retries_transient_status(server, backend, status):
+    server.script = [(status, "upstream error", 0), (200, USERS, 0)]
+    assert backend.list_users("username") == USERS
+    assert len(server.calls("GET")) == 2
+    assert backend.breaker.state == "closed"
+
+def test_read_retries_dropped_connection(server, backend):
+    server.script = ["drop", (200, USERS, 0)]
+    assert backend.list_users("username") == USERS
+    assert len(server.calls("GET")) == 2
+
+def test_read_gives_up_after_attempts(server, backend):
+    server.script = [(503, "upstream error", 0)] * 5
+    with pytest.raises(resilience.BackendUnavailable):
+        backend.list_users("username")
+    assert len(server.calls("GET")) == 3
+
+@pytest.mark.parametrize("status, body", [
+    (400, {'code': "PGRST100", 'message': "failed to parse filter"}),
+    (401, {'code': "PGRST301", 'message': "JWT invalid"}),
+    (404, {'code': "42P01", 'message': "relation does not exist"}),
+    (409, {'code': "23505", 'message': "duplicate key value"}),
+])
+def test_client_errors_are_not_retried(server, backend, status, body):
+    server.script = [(status, body, 0), (200, USERS, 0)]
+    with pytest.raises(resilience.BackendQueryError):
+        backend.list_users("username")
+    assert len(server.calls("GET")) == 1
+    # 后端有响应，不计入熔断
+    assert backend.breaker.state == "closed"
+
+def test_writes_are_not_retried(server, backend):
+    server.script = [(503, "upstream error", 0), (201, [], 0)]
+    with pytest.raises(resilience.BackendUnavailable):
+        backend.insert_report({'employee_name': "张三", 'report_date': "2024-01-01", 'work_content': "x"})
+    assert len(server.calls("POST")) == 1
+
+def test_deadline_fires(server, backend, monkeypatch):
+    monkeypatch.setattr(resilience, "READ_DEADLINE", 0.3)
+    server.script = [(200, USERS, 2)]
+    started = time.monotonic()
+    with pytest.raises(resilience.BackendTimeout):
+        backend.list_users("username")
+    assert time.monotonic() - started < 1.5
+
+def test_deadline_covers_retries(server, backend, monkeypatch):
+    # 重试共用同一个截止时间
+    monkeypatch.setattr(resilience, "READ_DEADLINE", 0.5)
+    server.script = [(503, "upstream error", 0.3), (200, USERS, 0.3), (200, USERS, 0)]
+    started = time.monotonic()
+    with pytest.raises((resilience.BackendTimeout, resilience.BackendUnavailable)):
+        backend.list_users("username")
+    assert time.monotonic() - started < 1.5
+
+def test_breaker_open_half_open_closed(server, backend, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 1)
+    breaker = backend.breaker
+    server.script = [(503, "upstream error", 0)] * 3
+    for _ in range(3):
+        with pytest.raises(resilience.BackendUnavailable):
+            backend.list_users("username")
+    assert breaker.state == "open"
+
+    # 熔断期间不访问后端
+    sent = len(server.requests)
+    with pytest.raises(resilience.BackendUnavailable, match="熔断"):
+        backend.list_users("username")
+    assert len(server.requests) == sent
+
+    time.sleep(breaker.cooldown + 0.05)
+    assert breaker.state == "half-open"
+    server.script = [(200, USERS, 0)]
+    assert backend.list_users("username") == USERS
+    assert breaker.state == "closed"
+
+def test_breaker_reopens_when_probe_fails(server, backend, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 1)
+    breaker = backend.breaker
+    server.script = [(503, "upstream error", 0)] * 4
+    for _ in range(3):
+        with pytest.raises(resilience.BackendUnavailable):
+            backend.list_users("username")
+    time.sleep(breaker.cooldown + 0.05)
+    assert breaker.state == "half-open"
+    with pytest.raises(resilience.BackendUnavailable):
+        backend.list_users("username")
+    assert breaker.state == "open"
+    assert len(server.calls("GET")) == 4
+
+def test_half_open_allows_a_single_probe(server, backend, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 1)
+    breaker = backend.breaker
+    server.script = [(503, "upstream error", 0)] * 3
+    for _ in range(3):
+        with pytest.raises(resilience.BackendUnavailable):
+            backend.list_users("username")
+    time.sleep(breaker.cooldown + 0.05)
+    # 试探请求还在进行时，其他请求直接失败
+    server.script = [(200, USERS, 0.5)]
+    probe = threading.Thread(target=backend.list_users, args=("username",))
+    probe.start()
+    time.sleep(0.1)
+    with pytest.raises(resilience.BackendUnavailable, match="熔断"):
+        backend.list_users("username")
+    probe.join()
+    assert breaker.state == "closed"
+    assert len(server.calls("GET")) == 4
+
+def test_degraded_read_serves_stale_cache(server, monkeypatch):
+    # db_manager 的读操作：后端持续 503 直到熔断，期间返回最近一次成功的结果并记录 stale 提示
+    monkeypatch.setenv("DB_BACKEND", "supabase")
+    monkeypatch.setenv("SUPABASE_URL", server.url)
+    monkeypatch.setenv("SUPABASE_KEY", "test-key")
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(resilience, "READ_DEADLINE", 5)
+    # 缓存很快过期，之后的调用都会访问后端
+    monkeypatch.setitem(cache._ttl, "users", 0.05)
+    cache.invalidate()
+    cache.reset_stats()
+
+    rows = [{'username': "zs", 'full_name': "张三", 'department': "销售", 'phone': "", 'is_admin': False,
+             'created_at': "2024-03-01T00:00:00+00:00"}]
+    server.script = [(200, rows, 0)]
+    fresh = db_manager.get_all_users()
+    assert list(fresh['username']) == ["zs"]
+    breaker = resilience.guard(supabase_backend.get_backend(db_manager.get_client())).breaker
+    assert breaker.state == "closed"
+
+    time.sleep(0.1)
+    server.script = [(503, "upstream error", 0)] * 50
+    resilience.begin_run()
+    for _ in range(10):
+        pd.testing.assert_frame_equal(db_manager.get_all_users(), fresh)
+        if breaker.state == "open":
+            break
+    assert breaker.state == "open"
+
+    # 熔断期间不再访问后端，仍返回旧数据
+    sent = len(server.requests)
+    pd.testing.assert_frame_equal(db_manager.get_all_users(), fresh)
+    assert len(server.requests) == sent
+
+    stale = [notice for notice in resilience.run_notices() if notice['kind'] == "stale"]
+    assert stale and all(notice['operation'].endswith("get_all_users") for notice in stale)
+    assert all(notice['stale_age'] > 0 for notice in stale)
+    assert cache.stats()['tables']['users']['stale'] == len(stale)
+    cache.invalidate()
@@ -0,0 +1,109 @@
+"""
+会话吊销：本进程立即生效，其他进程刷新后生效
+"""
+import threading
+import time
+
+import pytest
+
+import auth
+import db_manager
+
+USERNAME, PASSWORD = "zs", "secret123"
+
+@pytest.fixture
+def token(sqlite_db, monkeypatch):
+    monkeypatch.setenv("AUTH_SECRET", "test-secret")
+    assert db_manager.create_user(USERNAME, PASSWORD, "张三", "销售", "")[0]
+    auth.throttle.success(*auth.throttle_keys(USERNAME, None))
+    return auth.issue_token(db_manager.login_user(USERNAME, PASSWORD))
+
+def test_revoke_session_takes_effect_immediately(token):
+    assert auth.read_token(token) is not None
+    assert db_manager.revoke_session(token)
+    assert auth.read_token(token) is None
+
+def test_revoke_only_affects_that_session(token):
+    other = auth.issue_token(db_manager.login_user(USERNAME, PASSWORD))
+    assert db_manager.revoke_session(token)
+    assert auth.read_token(token) is None
+    assert auth.read_token(other) is not None
+
+def test_revoke_user_sessions_takes_effect_immediately(token):
+    assert db_manager.revoke_user_sessions(USERNAME)
+    assert auth.read_token(token) is None
+
+def test_revoke_refreshes_from_database(token):
+    # 另一个进程写入的吊销记录在本进程下一次吊销时一并加载
+    claims = auth.token_claims(token)
+    elsewhere = dict(claims, sid="sid-from-elsewhere")
+    assert not auth.denylist.is_revoked(elsewhere)
+    db_manager._backend().insert_session_revocation(auth.revocation(USERNAME, elsewhere['sid'], claims['exp']))
+    assert not auth.denylist.is_revoked(elsewhere)
+    assert db_manager.revoke_session(token)
+    assert auth.denylist.is_revoked(elsewhere)
+
+def test_other_process_sees_revocation_after_refresh(token):
+    other = auth.SessionDenylist(refresh_interval=3600)
+    other.set_loader(db_manager.list_session_revocations)
+    claims = auth.token_claims(token)
+    assert not other.is_revoked(claims)
+    assert db_manager.revoke_session(token)
+    other.refresh()
+    assert other.is_revoked(claims)
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_background_refresh_loads_new_revocations(token):
+    other = auth.SessionDenylist(refresh_interval=0.05)
+    other.set_loader(db_manager.list_session_revocations)
+    claims = auth.token_claims(token)
+    assert not other.is_revoked(claims)
+    db_manager._backend().insert_session_revocation(auth.revocation(USERNAME, claims['sid'], claims['exp']))
+    assert _wait_for(lambda: other.is_revoked(claims))
+
+def test_is_revoked_does_not_query_database(token):
+    calls = []
+    def loader(after_id):
+        calls.append(after_id)
+        return db_manager.list_session_revocations(after_id)
+    other = auth.SessionDenylist(refresh_interval=3600)
+    other.set_loader(loader)
+    claims = auth.token_claims(token)
+    assert not other.is_revoked(claims)
+    loaded = len(calls)
+    for _ in range(10):
+        assert not other.is_revoked(claims)
+    assert len(calls) == loaded == 1
+
+def test_rejects_tokens_until_first_load(token):
+    release = threading.Event()
+    def loader(after_id):
+        release.wait(5)
+        return db_manager.list_session_revocations(after_id)
+    other = auth.SessionDenylist(refresh_interval=3600, ready_timeout=0.05)
+    other.set_loader(loader)
+    claims = auth.token_claims(token)
+    assert other.is_revoked(claims)
+    release.set()
+    assert _wait_for(lambda: not other.is_revoked(claims))
+
+def test_failed_first_load_keeps_rejecting(token, monkeypatch):
+    monkeypatch.setattr(auth, "DENYLIST_RETRY_INTERVAL", 0.05)
+    failures = [None, None]
+    def loader(after_id):
+        if failures:
+            return failures.pop()
+        return db_manager.list_session_revocations(after_id)
+    other = auth.SessionDenylist(refresh_interval=3600, ready_timeout=0.02)
+    other.set_loader(loader)
+    claims = auth.token_claims(token)
+    assert other.is_revoked(claims)
+    assert _wait_for(lambda: not other.is_revoked(claims))
+    assert not failures
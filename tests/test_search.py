@@ -0,0 +1,90 @@
+"""
+日报全文搜索 (SQLite)：两个字以内的关键词走 reports_fts_short 索引，结果与子串匹配一致
+"""
+import sqlite3
+
+import pytest
+
+import migrations
+import sqlite_backend
+
+REPORTS = [
+    ("张三", "2024-03-01", "拜访华为客户，沟通报价", "跟进QA测试", ""),
+    ("李四", "2024-03-02", "整理客户资料", "写3D方案", "需要支持"),
+    ("王五", "2024-03-03", "内部会议", "qa review", "(紧急)"),
+    ("赵六", "2024-03-04", "客服培训", "户外拓展", "华为"),
+]
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = sqlite_backend.get_backend(str(tmp_path / "search.db"))
+    for name, day, work, plan, problems in REPORTS:
+        backend.insert_report({
+            'employee_name': name, 'report_date': day, 'work_content': work, 'next_plan': plan, 'problems': problems,
+        })
+    return backend
+
+def _names(backend, query, **filters):
+    rows, total = backend.search_reports(query, **filters)
+    assert total == len(rows)
+    return sorted(row['employee_name'] for row in rows)
+
+@pytest.mark.parametrize("query, expected", [
+    ("客户", ["张三", "李四"]),
+    ("华为", ["张三", "赵六"]),
+    ("客", ["张三", "李四", "赵六"]),
+    ("户外", ["赵六"]),
+    ("qa", ["张三", "王五"]),
+    ("3D", ["李四"]),
+    ("(", ["王五"]),
+    ("客户 报价", ["张三"]),
+    ("华为 沟通报价", ["张三"]),
+    ("客户资料", ["李四"]),
+    ("采购", []),
+])
+def test_short_terms(backend, query, expected):
+    assert _names(backend, query) == expected
+
+def test_short_terms_with_filters(backend):
+    assert _names(backend, "客户", employee_name="李四") == ["李四"]
+    assert _names(backend, "客户", report_date="2024-03-01") == ["张三"]
+
+def test_snippet_highlights_short_term(backend):
+    rows, _ = backend.search_reports("报价")
+    assert "<mark>报价</mark>" in rows[0]['snippet']
+
+def test_index_follows_writes(backend):
+    conn = backend._connect()
+    report_id = backend.search_reports("报价")[0][0]['id']
+    conn.execute("UPDATE reports SET work_content = '拜访移动客户' WHERE id = ?", (report_id,))
+    assert _names(backend, "报价") == []
+    assert _names(backend, "移动") == ["张三"]
+    conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+    assert _names(backend, "移动") == []
+    assert _names(backend, "客户") == ["李四"]
+
+def test_mirrored_reports_are_indexed(backend):
+    backend.mirror_reports([{
+        'id': 100, 'employee_name': "钱七", 'report_date': "2024-03-05", 'work_content': "报价单审核",
+        'next_plan': "", 'problems': "", 'created_at': "2024-03-05 10:00:00.000000",
+    }])
+    assert _names(backend, "报价") == ["张三", "钱七"]
+
+def test_upgrade_indexes_existing_reports(tmp_path):
+    path = str(tmp_path / "upgrade.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    migrations.migrate(conn, "sqlite", target_version=8)
+    conn.executemany(
+        "INSERT INTO reports (employee_name, report_date, work_content, next_plan, problems) VALUES (?, ?, ?, ?, ?)",
+        REPORTS,
+    )
+    assert 9 in migrations.migrate(conn, "sqlite")
+    conn.close()
+    assert _names(sqlite_backend.get_backend(path), "华为") == ["张三", "赵六"]
+
+def test_short_term_pages_newest_first(backend):
+    first, total = backend.search_reports("客", limit=2)
+    second, _ = backend.search_reports("客", limit=2, offset=2)
+    assert total == 3
+    ids = [row['id'] for row in first + second]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 3
@@ -0,0 +1,129 @@
+"""
+登录状态的保存与恢复：令牌放在 Cookie 中，不出现在 URL 里
+AppTest 不能携带 Cookie，用 monkeypatch 替换 auth.session_cookie
+"""
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import auth
+import db_manager
+from conftest import ROOT
+
+APP_PATH = os.path.join(ROOT, "app.py")
+USERNAME, PASSWORD = "zs", "secret123"
+
+@pytest.fixture
+def user_db(sqlite_db, monkeypatch):
+    monkeypatch.setenv("AUTH_SECRET", "test-secret")
+    assert db_manager.create_user(USERNAME, PASSWORD, "张三", "销售", "")[0]
+    auth.throttle.success(*auth.throttle_keys(USERNAME, None))
+    return sqlite_db
+
+def _app(cookie=None, monkeypatch=None):
+    if monkeypatch is not None:
+        monkeypatch.setattr(auth, "session_cookie", lambda: cookie)
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+def _login(at):
+    at.run()
+    at.text_input(key="login_user").input(USERNAME)
+    at.text_input(key="login_pass").input(PASSWORD)
+    at.button[0].click()
+    at.run()
+    return at
+
+def _cookie_scripts(at):
+    return [element.proto.body for element in at.get("html") if "document.cookie" in element.proto.body]
+
+def test_login_writes_cookie_not_url(user_db, monkeypatch):
+    at = _login(_app(monkeypatch=monkeypatch))
+    assert not at.exception
+    assert at.session_state['authenticated']
+    token = at.session_state['session_token']
+    assert auth.read_token(token)['username'] == USERNAME
+    assert dict(at.query_params) == {}
+    assert any(f"{auth.SESSION_COOKIE}={token}" in script for script in _cookie_scripts(at))
+
+def test_cookie_restores_session(user_db, monkeypatch):
+    token = auth.issue_token(db_manager.login_user(USERNAME, PASSWORD))
+    at = _app(token, monkeypatch)
+    at.run()
+    assert not at.exception
+    assert at.session_state['authenticated']
+    assert at.session_state['user_info']['username'] == USERNAME
+
+def test_invalid_cookie_is_cleared(user_db, monkeypatch):
+    at = _app("中.x", monkeypatch)
+    at.run()
+    assert not at.exception
+    assert not at.session_state['authenticated']
+    assert any(f"{auth.SESSION_COOKIE}=;" in script for script in _cookie_scripts(at))
+
+def test_token_in_url_is_ignored_and_removed(user_db, monkeypatch):
+    token = auth.issue_token(db_manager.login_user(USERNAME, PASSWORD))
+    at = _app(monkeypatch=monkeypatch)
+    at.query_params["session"] = token
+    at.run()
+    assert not at.exception
+    assert not at.session_state['authenticated']
+    assert "session" not in at.query_params
+
+def test_logout_revokes_cookie_token(user_db, monkeypatch):
+    at = _login(_app(monkeypatch=monkeypatch))
+    token = at.session_state['session_token']
+    next(button for button in at.button if button.label == "退出登录").click()
+    at.run()
+    assert not at.exception
+    assert not at.session_state['authenticated']
+    assert any(f"{auth.SESSION_COOKIE}=;" in script for script in _cookie_scripts(at))
+    # 被复制的 Cookie 不能再恢复登录
+    assert auth.read_token(token) is None
+    stolen = _app(token, monkeypatch)
+    stolen.run()
+    assert not stolen.session_state['authenticated']
+
+def test_check_current_password_skips_login_throttle(user_db):
+    tokens = auth.throttle._tokens
+    assert db_manager.check_current_password(USERNAME, PASSWORD)
+    assert not db_manager.check_current_password(USERNAME, "wrong")
+    assert auth.throttle._tokens == tokens
+
+def test_check_current_password_locks_after_failures(user_db):
+    keys = auth.throttle_keys(USERNAME, None)
+    for _ in range(auth.throttle.max_failures):
+        assert not db_manager.check_current_password(USERNAME, "wrong")
+    assert auth.throttle.locked_for(*keys) > 0
+    # 锁定期间正确的密码也不放行
+    assert not db_manager.check_current_password(USERNAME, PASSWORD)
+    auth.throttle.success(*keys)
+
+def _change_password(at, current):
+    next(button for button in at.button if button.label == "修改密码").click()
+    at.run()
+    at.text_input[0].input(current)
+    at.text_input[1].input("newsecret")
+    at.text_input[2].input("newsecret")
+    next(button for button in at.button if button.label == "确认修改").click()
+    at.run()
+    return at
+
+def test_change_password_reports_lockout(user_db, monkeypatch):
+    at = _login(_app(monkeypatch=monkeypatch))
+    keys = auth.throttle_keys(USERNAME, None)
+    for _ in range(auth.throttle.max_failures):
+        auth.throttle.failure(*keys)
+    try:
+        _change_password(at, PASSWORD)
+        assert not at.exception
+        assert any("尝试次数过多" in error.value for error in at.error)
+        assert not any("当前密码错误" in error.value for error in at.error)
+    finally:
+        auth.throttle.success(*keys)
+
+def test_change_password_with_current_password(user_db, monkeypatch):
+    at = _change_password(_login(_app(monkeypatch=monkeypatch)), PASSWORD)
+    assert not at.exception
+    assert not at.session_state['authenticated']
+    assert db_manager.login_user(USERNAME, "newsecret")
@@ -0,0 +1,103 @@
+"""
+向量化转换与原先逐行 DataFrame.apply(lambda ...) 的结果一致
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import transforms
+
+# --- 原实现 (逐行) ---
+def _old_beijing(x):
+    return x.tz_localize('UTC').tz_convert('Asia/Shanghai') if x.tzinfo is None else x.tz_convert('Asia/Shanghai')
+
+def old_to_beijing_time(values):
+    # 原代码: pd.to_datetime(列).apply(lambda ...)；混合时区的列无法整列解析，这里逐个解析后再套用同一个 lambda
+    return [_old_beijing(pd.Timestamp(value)) if value is not None else pd.NaT for value in values]
+
+def old_completion_rate(df):
+    return df.apply(
+        lambda row: (row['completed_amount'] / row['target_amount'] * 100) if row['target_amount'] > 0 else 0, axis=1
+    )
+
+def _same_times(new, old):
+    assert len(new) == len(old)
+    for a, b in zip(new, old):
+        if pd.isna(b):
+            assert pd.isna(a)
+        else:
+            assert a == b
+            assert str(a.tz) == "Asia/Shanghai"
+
+def _same_numbers(new, old):
+    new, old = list(new), list(old)
+    assert len(new) == len(old)
+    for a, b in zip(new, old):
+        if isinstance(b, float) and math.isnan(b):
+            assert math.isnan(a)
+        else:
+            assert a == pytest.approx(b, rel=1e-12, abs=0)
+
+# --- to_beijing_time ---
+@pytest.mark.parametrize("values", [
+    ["2024-01-01 00:00:00", "2024-06-30 16:30:00.123456", "2023-12-31 23:59:59"],
+    ["2024-01-01T00:00:00+00:00", "2024-06-30T16:30:00.123456+00:00", "2024-03-01T08:00:00+08:00"],
+    # 同一列中混合 naive 和带时区的值 (SQLite 本地时间与 Supabase 时间混在一起)
+    ["2024-01-01 00:00:00", "2024-01-01T00:00:00+00:00", "2024-01-01T09:00:00+09:00"],
+    ["2024-01-01 00:00:00", None, "2024-01-02 12:00:00"],
+])
+def test_to_beijing_time_matches_row_wise(values):
+    _same_times(list(transforms.to_beijing_time(values)), old_to_beijing_time(values))
+
+def test_to_beijing_time_keeps_index():
+    series = pd.Series(["2024-01-01 00:00:00", "2024-01-02 00:00:00"], index=[10, 20])
+    result = transforms.to_beijing_time(series)
+    assert list(result.index) == [10, 20]
+    assert result.iloc[0] == pd.Timestamp("2024-01-01 08:00:00", tz="Asia/Shanghai")
+
+def test_to_beijing_time_empty():
+    result = transforms.to_beijing_time(pd.Series([], dtype=object))
+    assert len(result) == 0
+    assert str(result.dt.tz) == "Asia/Shanghai"
+
+def test_to_beijing_time_variable_precision():
+    # Supabase 返回的秒小数位数不固定
+    values = ["2024-01-01T00:00:00.1+00:00", "2024-01-01T00:00:00.123456+00:00", "2024-01-01T00:00:00+00:00"]
+    _same_times(list(transforms.to_beijing_time(values)), old_to_beijing_time(values))
+
+# --- completion_rate ---
+def _rates(df):
+    return transforms.completion_rate(df['completed_amount'], df['target_amount'])
+
+def test_completion_rate_matches_row_wise_random():
+    rng = np.random.default_rng(7)
+    n = 10_000
+    target = rng.choice([0.0, -5.0, np.nan, 1.0, 37.5, 1000.0], size=n)
+    completed = rng.uniform(-10, 2000, size=n)
+    completed[rng.random(n) < 0.05] = np.nan
+    df = pd.DataFrame({'completed_amount': completed, 'target_amount': target})
+    _same_numbers(_rates(df), old_completion_rate(df))
+
+@pytest.mark.parametrize("rows", [
+    # target 为 0 / 负数 / NaN 时为 0；completed 为 NaN 时结果为 NaN
+    [(50, 100), (0, 0), (10, -1), (5, None), (None, 10)],
+    # 整数与浮点数混合 (Supabase numeric 列可能以 int 返回)
+    [(1, 3), (2.5, 4), (7, 7.0), (0, 1)],
+])
+def test_completion_rate_matches_row_wise_cases(rows):
+    df = pd.DataFrame.from_records(rows, columns=['completed_amount', 'target_amount'])
+    _same_numbers(_rates(df), old_completion_rate(df))
+
+def test_completion_rate_object_columns():
+    # 从 dict 列表构造、含 None 的列可能是 object 类型
+    df = pd.DataFrame({'completed_amount': pd.Series([10, 2.5, 3], dtype=object),
+                       'target_amount': pd.Series([20, 5, 0], dtype=object)})
+    _same_numbers(_rates(df), old_completion_rate(df))
+
+def test_completion_rate_empty_frame():
+    df = pd.DataFrame({'completed_amount': pd.Series([], dtype="float64"),
+                       'target_amount': pd.Series([], dtype="float64")})
+    _same_numbers(_rates(df), old_completion_rate(df))
+    assert _rates(df).shape == (0,)
@@ -0,0 +1,38 @@
+"""
+页面渲染用的向量化数据转换
+替代逐行 DataFrame.apply(lambda ...)，大数据量 (如导出) 时快几个数量级
+"""
+import lazy
+
+# 第一次转换时才导入 (登录页不需要 pandas)
+np = lazy.module("numpy")
+pd = lazy.module("pandas")
+
+BEIJING_TZ = "Asia/Shanghai"
+
+def to_beijing_time(values):
+    """
+    将时间列统一转换为北京时间 (Asia/Shanghai)
+    - 没有时区信息的时间视为 UTC
+    - 带时区的时间直接换算
+    同一列中混合出现两种情况也可以一次处理
+    """
+    series = pd.Series(values) if not isinstance(values, pd.Series) else values
+    # utc=True: naive 时间按 UTC 解析，带时区的时间换算到 UTC
+    utc = pd.to_datetime(series, utc=True, format="ISO8601")
+    return utc.dt.tz_convert(BEIJING_TZ)
+
+def completion_rate(completed, target):
+    """
+    计算完成率 (百分比)
+    target > 0 时为 completed / target * 100，否则为 0
+    """
+    completed = np.asarray(completed, dtype="float64")
+    target = np.asarray(target, dtype="float64")
+
+    rate = np.zeros(np.broadcast(completed, target).shape, dtype="float64")
+    # NaN 目标与 target <= 0 一样视为未设定
+    mask = target > 0
+    np.divide(completed, target, out=rate, where=mask)
+    rate[mask] *= 100
+    return rate